@@ -0,0 +1,439 @@
+"""
+Benchmarks of the Polyline's Regions Builder data structures and regions pipeline
+
+Run in the project folder:
+    python benchmark.py [benchmark name ...] [--sizes 1e3 1e5 1e7] [--shapes zigzag ...]
+                        [--no-memory] [--repeat 3] [--json results.json] [--compare previous.json]
+If no benchmark name is given, all of them are run (names go first, as --sizes and --shapes take many values). Results saved with --json (with the commit
+they were measured at) can be compared with the next run by --compare.
+"""
+
+import argparse
+from array import array
+import csv
+import inspect
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dcll import DCLL, CompactDCLL
+import kernel
+import predicates
+import profiling
+from project import Point, Polyline, fill_poly_with_data, load_polyline, write_regions
+import vectorized
+
+
+def bench_dcll_append(sizes=(10_000, 100_000, 1_000_000)) -> List[dict]:
+    """
+    Times building a DCLL by appending n items, for each n in sizes.
+    Linear total time shows up as a constant time per append.
+    """
+    results = []
+    for n in sizes:
+        dcll = DCLL()
+        start = time.perf_counter()
+        for i in range(n):
+            dcll.append(i)
+        elapsed = time.perf_counter() - start
+        results.append({'n': n, 'seconds': elapsed, 'ns_per_item': elapsed / n * 1e9})
+    return results
+
+
+def bench_dcll_memory(sizes=(10_000, 100_000, 1_000_000)) -> List[dict]:
+    """
+    Compares memory taken by DCLL and CompactDCLL links (data items are allocated beforehand,
+    so only the list structure itself is measured).
+    """
+    results = []
+    for n in sizes:
+        data = list(range(n))
+        for cls in (DCLL, CompactDCLL):
+            tracemalloc.start()
+            dcll = cls()
+            for d in data:
+                dcll.append(d)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({'n': n, 'list': cls.__name__, 'bytes_per_item': current / n,
+                            'peak_bytes_per_item': peak / n})
+            del dcll
+    return results
+
+
+def shape_y(shape: str, n: int, seed: int = 1) -> array:
+    """
+    Return: y coordinates of points x = 0, 1, ... n - 1 of a synthetic polyline:
+            straight - all points on the start-end line, a single region
+            sinusoid - crossing its start-end line about every 20 points
+            zigzag - crossing its start-end line at every segment, the most regions
+            random_walk - steps of random length up and down
+    """
+    if shape == 'straight':
+        return array('d', bytes(8 * n))
+    if shape == 'sinusoid':
+        return array('d', (math.sin(i / 6.5) for i in range(n)))
+    if shape == 'zigzag':
+        return array('d', ((-1) ** i * (1 + i % 3) for i in range(n)))
+    if shape == 'random_walk':
+        rng = random.Random(seed)
+        y = array('d', bytes(8 * n))
+        for i in range(1, n):
+            y[i] = y[i - 1] + rng.uniform(-1.0, 1.0)
+        return y
+    raise ValueError(f"Unknown shape: {shape}, expected one of: {', '.join(SHAPES)}")
+
+
+SHAPES = ('straight', 'sinusoid', 'zigzag', 'random_walk')
+
+
+def make_polyline(n: int, storage: str = 'list', shape: str = 'sinusoid') -> Polyline:
+    polyline = Polyline(id=1, storage=storage)
+    for i, y in enumerate(shape_y(shape, n)):
+        polyline.add_point(Point(nr=i + 1, x=float(i), y=y))
+    return polyline
+
+
+def measure(run: Callable, setup: Optional[Callable[[], Tuple]] = None, memory: bool = True,
+            repeat: int = 1) -> dict:
+    """
+    Times run(*setup()) (the best of repeat runs, each one on a new setup) and, with memory, runs it
+    again under tracemalloc to find its peak memory (allocations made by setup are not counted)
+    Return: seconds, peak_bytes (if memory)
+    """
+    seconds = []
+    for _ in range(max(repeat, 1)):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        run(*args)
+        seconds.append(time.perf_counter() - start)
+    result = {'seconds': min(seconds)}
+    if memory:
+        args = setup() if setup else ()
+        tracemalloc.start()
+        run(*args)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def per_vertex(result: dict, n: int) -> dict:
+    result['ns_per_vertex'] = result['seconds'] / n * 1e9
+    if 'peak_bytes' in result:
+        result['peak_bytes_per_vertex'] = result['peak_bytes'] / n
+    return result
+
+
+def bench_build_regions(sizes=(10_000, 100_000, 1_000_000), engines: Optional[Tuple[str, ...]] = None,
+                        storages=('list', 'array')) -> List[dict]:
+    """
+    Times build_regions with each engine ('compiled' one only if Numba is installed;
+    its first run, compiling the kernel, is not timed)
+    """
+    if engines is None:
+        engines = ('python', 'numpy', 'parallel') + (('compiled',) if kernel.available() else ())
+    if 'compiled' in engines:
+        make_polyline(10, 'array').build_regions('compiled')
+    results = []
+    for n in sizes:
+        for storage in storages:
+            for engine in engines:
+                polyline = make_polyline(n, storage)
+                start = time.perf_counter()
+                polyline.build_regions(engine)
+                elapsed = time.perf_counter() - start
+                results.append({'n': n, 'storage': storage, 'engine': engine, 'regions': polyline.region_list.count,
+                                'seconds': elapsed, 'ns_per_vertex': elapsed / n * 1e9})
+    return results
+
+
+def bench_polyline_memory(sizes=(100_000, 1_000_000)) -> List[dict]:
+    """
+    Compares memory taken by polyline's points in both storages
+    """
+    results = []
+    for n in sizes:
+        for storage in ('list', 'array'):
+            tracemalloc.start()
+            polyline = make_polyline(n, storage)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({'n': n, 'storage': storage, 'bytes_per_vertex': current / n})
+            del polyline
+    return results
+
+
+def write_csv(file_name: str, n: int, columns: int = 2, shape: str = 'sinusoid') -> None:
+    with open(file_name, 'w') as f:
+        f.write('Nr,X,Y\n' if columns == 3 else 'X,Y\n')
+        for i, y in enumerate(shape_y(shape, n)):
+            row = f'{i:.1f},{y:.6f}\n'
+            f.write(f'{i + 1},{row}' if columns == 3 else row)
+
+
+def bench_csv_loader(sizes=(100_000, 1_000_000)) -> List[dict]:
+    """
+    Compares fill_poly_with_data (csv.reader, a Point per row) with the bulk load_polyline
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            for columns in (2, 3):
+                file_name = os.path.join(tmp, f'data_{n}_{columns}.csv')
+                write_csv(file_name, n, columns)
+
+                start = time.perf_counter()
+                with open(file_name) as f:
+                    fill_poly_with_data(csv.reader(f))
+                elapsed = time.perf_counter() - start
+                results.append({'n': n, 'columns': columns, 'loader': 'fill_poly_with_data',
+                                'seconds': elapsed, 'ns_per_vertex': elapsed / n * 1e9})
+
+                start = time.perf_counter()
+                load_polyline(file_name)
+                elapsed = time.perf_counter() - start
+                results.append({'n': n, 'columns': columns, 'loader': 'load_polyline',
+                                'seconds': elapsed, 'ns_per_vertex': elapsed / n * 1e9})
+    return results
+
+
+def bench_pipeline(sizes=(1_000, 10_000, 100_000), shapes=SHAPES, memory: bool = True,
+                   repeat: int = 1) -> List[dict]:
+    """
+    Measures the regions pipeline stage by stage - fill_poly_with_data, Polyline.build_regions
+    and write_regions (single csv and binary outputs) - for each shape and size
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape in shapes:
+            for n in sizes:
+                file_name = os.path.join(tmp, f'{shape}_{n}.csv')
+                write_csv(file_name, n, 3, shape)
+
+                def fill():
+                    with open(file_name) as f:
+                        fill_poly_with_data(csv.reader(f))
+
+                def built():
+                    polyline = make_polyline(n, 'list', shape)
+                    polyline.build_regions()
+                    return polyline, file_name, ['single', 'binary']
+
+                polyline = built()[0]
+                stages = {'fill_poly_with_data': (fill, None),
+                          'build_regions': (Polyline.build_regions, lambda: (make_polyline(n, 'list', shape),)),
+                          'write_regions': (write_regions, built)}
+                for stage, (run, setup) in stages.items():
+                    result = {'stage': stage, 'shape': shape, 'n': n, 'regions': polyline.region_list.count}
+                    result.update(per_vertex(measure(run, setup, memory, repeat), n))
+                    results.append(result)
+                os.remove(file_name)
+    return results
+
+
+def bench_dcll_ops(sizes=(1_000, 10_000, 100_000), memory: bool = True, repeat: int = 1) -> List[dict]:
+    """
+    Measures DCLL and CompactDCLL operations on lists of n items: append of n items,
+    insert and remove at 1000 random indices, set_order of a full reversed permutation
+    and remove_repeated_data of n points, a tenth of them repeated
+    """
+    results = []
+    rng = random.Random(1)
+    for n in sizes:
+        k = min(n, 1000)
+        points = [Point(nr=i, x=float(i % (n - n // 10)), y=0.0) for i in range(n)]
+
+        def filled(cls, data=range(n)):
+            dcll = cls()
+            for d in data:
+                dcll.append(d)
+            return dcll,
+
+        def reversed_order(cls):
+            dcll = filled(cls)[0]
+            return dcll, list(dcll)[::-1]
+
+        def insert(dcll):
+            for _ in range(k):
+                dcll.insert(-1, rng.randrange(dcll.count))
+
+        def remove(dcll):
+            for _ in range(k):
+                dcll.remove(rng.randrange(dcll.count))
+
+        for cls in (DCLL, CompactDCLL):
+            operations = {
+                'append': (lambda dcll: [dcll.append(i) for i in range(n)], lambda: (cls(),), n),
+                'insert': (insert, lambda: filled(cls), k),
+                'remove': (remove, lambda: filled(cls), k),
+                'set_order': (lambda dcll, order: dcll.set_order(order), lambda: reversed_order(cls), n),
+                'remove_repeated_data': (lambda dcll: dcll.remove_repeated_data(dcll.count),
+                                         lambda: filled(cls, points), n),
+            }
+            for operation, (run, setup, items) in operations.items():
+                result = {'operation': operation, 'list': cls.__name__, 'n': n}
+                result.update(measure(run, setup, memory, repeat))
+                result['ns_per_operation'] = result['seconds'] / items * 1e9
+                results.append(result)
+    return results
+
+
+def bench_orientation(sizes=(100_000,), repeat: int = 1) -> List[dict]:
+    """
+    Measures the robust orientation predicate on n random points and on n points near the line
+    (whose float cross product is uncertain): the scalar and, with NumPy, the batched form,
+    and the number of orientations decided in exact arithmetic
+    """
+    results = []
+    rng = random.Random(1)
+    ax, ay, bx, by = 0.1, 0.3, 1234.56789, 987.654321
+    for n in sizes:
+        points = {
+            'random': [(rng.uniform(-1e3, 1e3), rng.uniform(-1e3, 1e3)) for _ in range(n)],
+            'near_line': [(ax + t * (bx - ax), ay + t * (by - ay)) for t in (rng.uniform(-2, 3) for _ in range(n))],
+        }
+        for kind, coords in points.items():
+            forms = {'scalar': lambda: [predicates.orientation(ax, ay, bx, by, x, y) for x, y in coords]}
+            if vectorized.np is not None:
+                x = vectorized.np.array([c[0] for c in coords])
+                y = vectorized.np.array([c[1] for c in coords])
+                forms['batched'] = lambda: predicates.orientations(ax, ay, bx, by, x, y)
+            for form, run in forms.items():
+                result = {'points': kind, 'form': form, 'n': n}
+                result.update(measure(run, memory=False, repeat=repeat))
+                result['ns_per_item'] = result['seconds'] / n * 1e9
+                with profiling.profile() as stats:
+                    run()
+                result['exact'] = stats['counters'].get('exact_orientations', 0)
+                results.append(result)
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[..., List[dict]]] = {
+    'dcll_append': bench_dcll_append,
+    'dcll_memory': bench_dcll_memory,
+    'dcll_ops': bench_dcll_ops,
+    'build_regions': bench_build_regions,
+    'polyline_memory': bench_polyline_memory,
+    'csv_loader': bench_csv_loader,
+    'pipeline': bench_pipeline,
+    'orientation': bench_orientation,
+}
+
+
+def report(name: str, results: List[dict]) -> None:
+    print(f'---------- {name} ----------')
+    for r in results:
+        print(', '.join(f'{k}={v:.6g}' if isinstance(v, float) else f'{k}={v}' for k, v in r.items()))
+    # rows differing in other parameters than n (e.g. points and form of the orientation benchmark)
+    # are compared within their own group only
+    groups: Dict[tuple, List[dict]] = {}
+    for r in results:
+        if 'ns_per_item' in r and 'n' in r:
+            key = tuple((k, v) for k, v in r.items() if k != 'n' and k not in MEASURES)
+            groups.setdefault(key, []).append(r)
+    for key, rows in groups.items():
+        if len({r['n'] for r in rows}) > 1:
+            smallest, largest = min(rows, key=lambda r: r['n']), max(rows, key=lambda r: r['n'])
+            label = ''.join(f', {k}={v}' for k, v in key)
+            print(f'per item time ratio (largest / smallest n{label}): '
+                  f'{largest["ns_per_item"] / smallest["ns_per_item"]:.2f}')
+    print('')
+
+
+MEASURES = ('seconds', 'peak_bytes', 'ns_per_vertex', 'ns_per_item', 'ns_per_operation', 'peak_bytes_per_vertex',
+            'bytes_per_item', 'peak_bytes_per_item', 'bytes_per_vertex', 'exact')
+
+
+def run_metadata() -> dict:
+    """
+    Return: commit, Python version and machine the benchmarks are run at
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'machine': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def run_benchmark(name: str, sizes: Optional[List[int]] = None, shapes: Optional[List[str]] = None,
+                  memory: bool = True, repeat: int = 1) -> List[dict]:
+    """
+    Runs a benchmark, passing it the options it takes
+    """
+    benchmark = BENCHMARKS[name]
+    parameters = inspect.signature(benchmark).parameters
+    options = {'sizes': sizes, 'shapes': shapes, 'memory': memory, 'repeat': repeat}
+    return benchmark(**{k: v for k, v in options.items() if k in parameters and v is not None})
+
+
+def result_key(name: str, result: dict) -> tuple:
+    return (name,) + tuple((k, v) for k, v in result.items() if k not in MEASURES and k != 'regions')
+
+
+def compare(previous: dict, current: dict) -> None:
+    """
+    Prints time (and peak memory) ratios of current results to the previous ones measured the same way
+    """
+    before = {result_key(name, r): r for name, results in previous['results'].items() for r in results}
+    print(f"---------- compared with {previous['meta'].get('commit')} (current / previous) ----------")
+    for name, results in current['results'].items():
+        for r in results:
+            old = before.get(result_key(name, r))
+            if old is None or not old['seconds']:
+                continue
+            line = ', '.join(f'{k}={v}' for k, v in result_key(name, r)[1:])
+            line += f": time {r['seconds'] / old['seconds']:.2f}"
+            if old.get('peak_bytes') and 'peak_bytes' in r:
+                line += f", peak memory {r['peak_bytes'] / old['peak_bytes']:.2f}"
+            print(f'{name}: {line}')
+    print('')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Runs Polyline's Regions Builder benchmarks.")
+    parser.add_argument("names", nargs="*", help=f"Benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--sizes", nargs="+", type=float, help="Numbers of vertices (or items), f.e. 1e3 1e5 1e7")
+    parser.add_argument("--shapes", nargs="+", help=f"Polyline shapes of the pipeline benchmark: {', '.join(SHAPES)}")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the peak memory (tracemalloc) runs")
+    parser.add_argument("--repeat", default=1, type=int, help="Number of timed runs, the best one is reported")
+    parser.add_argument("--json", help="Save results as JSON into the file ('-' - print them)")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare with")
+    parsed_args = parser.parse_args(args)
+    for name in parsed_args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    for shape in parsed_args.shapes or ():
+        if shape not in SHAPES:
+            parser.error(f"unknown shape: {shape}")
+    sizes = [int(n) for n in parsed_args.sizes] if parsed_args.sizes else None
+
+    output = {'meta': run_metadata(), 'results': {}}
+    for name in parsed_args.names or BENCHMARKS:
+        results = run_benchmark(name, sizes, parsed_args.shapes, not parsed_args.no_memory, parsed_args.repeat)
+        output['results'][name] = results
+        if parsed_args.json != '-':
+            report(name, results)
+
+    if parsed_args.json == '-':
+        print(json.dumps(output, indent=1))
+    elif parsed_args.json:
+        with open(parsed_args.json, 'w') as f:
+            json.dump(output, f, indent=1)
+    if parsed_args.compare:
+        with open(parsed_args.compare) as f:
+            compare(json.load(f), output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
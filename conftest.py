@@ -0,0 +1,47 @@
+"""
+Polylines and polyline files shared by the test modules
+"""
+import pytest
+from project import Point, Polyline
+
+
+def zigzag(n):
+    """
+    Return: coordinates of n points of a zigzag polyline, crossing the line through its first and last point
+            every second point and touching it at every 7th one
+    """
+    return [(float(i), 0.0 if i % 7 == 3 else float((-1) ** (i // 2) * (1 + i % 3))) for i in range(n)]
+
+
+@pytest.fixture
+def make_polyline():
+    """
+    Return: factory of polylines of points numbered from 1, of the given coordinates or of n zigzag points,
+            with y coordinates moved by shift
+    """
+    def make(coords, storage='list', shift=0.0):
+        polyline = Polyline(id=1, storage=storage)
+        for i, (x, y) in enumerate(zigzag(coords) if isinstance(coords, int) else coords):
+            polyline.add_point(Point(nr=i + 1, x=x, y=y + shift))
+        return polyline
+    return make
+
+
+@pytest.fixture
+def zigzag_csv(tmp_path):
+    """
+    Return: factory of csv files of n zigzag points, with (3) or without (2) the Nr column
+    """
+    def make(columns=2, n=40):
+        lines = ['Nr,X,Y'] if columns == 3 else ['X,Y']
+        for i, (x, y) in enumerate(zigzag(n)):
+            lines.append(f'{100 + i},{x:g},{y:g}' if columns == 3 else f'{x:g},{y:g}')
+        path = tmp_path / f'zigzag{columns}.csv'
+        path.write_text('\n'.join(lines) + '\n\n')
+        return str(path)
+    return make
+
+
+@pytest.fixture
+def zigzag_file(zigzag_csv):
+    return zigzag_csv()
@@ -3,10 +3,49 @@ Doubly Circular Linked List, according to:
 https://www.askpython.com/python/examples/doubly-circular-linked-list
 in combination with my phD's algorithm's requirements
 """
-from typing import Optional
+from array import array
+from typing import Dict, Optional
+
+
+class DataBuckets:
+    """
+    Remembers data items and tells whether a new one equals (==) any of them, in expected O(1).
+    Items offering grid_keys() (like project.Point) are bucketed in their own grid cell
+    and looked up in the neighbouring cells as well, so that tolerance based equality is kept.
+    Other hashable items are bucketed by their hash, unhashable ones are compared one by one.
+    """
+    def __init__(self):
+        self._buckets: dict = {}
+        self._unhashable: list = []
+
+    def add_if_new(self, d) -> bool:
+        """
+        Return: True  - if d equals none of the items added so far (d is added)
+                False - if d is repeated (d is not added)
+        """
+        grid_keys = getattr(d, 'grid_keys', None)
+        if grid_keys is not None:
+            keys = grid_keys()
+        else:
+            try:
+                hash(d)
+            except TypeError:
+                if any(d == k for k in self._unhashable):
+                    return False
+                self._unhashable.append(d)
+                return True
+            keys = (d,)
+
+        for key in keys:
+            if any(d == k for k in self._buckets.get(key, ())):
+                return False
+        self._buckets.setdefault(keys[0], []).append(d)
+        return True
 
 
 class DCLLNode:
+    __slots__ = ('_data', '_prev', '_next')
+
     def __init__(self, data=None):
         self._data = data
         self._prev = self
@@ -52,10 +91,17 @@ class DCLLNode:
 
 
 class DCLL:
-    def __init__(self, node=None):
+    def __init__(self, node=None, finger=False, index_data=False):
         self._head: Optional[DCLLNode] = node
         self._count = 0
         self._tail: Optional[DCLLNode] = node
+        # finger - optional cache of the last node reached by index, with its index
+        self._finger_enabled: bool = finger
+        self._finger: Optional[DCLLNode] = None
+        self._finger_index: int = 0
+        # data index - optional map of id(data) to the node holding it,
+        # each data object may then be stored in the list only once
+        self._data_index: Optional[Dict[int, DCLLNode]] = {} if index_data else None
 
     def __repr__(self):
         string = ""
@@ -97,12 +143,7 @@ class DCLL:
         elif index < 0 or index >= self.count:
             raise IndexError("Index out of range")
         else:
-            temp = self.head
-            for i in range(self.count):
-                if i == index:
-                    return temp
-                temp = temp.next
-            return None
+            return self.node_at(index)
 
     def __setitem__(self, index, item):
         if not isinstance(index, int):
@@ -112,26 +153,20 @@ class DCLL:
         if not isinstance(item, DCLLNode):
             raise TypeError("An item must be a DCLLNode")
 
+        self.index_node(item)
         if self.head is None:
             self.head = item
+            self.tail = item
             self.count = 1
-            return self.get(self.count - 1)
-
-        temp = self.head
-        if index == 0:
-            temp = temp.prev
-        else:
-            for _ in range(index - 1):
-                temp = temp.next
+            return item.data
 
-        temp.next.prev = item
-        temp.next.prev.next, temp.next.prev.prev = temp.next, temp
-        temp.next = temp.next.prev
+        self.set_item_after_item0(self.node_at(index - 1), item)
         if index == 0:
-            self.head = self.head.prev
+            self.head = item
         self.count += 1
         self.tail = self.head.prev
-        return self.get(index)
+        self.drop_finger()
+        return item.data
 
     @property
     def head(self):
@@ -157,47 +192,136 @@ class DCLL:
     def tail(self, node):
         self._tail = node
 
-    def append(self, data):
-        return self.insert(data, self.count)
+    @property
+    def finger_enabled(self):
+        return self._finger_enabled
 
-    def insert(self, data, index):
-        if (index > self.count) or (index < 0):
-            raise ValueError(f"Index out of range: {index}, size: {self.count}")
+    @finger_enabled.setter
+    def finger_enabled(self, b: bool):
+        self._finger_enabled = b
+        self.drop_finger()
 
-        if self.head is None:
-            self.head = DCLLNode(data)
-            self.count = 1
-            return self.get(self.count - 1)
+    def drop_finger(self) -> None:
+        self._finger = None
+
+    @property
+    def index_data(self):
+        return self._data_index is not None
 
+    def index_node(self, node: DCLLNode) -> None:
+        """
+        Adds the node to the data index (if enabled), before it is linked into the list.
+        """
+        if self._data_index is not None:
+            key = id(node.data)
+            if key in self._data_index:
+                raise ValueError(f"{node.data} is already on the indexed list")
+            self._data_index[key] = node
+
+    def unindex_node(self, node: DCLLNode) -> None:
+        if self._data_index is not None and self._data_index.get(id(node.data)) is node:
+            del self._data_index[id(node.data)]
+
+    def node_at(self, index) -> DCLLNode:
+        """
+        Returns the node at index, walking from the nearest of the head, the tail
+        and (if enabled) the finger, so at most count / 2 hops are made.
+        Index -1 and count are accepted and wrap around the circle.
+        """
+        index %= self.count
+        steps = index
         temp = self.head
-        if index == 0:
-            temp = temp.prev
-        else:
-            for _ in range(index - 1):
+        if steps > self.count // 2:
+            steps -= self.count
+        finger = self._finger
+        if finger is not None and abs(index - self._finger_index) < abs(steps):
+            temp = finger
+            steps = index - self._finger_index
+
+        if steps >= 0:
+            for _ in range(steps):
                 temp = temp.next
+        else:
+            for _ in range(-steps):
+                temp = temp.prev
 
-        temp.next.prev = DCLLNode(data)
-        temp.next.prev.next, temp.next.prev.prev = temp.next, temp
-        temp.next = temp.next.prev
+        if self._finger_enabled:
+            self._finger = temp
+            self._finger_index = index
+        return temp
+
+    def append(self, data) -> DCLLNode:
+        """
+        Appends data after the tail in O(1) time.
+        Return: the new DCLLNode
+        """
+        node = DCLLNode(data)
+        self.index_node(node)
+        if self.head is None:
+            self.head = node
+        else:
+            # in a circular list head.prev is always the tail
+            self.set_item_after_item0(self.head.prev, node)
+        self.tail = node
+        self.count += 1
+        return node
+
+    def prepend(self, data) -> DCLLNode:
+        """
+        Inserts data before the head in O(1) time.
+        Return: the new DCLLNode, which becomes the head
+        """
+        node = self.append(data)
+        self.head = node
+        self.tail = node.prev
+        self.drop_finger()
+        return node
+
+    def insert_after(self, node: DCLLNode, data) -> DCLLNode:
+        """
+        Inserts data right after node, a node of the list, in O(1) time.
+        Return: the new DCLLNode
+        """
+        new_node = DCLLNode(data)
+        self.index_node(new_node)
+        self.set_item_after_item0(node, new_node)
+        self.count += 1
+        self.tail = self.head.prev
+        self.drop_finger()
+        return new_node
+
+    def insert(self, data, index):
+        if (index > self.count) or (index < 0):
+            raise ValueError(f"Index out of range: {index}, size: {self.count}")
+
+        if index == self.count:
+            return self.append(data).data
         if index == 0:
-            self.head = self.head.prev
+            return self.prepend(data).data
+
+        node = DCLLNode(data)
+        self.index_node(node)
+        self.set_item_after_item0(self.node_at(index - 1), node)
         self.count += 1
         self.tail = self.head.prev
-        return self.get(index)
+        self.drop_finger()
+        return node.data
 
     def remove(self, index):
         if (index >= self.count) | (index < 0):
             raise ValueError(f"Index out of range: {index}, size: {self.count}")
 
         if self.count == 1:
+            self.drop_finger()
+            self.unindex_node(self.head)
             self.head = None
             self.count = 0
             self.tail = None
             return None
 
-        target = self.head
-        for _ in range(index):
-            target = target.next
+        target = self.node_at(index)
+        self.drop_finger()
+        self.unindex_node(target)
 
         if target is self.head:
             self.head = self.head.next
@@ -205,7 +329,7 @@ class DCLL:
         target.prev.next, target.next.prev = target.next, target.prev
         self.count -= 1
         self.tail = self.head.prev
-        return self.get(index - 1)
+        return target.prev.data
 
     def index(self, data, from_index=0, from_data=None):
         if from_data:
@@ -222,10 +346,7 @@ class DCLL:
         if (index >= self.count) | (index < 0):
             raise ValueError(f"Index out of range: {index}, size: {self.count}")
 
-        temp = self.head
-        for _ in range(index):
-            temp = temp.next
-        return temp.data
+        return self.node_at(index).data
 
     def size(self):
         return self.count
@@ -237,25 +358,33 @@ class DCLL:
         """
         Sets the order od DCLL Nodes according to order_list,
         where the DCLLNode.data items are already sorted.
+        Nodes are matched by identity and relinked in one pass, O(n):
+        the nodes of order_list come first, followed by the remaining nodes
+        in their current order.
         """
+        self.drop_finger()
         if self.count == 0:
             return None
-        elif self.count == 1:
-            return self.head
-        elif self.count == 2:
-            self.head = self.tail
-            self.tail = self.head.next
-            return self.head
-        else:
-            from_data = self.head.prev
-            for i, item in enumerate(order_list):
-                if i < self.count - 1:
-                    current_index = self.index(item.data, i, from_data.next)
-                    from_data = self.move(item, current_index, i)
-                if i == 0:
-                    self.head = item
-            self.tail = self.head.prev
-            return self.head
+
+        order = list(order_list)
+        listed = {id(node) for node in order}
+        if len(listed) != len(order):
+            raise ValueError("order_list contains a node more than once")
+        nodes = list(self)
+        members = {id(node) for node in nodes}
+        for node in order:
+            if id(node) not in members:
+                raise ValueError(f"{node!r} is not a node of this list")
+        order.extend(node for node in nodes if id(node) not in listed)
+
+        prev = order[-1]
+        for node in order:
+            prev.next = node
+            node.prev = prev
+            prev = node
+        self.head = order[0]
+        self.tail = order[-1]
+        return self.head
 
     def move(self, item, from_index, to_index):
         if (from_index > self.count) or (from_index < 0):
@@ -263,24 +392,42 @@ class DCLL:
         if (to_index > self.count) or (to_index < 0):
             raise ValueError(f"Index out of range: {to_index}, size: {self.count}")
 
-        if from_index == to_index:
+        if from_index == to_index or self.count < 2:
             return item
         else:
+            self.drop_finger()
+            if item is self.head:
+                self.head = item.next
+
             # removing data from current index
             item.prev.next = item.next
             item.next.prev = item.prev
 
-            # searching for target place
+            # searching for target place: the item goes after the node now at to_index
+            # when moving forward, or after the node at to_index - 1 when moving backward
             index_difference = to_index - from_index
-            curr_item = item
+            # the remaining m nodes form a circle starting at item.next (position 1)
+            # and ending at item.prev (position m): position p is p hops forward
+            # or m - p + 1 hops backward from item, so the shorter way round is taken
+            m = self.count - 1
             if index_difference > 0:
-                for _ in range(index_difference - 1):
+                p = (index_difference - 1) % m + 1
+            else:
+                p = m - (-index_difference % m)
+
+            curr_item = item
+            if p <= m - p + 1:
+                for _ in range(p):
                     curr_item = curr_item.next
             else:
-                for _ in range(-index_difference + 1):
+                for _ in range(m - p + 1):
                     curr_item = curr_item.prev
 
-            return self.set_item_after_item0(curr_item, item)
+            self.set_item_after_item0(curr_item, item)
+            if to_index == 0:
+                self.head = item
+            self.tail = self.head.prev
+            return item
 
     def set_item_after_item0(self, item0, item):
         item.next = item0.next
@@ -290,31 +437,30 @@ class DCLL:
         return item
 
     def remove_repeated_data(self, count):
+        """
+        Removes every node whose data equals the data of an earlier kept node,
+        in expected O(n) time (see DataBuckets).
+        Return: count decreased by the number of removed nodes
+        """
+        self.drop_finger()
         c = count
-        if self.head and self.head is not self.head.next:
-            p = self.head
-        else:
-            return c
-        while True:
-            t = p.next
-            while t is not self.head:
-                if t.data == p.data:
-                    if p is self.head:
-                        self.head = self.head.next
-
-                    t.prev.next, t.next.prev = t.next, t.prev
-                    self.count -= 1
-                    self.tail = self.head.prev
-                    c -= 1
-                else:
-                    t = t.next
-            p = p.next
-            if p is self.head:
-                break
-
+        seen = DataBuckets()
+        t = self.head
+        for _ in range(self.count):
+            next_t = t.next
+            if not seen.add_if_new(t.data):
+                self.delete_node(t)
+                c -= 1
+            t = next_t
         return c
 
     def find_node_by_data(self, d):
+        """
+        Finds the node holding the very object d: in O(1) with the data index, by a scan otherwise.
+        """
+        if self._data_index is not None:
+            node = self._data_index.get(id(d))
+            return node if node is not None and node.data is d else None
         if self.head:
             t = self.head
             while True:
@@ -326,17 +472,323 @@ class DCLL:
         return None
 
     def delete_node(self, n):
+        self.drop_finger()
         if self.head:
+            self.unindex_node(n)
+            if self.count == 1:
+                self.head = None
+                self.tail = None
+                self.count = 0
+                return
             if n is self.head:
                 self.head = self.head.next
             n.prev.next, n.next.prev = n.next, n.prev
             self.count -= 1
             self.tail = self.head.prev
 
+    def delete_data(self, d) -> Optional[DCLLNode]:
+        """
+        Deletes the node holding the very object d.
+        Return: the deleted node or None if d is not on the list
+        """
+        node = self.find_node_by_data(d)
+        if node is not None:
+            self.delete_node(node)
+        return node
+
     def clear_list(self):
+        self.drop_finger()
+        if self._data_index is not None:
+            self._data_index.clear()
         if self.head:
             self.head = None
             self.tail = None
             self.count = 0
         return True
-    
+
+
+class CompactDCLLNode:
+    """
+    Handle of a CompactDCLL slot, offering the DCLLNode interface.
+    Handles are created on demand, the list itself stores no node objects.
+    """
+    __slots__ = ('_owner', '_slot')
+
+    def __init__(self, owner, slot: int):
+        self._owner = owner
+        self._slot = slot
+
+    def __repr__(self):
+        return f"{self.data}"
+
+    def __str__(self):
+        return f"Compact Doubly Circular Linked List's Node ({self.data})"
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactDCLLNode):
+            return False
+        return self._owner is other._owner and self._slot == other._slot
+
+    def __hash__(self):
+        return hash((id(self._owner), self._slot))
+
+    @property
+    def slot(self):
+        return self._slot
+
+    @property
+    def data(self):
+        return self._owner._data[self._slot]
+
+    @data.setter
+    def data(self, d):
+        self._owner._data[self._slot] = d
+
+    @property
+    def prev(self):
+        return CompactDCLLNode(self._owner, self._owner._prev[self._slot])
+
+    @property
+    def next(self):
+        return CompactDCLLNode(self._owner, self._owner._next[self._slot])
+
+
+class CompactDCLL:
+    """
+    Doubly Circular Linked List keeping its links as slot numbers in array('l') buffers
+    instead of node objects. Freed slots are chained through the next links (their prev link is -1)
+    and reused.
+    """
+    def __init__(self):
+        self._data: list = []
+        self._prev = array('l')
+        self._next = array('l')
+        self._head: int = -1    # head slot, -1 when the list is empty
+        self._free: int = -1    # first free slot, -1 when there is none
+        self._count: int = 0
+
+    def __repr__(self):
+        if self._head < 0:
+            return "Compact Doubly Circular Linked List is empty"
+        return "Compact Doubly Circular Linked List:\n" + " -> ".join(f"{d}" for d in self.iter_data())
+
+    def __iter__(self):
+        for slot in self._slots():
+            yield CompactDCLLNode(self, slot)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not isinstance(index, int):
+            raise TypeError("List index must be an integer >= 0")
+        elif index < 0 or index >= self._count:
+            raise IndexError("Index out of range")
+        return CompactDCLLNode(self, self._slot_at(index))
+
+    @property
+    def head(self):
+        return CompactDCLLNode(self, self._head) if self._head >= 0 else None
+
+    @property
+    def tail(self):
+        return CompactDCLLNode(self, self._prev[self._head]) if self._head >= 0 else None
+
+    @property
+    def count(self):
+        return self._count
+
+    def _slots(self):
+        slot = self._head
+        for _ in range(self._count):
+            yield slot
+            slot = self._next[slot]
+
+    def iter_data(self):
+        data = self._data
+        for slot in self._slots():
+            yield data[slot]
+
+    def _new_slot(self, data) -> int:
+        slot = self._free
+        if slot >= 0:
+            self._free = self._next[slot]
+            self._data[slot] = data
+            # a one-node loop, as a new slot is
+            self._prev[slot] = self._next[slot] = slot
+        else:
+            slot = len(self._data)
+            self._data.append(data)
+            self._prev.append(slot)
+            self._next.append(slot)
+        return slot
+
+    def _free_slot(self, slot: int) -> None:
+        self._data[slot] = None
+        self._prev[slot] = -1
+        self._next[slot] = self._free
+        self._free = slot
+
+    def _link_after(self, slot0: int, slot: int) -> None:
+        nxt = self._next[slot0]
+        self._prev[slot], self._next[slot] = slot0, nxt
+        self._prev[nxt] = slot
+        self._next[slot0] = slot
+
+    def _unlink(self, slot: int) -> None:
+        prv, nxt = self._prev[slot], self._next[slot]
+        self._next[prv] = nxt
+        self._prev[nxt] = prv
+        if slot == self._head:
+            self._head = nxt if nxt != slot else -1
+
+    def _slot_at(self, index: int) -> int:
+        """
+        Returns the slot at index (-1 and count wrap around), walking from the head
+        or backwards from the tail, whichever is closer.
+        """
+        index %= self._count
+        slot = self._head
+        if index <= self._count // 2:
+            for _ in range(index):
+                slot = self._next[slot]
+        else:
+            for _ in range(self._count - index):
+                slot = self._prev[slot]
+        return slot
+
+    def _check_node(self, node: CompactDCLLNode) -> int:
+        """
+        Return: slot of the node, if it is a live node of this list (a handle may outlive its slot)
+        """
+        if not isinstance(node, CompactDCLLNode) or node._owner is not self:
+            raise ValueError(f"{node!r} is not a node of this list")
+        slot = node.slot
+        if slot >= len(self._prev) or self._prev[slot] < 0:
+            raise ValueError(f"node of slot {slot} was removed from the list")
+        return slot
+
+    def append(self, data) -> CompactDCLLNode:
+        slot = self._new_slot(data)
+        if self._head < 0:
+            self._head = slot
+        else:
+            self._link_after(self._prev[self._head], slot)
+        self._count += 1
+        return CompactDCLLNode(self, slot)
+
+    def prepend(self, data) -> CompactDCLLNode:
+        node = self.append(data)
+        self._head = node.slot
+        return node
+
+    def insert(self, data, index):
+        if (index > self._count) or (index < 0):
+            raise ValueError(f"Index out of range: {index}, size: {self._count}")
+        if index == self._count:
+            return self.append(data).data
+        if index == 0:
+            return self.prepend(data).data
+
+        slot = self._new_slot(data)
+        self._link_after(self._slot_at(index - 1), slot)
+        self._count += 1
+        return data
+
+    def remove(self, index):
+        if (index >= self._count) or (index < 0):
+            raise ValueError(f"Index out of range: {index}, size: {self._count}")
+        slot = self._slot_at(index)
+        prv = self._prev[slot]
+        self._unlink(slot)
+        self._free_slot(slot)
+        self._count -= 1
+        return self._data[prv] if self._count else None
+
+    def index(self, data, from_index=0):
+        for i, d in enumerate(self.iter_data()):
+            if i >= from_index and d == data:
+                return i
+        raise ValueError(f"No {data} found on the intersect pts list")
+
+    def get(self, index):
+        if (index >= self._count) or (index < 0):
+            raise ValueError(f"Index out of range: {index}, size: {self._count}")
+        return self._data[self._slot_at(index)]
+
+    def size(self):
+        return self._count
+
+    def display(self):
+        print(self)
+
+    def set_order(self, order_list):
+        """
+        Relinks the nodes in one pass so that the nodes of order_list come first,
+        in the given order, followed by the remaining nodes in their current order.
+        """
+        if self._count == 0:
+            return None
+        order = [self._check_node(node) for node in order_list]
+        listed = set(order)
+        if len(listed) != len(order):
+            raise ValueError("order_list contains a node more than once")
+        order.extend(slot for slot in self._slots() if slot not in listed)
+
+        prv = order[-1]
+        for slot in order:
+            self._next[prv] = slot
+            self._prev[slot] = prv
+            prv = slot
+        self._head = order[0]
+        return self.head
+
+    def move(self, item, from_index, to_index):
+        if (from_index > self._count) or (from_index < 0):
+            raise ValueError(f"Index out of range: {from_index}, size: {self._count}")
+        if (to_index > self._count) or (to_index < 0):
+            raise ValueError(f"Index out of range: {to_index}, size: {self._count}")
+
+        slot = self._check_node(item)
+        if from_index == to_index or self._count < 2:
+            return item
+        self._unlink(slot)
+        self._count -= 1
+        self._link_after(self._slot_at(to_index - 1), slot)
+        self._count += 1
+        if to_index == 0:
+            self._head = slot
+        return item
+
+    def remove_repeated_data(self, count):
+        c = count
+        seen = DataBuckets()
+        for slot in list(self._slots()):
+            if not seen.add_if_new(self._data[slot]):
+                self._unlink(slot)
+                self._free_slot(slot)
+                self._count -= 1
+                c -= 1
+        return c
+
+    def find_node_by_data(self, d):
+        for slot in self._slots():
+            if self._data[slot] is d:
+                return CompactDCLLNode(self, slot)
+        return None
+
+    def delete_node(self, n):
+        if self._head >= 0:
+            slot = self._check_node(n)
+            self._unlink(slot)
+            self._free_slot(slot)
+            self._count -= 1
+
+    def clear_list(self):
+        self._data = []
+        self._prev = array('l')
+        self._next = array('l')
+        self._head = -1
+        self._free = -1
+        self._count = 0
+        return True
@@ -0,0 +1,149 @@
+"""
+Compiled kernel of Polyline.build_regions: one pass over the x and y arrays of a polyline
+classifies its points, and another finds the region changes and counts their crossing points,
+with no interpreter work per vertex.
+
+The kernels are plain Python functions of scalars and arrays, compiled with Numba's njit when
+Numba is installed. Numba (and NumPy) are imported lazily, on the first use of the kernel, and
+compiled kernels are cached on disk by Numba, so neither start-up nor later runs pay for it.
+The 'auto' engine uses the kernel when Numba is installed and works, and the point by point engine
+otherwise (see usable).
+
+Points are classified with the float filter of predicates.orientation; the few points it is
+uncertain about are marked UNCERTAIN by the kernel and decided exactly afterwards.
+"""
+
+import importlib.util
+import math
+import warnings
+
+import predicates
+
+UNCERTAIN = 2
+
+_compiled = None
+_usable = None
+
+
+def available() -> bool:
+    """
+    Return: True if the kernel can be compiled (Numba and NumPy are installed), without importing them
+    """
+    return importlib.util.find_spec('numba') is not None and importlib.util.find_spec('numpy') is not None
+
+
+def usable() -> bool:
+    """
+    Return: True if the kernel is available and Numba imports and compiles it (on the first call, by running
+            it on a tiny polyline). A broken Numba is reported with a warning, once per process.
+    """
+    global _usable
+    if not available():
+        return False
+    if _usable is None:
+        try:
+            import vectorized
+            np = vectorized.require_numpy()
+            classify_crossings(np.array([0.0, 1.0, 2.0]), np.array([0.0, 1.0, 0.0]))
+            _usable = True
+        except Exception as e:
+            warnings.warn(f"The compiled kernel is unusable, falling back to the python engine: {e!r}",
+                          RuntimeWarning)
+            _usable = False
+    return _usable
+
+
+def classify_kernel(x, y, signs, errbound) -> int:
+    """
+    Stores is_left values of the inner points into signs (first and last point are left as they are),
+    UNCERTAIN where the float cross product is too close to 0 to be trusted
+    Return: number of UNCERTAIN points
+    """
+    n = len(x)
+    sx, sy = x[0], y[0]
+    dx, dy = x[n - 1] - sx, y[n - 1] - sy
+    uncertain = 0
+    for i in range(1, n - 1):
+        left = dx * (y[i] - sy)
+        right = (x[i] - sx) * dy
+        lv = left - right
+        bound = errbound * (abs(left) + abs(right))
+        if lv > bound:
+            signs[i] = 1
+        elif lv < -bound:
+            signs[i] = -1
+        else:
+            signs[i] = UNCERTAIN
+            uncertain += 1
+    return uncertain
+
+
+def crossings_kernel(x, y, signs, changes, cx, cy) -> int:
+    """
+    Stores indices i where a new region starts (see vectorized.find_changes) into changes and,
+    for each of them, the crossing point of segment (i - 1, i) and the line through the first
+    and the last point into cx, cy (NaN if there is none), as vectorized.crossings counts them
+    Return: number of changes
+    """
+    n = len(x)
+    p1x, p1y, p2x, p2y = x[0], y[0], x[n - 1], y[n - 1]
+    a1 = p2y - p1y
+    b1 = p1x - p2x
+    c1 = p2x * p1y - p1x * p2y
+    count = 0
+    for i in range(1, n - 1):
+        prev, cur = signs[i - 1], signs[i]
+        if prev == cur or (cur != 0 and prev == 0):
+            continue
+        changes[count] = i
+        cx[count] = math.nan
+        cy[count] = math.nan
+        if cur != 0:
+            p3, p4 = (i, i - 1) if cur == 1 else (i - 1, i)
+            a2 = y[p4] - y[p3]
+            b2 = x[p3] - x[p4]
+            c2 = x[p4] * y[p3] - x[p3] * y[p4]
+            denominator = a1 * b2 - a2 * b1
+            if denominator != 0:
+                cx[count] = (b1 * c2 - b2 * c1) / denominator
+                cy[count] = (a2 * c1 - a1 * c2) / denominator
+        count += 1
+    return count
+
+
+PYTHON_KERNELS = (classify_kernel, crossings_kernel)
+
+
+def compiled_kernels():
+    """
+    Return: classify_kernel and crossings_kernel compiled by Numba (imported and compiled on the first call)
+    """
+    global _compiled
+    if _compiled is None:
+        import numba
+        _compiled = (numba.njit(cache=True, nogil=True)(classify_kernel),
+                     numba.njit(cache=True, nogil=True)(crossings_kernel))
+    return _compiled
+
+
+def classify_crossings(x, y, kernels=None):
+    """
+    Input: x, y - float64 arrays of polyline's points coordinates
+           kernels - classify and crossings kernels (compiled ones by default)
+    Return: signs, changes, crossings' x, crossings' y - the same as vectorized.classify,
+            vectorized.find_changes and vectorized.crossings give
+    """
+    import vectorized
+    np = vectorized.require_numpy()
+    classify, crossings = kernels or compiled_kernels()
+    n = len(x)
+    signs = np.zeros(n, dtype=np.int8)
+    if n > 2 and classify(x, y, signs, predicates.CCW_ERRBOUND_A):
+        ax, ay, bx, by = x[0].item(), y[0].item(), x[n - 1].item(), y[n - 1].item()
+        for i in np.flatnonzero(signs == UNCERTAIN).tolist():
+            signs[i] = predicates.exact_orientation(ax, ay, bx, by, x[i].item(), y[i].item())
+    changes = np.empty(n, dtype=np.intp)
+    cx = np.empty(n, dtype=np.float64)
+    cy = np.empty(n, dtype=np.float64)
+    count = crossings(x, y, signs, changes, cx, cy) if n > 2 else 0
+    return signs, changes[:count], cx[:count], cy[:count]
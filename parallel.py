@@ -0,0 +1,112 @@
+"""
+Parallel engine of Polyline.build_regions for very long polylines:
+the polyline is split into chunks of consecutive points, worker processes classify
+the points and count crossing points of their chunks (see vectorized.py), and a cheap
+merge step looks for region changes at the chunks' edges.
+
+The coordinates are copied once into shared memory, so they are not pickled for the workers;
+the workers write the points' is_left values into shared memory too.
+NumPy is required, as with the numpy engine.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+from typing import List, Optional, Tuple
+
+import vectorized
+
+MIN_CHUNK = 1 << 18   # points - smaller polylines are not worth starting processes for
+
+
+def chunk_bounds(n: int, chunks: int) -> List[Tuple[int, int]]:
+    """
+    Return: (lo, hi) ranges of points splitting n points into chunks of nearly equal size
+    """
+    return [(n * k // chunks, n * (k + 1) // chunks) for k in range(chunks)]
+
+
+def classify_chunk(x, y, signs, lo: int, hi: int) -> Tuple:
+    """
+    Classifies points lo to hi - 1 into signs, then finds the region changes lying inside the chunk
+    (the change at lo, if any, needs the previous chunk's last point and is left to the merge step)
+    Return: changes, crossings' x, crossings' y of the chunk
+    """
+    signs[lo:hi] = vectorized.classify(x, y, lo, hi)
+    changes = vectorized.find_changes(signs, lo + 1, hi)
+    cx, cy = vectorized.crossings(x, y, signs, changes)
+    return changes, cx, cy
+
+
+def classify_shared_chunk(name: str, n: int, lo: int, hi: int) -> Tuple:
+    """
+    Runs classify_chunk in a worker process on the shared memory block name:
+    x and y (float64) columns of n points followed by an int8 signs column
+    """
+    np = vectorized.np
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        x = np.ndarray(n, dtype=np.float64, buffer=shm.buf)
+        y = np.ndarray(n, dtype=np.float64, buffer=shm.buf, offset=8 * n)
+        signs = np.ndarray(n, dtype=np.int8, buffer=shm.buf, offset=16 * n)
+        result = classify_chunk(x, y, signs, lo, hi)
+        # the arrays must not outlive the mapping
+        del x, y, signs
+        return result
+    finally:
+        shm.close()
+
+
+def merge_chunks(x, y, signs, bounds: List[Tuple[int, int]], results: List[Tuple]) -> Tuple:
+    """
+    Joins chunks' changes and crossings in order, adding the changes at the chunks' edges:
+    whether a region starts at a chunk's first point depends only on the previous point's sign
+    (a point on the line following one off the line, or a side swap, while a point off the line
+    following one on the line continues the region), so one pair of signs per edge is checked.
+    Return: changes, crossings' x, crossings' y of the whole polyline
+    """
+    np = vectorized.np
+    parts = ([], [], [])
+    for (lo, hi), chunk in zip(bounds, results):
+        if lo > 0:
+            edge = vectorized.find_changes(signs, lo, lo + 1)
+            for part, column in zip(parts, (edge,) + vectorized.crossings(x, y, signs, edge)):
+                part.append(column)
+        for part, column in zip(parts, chunk):
+            part.append(column)
+    return tuple(np.concatenate(part) for part in parts)
+
+
+def classify_parallel(x, y, workers: Optional[int] = None, min_chunk: int = MIN_CHUNK) -> Tuple:
+    """
+    Input: x, y - float64 arrays of polyline's points coordinates
+           workers - number of worker processes (the number of CPUs by default)
+           min_chunk - least number of points per chunk; with a single chunk no process is started
+    Return: signs, changes, crossings' x, crossings' y - the same as vectorized.classify,
+            vectorized.find_changes and vectorized.crossings give for the whole polyline
+    """
+    np = vectorized.require_numpy()
+    n = len(x)
+    chunks = max(1, min(workers or os.cpu_count() or 1, n // max(min_chunk, 1)))
+    bounds = chunk_bounds(n, chunks)
+    if chunks == 1:
+        signs = np.zeros(n, dtype=np.int8)
+        results = [classify_chunk(x, y, signs, 0, n)]
+        return (signs,) + merge_chunks(x, y, signs, bounds, results)
+
+    shm = shared_memory.SharedMemory(create=True, size=17 * n)
+    try:
+        shared_x = np.ndarray(n, dtype=np.float64, buffer=shm.buf)
+        shared_y = np.ndarray(n, dtype=np.float64, buffer=shm.buf, offset=8 * n)
+        shared_signs = np.ndarray(n, dtype=np.int8, buffer=shm.buf, offset=16 * n)
+        shared_x[:] = x
+        shared_y[:] = y
+        with ProcessPoolExecutor(max_workers=chunks) as executor:
+            futures = [executor.submit(classify_shared_chunk, shm.name, n, lo, hi) for lo, hi in bounds]
+            results = [future.result() for future in futures]
+        signs = shared_signs.copy()
+        del shared_x, shared_y, shared_signs
+    finally:
+        shm.close()
+        shm.unlink()
+    return (signs,) + merge_chunks(x, y, signs, bounds, results)
@@ -0,0 +1,89 @@
+"""
+Robust orientation predicate: which side of the line through a and b the point c lies on.
+
+The orientation is the sign of the cross product (bx - ax) * (cy - ay) - (cx - ax) * (by - ay),
+counted the way Polyline.is_left counts it. In floating point arithmetic rounding may flip
+the sign of a nearly zero product, so the float result is only trusted when it is bigger than
+the error bound of its computation (Shewchuk's ccwerrboundA, "Adaptive Precision Floating-Point
+Arithmetic and Fast Robust Geometric Predicates", 1997). The few uncertain cases are decided
+exactly, in integer arithmetic on the float coordinates (each float is an integer over a power of 2).
+
+The number of exact decisions is counted as 'exact_orientations' when profiling is enabled.
+NumPy is imported by the batched form (orientations) only, when it is first used.
+"""
+
+import math
+
+import profiling
+
+EPSILON = 2.0 ** -53    # half of a unit in the last place of 1.0: the rounding error bound of a float operation
+CCW_ERRBOUND_A = (3.0 + 16.0 * EPSILON) * EPSILON
+
+
+def exact_orientation(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> int:
+    """
+    Return: 1 - c left of the line from a to b, -1 - c right of it, 0 - c on it, with no rounding
+    """
+    if (ax == bx or cy == ay) and (ay == by or cx == ax):
+        # both products have a zero factor (float differences are 0 only for equal floats)
+        return 0
+    if profiling.enabled:
+        profiling.count('exact_orientations')
+    return exact_sign(ax, ay, bx, by, cx, cy)
+
+
+def exact_sign(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> int:
+    """
+    Return: the sign of the cross product counted with no rounding,
+            0 if a coordinate is infinite or NaN (the product has no sign then)
+    """
+    if not all(map(math.isfinite, (ax, ay, bx, by, cx, cy))):
+        return 0
+    # a float is an integer over a power of 2: scaled to the common denominator all of them are integers
+    ratios = [v.as_integer_ratio() for v in (ax, ay, bx, by, cx, cy)]
+    den = max(d for _, d in ratios)
+    ax, ay, bx, by, cx, cy = [n * (den // d) for n, d in ratios]
+    det = (bx - ax) * (cy - ay) - (cx - ax) * (by - ay)
+    return (det > 0) - (det < 0)
+
+
+def orientation(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> int:
+    """
+    Return: 1 - c left of the line from a to b, -1 - c right of it, 0 - c on it:
+            the sign of the float cross product, if it is certain, the exact sign otherwise
+    """
+    left = (bx - ax) * (cy - ay)
+    right = (cx - ax) * (by - ay)
+    det = left - right
+    bound = CCW_ERRBOUND_A * (abs(left) + abs(right))
+    if det > bound:
+        return 1
+    if det < -bound:
+        return -1
+    return exact_orientation(ax, ay, bx, by, cx, cy)
+
+
+def orientations(ax: float, ay: float, bx: float, by: float, x, y):
+    """
+    Batched orientation of the points (x[i], y[i]), for NumPy float64 arrays x and y:
+    the float filter is applied to all points at once, uncertain ones are decided one by one.
+    Return: int8 array of orientations
+    """
+    import numpy as np
+    dx, dy = bx - ax, by - ay
+    with np.errstate(invalid='ignore', over='ignore'):     # non-finite coordinates end up uncertain or NaN: 0
+        left = dx * (y - ay)
+        right = (x - ax) * dy
+        det = left - right
+        bound = CCW_ERRBOUND_A * (np.abs(left) + np.abs(right))
+        signs = (det > bound).astype(np.int8) - (det < -bound).astype(np.int8)
+        uncertain = np.flatnonzero(np.abs(det) <= bound)
+    if len(uncertain):
+        # points with both products certainly 0 lie on the line, the rest is decided exactly
+        on_line = ((dx == 0) | (y[uncertain] == ay)) & ((dy == 0) | (x[uncertain] == ax))
+        uncertain = uncertain[~on_line]
+        if profiling.enabled:
+            profiling.count('exact_orientations', len(uncertain))
+        for i, cx, cy in zip(uncertain.tolist(), x[uncertain].tolist(), y[uncertain].tolist()):
+            signs[i] = exact_sign(ax, ay, bx, by, cx, cy)
+    return signs
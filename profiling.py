@@ -0,0 +1,123 @@
+"""
+Opt-in instrumentation of the regions pipeline: counters and timers of its stages
+(reading data, building regions, adding crossing points, writing regions).
+
+It is disabled by default. Instrumented code then pays one flag check per stage call,
+never per vertex: per vertex counts are worked out from the results of a stage.
+
+    import profiling
+    with profiling.profile() as stats:
+        polyline.build_regions()
+    stats -> {'counters': {'vertices_classified': ..., ...},
+              'timers': {'build_regions': {'calls': 1, 'seconds': ...}, ...}}
+"""
+
+import contextlib
+import time
+from typing import Dict, Iterator
+
+enabled = False
+counters: Dict[str, int] = {}
+timers: Dict[str, Dict[str, float]] = {}
+
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+
+def reset() -> None:
+    counters.clear()
+    timers.clear()
+
+
+def count(name: str, n: int = 1) -> None:
+    counters[name] = counters.get(name, 0) + n
+
+
+def add_time(name: str, seconds: float, calls: int = 1) -> None:
+    timer = timers.setdefault(name, {'calls': 0, 'seconds': 0.0})
+    timer['calls'] += calls
+    timer['seconds'] += seconds
+
+
+class Timer:
+    """
+    Adds the time spent in a with block to the named timer
+    """
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_time(self.name, time.perf_counter() - self.start)
+
+
+NULL_TIMER = contextlib.nullcontext()
+
+
+def timer(name: str):
+    """
+    Return: a Timer of the name if instrumentation is enabled, otherwise a shared no-op context
+    """
+    return Timer(name) if enabled else NULL_TIMER
+
+
+def stats() -> dict:
+    """
+    Return: a copy of the current counters and timers
+    """
+    return {'counters': dict(counters), 'timers': {name: dict(timer) for name, timer in timers.items()}}
+
+
+def merge(other: dict) -> None:
+    """
+    Adds stats gathered elsewhere (f.e. in a worker process) to the current ones
+    """
+    for name, n in other['counters'].items():
+        count(name, n)
+    for name, timer in other['timers'].items():
+        add_time(name, timer['seconds'], timer['calls'])
+
+
+@contextlib.contextmanager
+def profile() -> Iterator[dict]:
+    """
+    Enables instrumentation, from zeroed stats, for the with block and yields a dict
+    filled with the block's stats at its end. The stats gathered before are kept and
+    the block's ones added to them, so profile blocks may be nested.
+    """
+    global enabled
+    was_enabled = enabled
+    before = stats()
+    reset()
+    enabled = True
+    result = {}
+    try:
+        yield result
+    finally:
+        result.update(stats())
+        enabled = was_enabled
+        reset()
+        merge(before)
+        if was_enabled:
+            merge(result)
+
+
+def report(stats: dict) -> str:
+    lines = ['---------- Profile ----------']
+    for name, timer in sorted(stats['timers'].items()):
+        lines.append(f"{name:<32} {timer['seconds']:>10.6f} s {timer['calls']:>10} calls")
+    for name, n in sorted(stats['counters'].items()):
+        lines.append(f'{name:<32} {n:>12}')
+    return '\n'.join(lines)
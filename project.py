@@ -6,17 +6,47 @@ The final project for CS50's Introduction to Programming with Python, 2022
 """
 
 import argparse
+from array import array
+import bisect
 import csv
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Sequence
 from dcll import DCLL, DCLLNode
+import functools
+import glob
+import itertools
+import json
+import math
+import mmap
+import operator
 import os
+from predicates import CCW_ERRBOUND_A, exact_orientation, orientation
+import profiling
+import struct
 import sys
-from typing import List, Optional, Tuple
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
 EPS = 10e-5
+REGION_BLOCK_MIN = 64     # least number of regions of a RegionBlock made for the incremental edits
+ENGINES = ('python', 'numpy', 'parallel', 'compiled', 'auto')
+STORAGES = ('list', 'array')
+
+BINARY_SUFFIX = '.plb'
+BINARY_MAGIC = b'PLB\0'
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct('<4sIqq')   # magic, version, points count, nr_max
+
+OUTPUT_MODES = ('files', 'single', 'binary', 'geojson')
+REGIONS_BINARY_SUFFIX = '.plr'
+REGIONS_MAGIC = b'PLR\0'
+REGIONS_HEADER = struct.Struct('<4sIqq')  # magic, version, regions count, points count
 
 
 class Point:
+    __slots__ = ('_x', '_y', '_nr', '_hierarchy', '_is_left', '_nr_max')
+
     def __init__(self, nr=0, x=0.0, y=0.0):
         self._x: float = x
         self._y: float = y
@@ -28,7 +58,7 @@ class Point:
         self._nr_max: int = 0
 
     def __str__(self):
-        return f"Point:{self._nr}({self._x},{self._y})"
+        return f"Point:{self.nr}({self.x},{self.y})"
 
     def __repr__(self):
         return super().__repr__()
@@ -38,8 +68,22 @@ class Point:
             return False
         return abs(self.x - other.x) <= EPS and abs(self.y - other.y) <= EPS
 
-    def __hash__(self):
-        return hash((self.x, self.y))
+    # points are equal within EPS, a relation no hash can agree with (equal points may lie
+    # on both sides of a grid cell border), so they are not hashable: lookups of equal points
+    # go through grid_keys() instead, as dcll.DataBuckets does
+    __hash__ = None
+
+    @property
+    def grid_key(self) -> Tuple[int, int]:
+        return math.floor(self.x / EPS), math.floor(self.y / EPS)
+
+    def grid_keys(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        Return: the point's own grid cell followed by its 8 neighbouring cells;
+                every point equal to this one (within EPS) lies in one of them
+        """
+        kx, ky = self.grid_key
+        return ((kx, ky),) + tuple((kx + dx, ky + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
 
     @property
     def hierarchy(self):
@@ -90,6 +134,146 @@ class Point:
         self._nr_max = nr
 
 
+class PointView(Point):
+    """
+    Point of a PointArray: its nr, x, y and is_left are read from and written to the array.
+    hierarchy and nr_max are kept by the view only.
+    """
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, store: 'PointArray', index: int):
+        self._store = store
+        self._index = index
+        self._hierarchy = None
+        self._nr_max = 0
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def x(self):
+        return self._store.x[self._index]
+
+    @x.setter
+    def x(self, x: float):
+        self._store.x[self._index] = x
+
+    @property
+    def y(self):
+        return self._store.y[self._index]
+
+    @y.setter
+    def y(self, y: float):
+        self._store.y[self._index] = y
+
+    @property
+    def nr(self):
+        return self._store.nr[self._index]
+
+    @nr.setter
+    def nr(self, nr: int):
+        self._store.nr[self._index] = nr
+
+    @property
+    def is_left(self):
+        return self._store.is_left[self._index]
+
+    @is_left.setter
+    def is_left(self, b: int):
+        self._store.is_left[self._index] = b
+
+
+class PointArray(Sequence):
+    """
+    Polyline's points stored column-wise: nr, x, y and is_left in parallel typed arrays.
+    Items are PointView objects, created only when accessed.
+    """
+    def __init__(self, nr=None, x=None, y=None, is_left=None):
+        """
+        Columns may be given as any buffers of the same length, f.e. memoryviews
+        of a memory-mapped file (see load_binary_polyline); they are copied into arrays
+        when points are added or removed for the first time (see own_columns).
+        """
+        self.nr = array('q') if nr is None else nr
+        self.x = array('d') if x is None else x
+        self.y = array('d') if y is None else y
+        self.is_left = array('b', bytes(len(self.x))) if is_left is None else is_left
+        self._buffers = not all(isinstance(column, array) for column in (self.nr, self.x, self.y, self.is_left))
+
+    def __repr__(self):
+        return f"PointArray of {len(self)} points"
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [PointView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PointArray index out of range")
+        return PointView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PointView(self, i)
+
+    def __eq__(self, other):
+        if not isinstance(other, (PointArray, list)):
+            return NotImplemented
+        return len(self) == len(other) and all(p == q for p, q in zip(self, other))
+
+    def own_columns(self) -> None:
+        """
+        Copies columns that are not arrays (f.e. memoryviews of a memory-mapped file) into arrays,
+        so that they can grow and shrink
+        """
+        for name, typecode in (('nr', 'q'), ('x', 'd'), ('y', 'd'), ('is_left', 'b')):
+            column = getattr(self, name)
+            if not isinstance(column, array):
+                copy = array(typecode)
+                copy.frombytes(memoryview(column).cast('B'))
+                setattr(self, name, copy)
+        self._buffers = False
+
+    def append(self, point: Point) -> None:
+        if self._buffers:
+            self.own_columns()
+        self.nr.append(point.nr)
+        self.x.append(point.x)
+        self.y.append(point.y)
+        self.is_left.append(point.is_left)
+
+    def extend(self, nr: array, x: array, y: array) -> None:
+        """
+        Appends whole columns of points (is_left of the new points is 0)
+        """
+        if self._buffers:
+            self.own_columns()
+        self.nr.extend(nr)
+        self.x.extend(x)
+        self.y.extend(y)
+        self.is_left.frombytes(bytes(len(x)))
+
+    def insert(self, index: int, point: Point) -> None:
+        if self._buffers:
+            self.own_columns()
+        self.nr.insert(index, point.nr)
+        self.x.insert(index, point.x)
+        self.y.insert(index, point.y)
+        self.is_left.insert(index, point.is_left)
+
+    def __delitem__(self, index: int) -> None:
+        if self._buffers:
+            self.own_columns()
+        del self.nr[index]
+        del self.x[index]
+        del self.y[index]
+        del self.is_left[index]
+
+
 class StarshapedNode:
     """
     Starshaped list node: stores a deque of points that define a starshaped part of a polyline
@@ -152,10 +336,10 @@ class StarshapedNode:
     def pts_count(self, c: int):
         self._pts_count = c
 
-    def append_point(self, pt: Point) -> Point:
-        self.pts_list.append(pt)
+    def append_point(self, pt: Point) -> DCLLNode:
+        node = self.pts_list.append(pt)
         self.pts_count += 1
-        return self.pts_list[self.pts_count - 1]
+        return node
 
 
 class StarshapedList:
@@ -205,11 +389,71 @@ class StarshapedList:
         return self.starshaped_nodes_list[len(self.starshaped_nodes_list) - 1]
 
 
+class RegionPoints(Sequence):
+    """
+    Points of a region kept as a span of polyline's points: they are taken from
+    the polyline's storage only when accessed, no list of them is kept.
+    """
+    __slots__ = ('_region',)
+
+    def __init__(self, region: 'RegionNode'):
+        self._region = region
+
+    def __repr__(self):
+        return f"RegionPoints of {len(self)} points"
+
+    def __len__(self):
+        return self._region.reg_pts_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        region = self._region
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("RegionPoints index out of range")
+        if region.lead is not None:
+            if index == 0:
+                return region.lead
+            index -= 1
+        if index > region.end - region.start:
+            return region.trail
+        return region.pts[region.start + index]
+
+    def __iter__(self):
+        region = self._region
+        if region.lead is not None:
+            yield region.lead
+        pts = region.pts
+        for i in range(region.start, region.end + 1):
+            yield pts[i]
+        if region.trail is not None:
+            yield region.trail
+
+    def __reversed__(self):
+        region = self._region
+        if region.trail is not None:
+            yield region.trail
+        pts = region.pts
+        for i in range(region.end, region.start - 1, -1):
+            yield pts[i]
+        if region.lead is not None:
+            yield region.lead
+
+
 class RegionNode:
     """
     Regions list node: stores a deque of starshaped lists of a polyline,
-    that define the polyline region to be further simplified
+    that define the polyline region to be further simplified.
+    Region's points are either stored in a deque (reg_pts_list) or, for regions built by
+    Polyline.build_regions, kept as a span: the polyline's vertices start to end, preceded
+    and followed by a crossing point (lead, trail) if the region starts or ends with one.
+    Id and span of a region of a RegionBlock are kept relative to the block's offsets.
     """
+    __slots__ = ('_id', '_hierarchy', '_area_sum', '_reg_pts_list', '_reg_pts_count', '_starshaped_list',
+                 '_pts', '_start', '_end', '_lead', '_trail', '_block')
+
     def __init__(self, id=0, area=0):
         self._id: int = id
         self._hierarchy: int = 0
@@ -217,6 +461,12 @@ class RegionNode:
         self._reg_pts_list: Optional[deque[Point]] = None
         self._reg_pts_count: int = 0
         self._starshaped_list: Optional[StarshapedList] = None
+        self._pts: Optional[Union[List[Point], 'PointArray']] = None     # polyline's points of a span
+        self._start: int = 0
+        self._end: int = -1
+        self._lead: Optional[Point] = None
+        self._trail: Optional[Point] = None
+        self._block: Optional[RegionBlock] = None
 
     def __str__(self):
         if self.starshaped_list is not None:
@@ -235,7 +485,7 @@ class RegionNode:
                 snl = self.starshaped_list.starshaped_nodes_list
                 bf = os.path.basename(__file__)
                 jn = ', '.join([f'{str(snl[i])}' for i in range(len(snl))])
-                return f"<{bf.split('.')[0]}.RegionNode object: ID: {self._id} with Starshaped List: [{jn}]>"
+                return f"<{bf.split('.')[0]}.RegionNode object: ID: {self.id} with Starshaped List: [{jn}]>"
             else:
                 return super().__repr__()
         else:
@@ -243,11 +493,11 @@ class RegionNode:
 
     @property
     def id(self):
-        return self._id
+        return self._id if self._block is None else self._id + self._block.id_offset
 
     @id.setter
     def id(self, i: int):
-        self._id = i
+        self._id = i if self._block is None else i - self._block.id_offset
 
     @property
     def hierarchy(self):
@@ -267,6 +517,8 @@ class RegionNode:
 
     @property
     def reg_pts_list(self):
+        if self._reg_pts_list is None and self._pts is not None:
+            return RegionPoints(self)
         return self._reg_pts_list
 
     @reg_pts_list.setter
@@ -275,6 +527,8 @@ class RegionNode:
 
     @property
     def reg_pts_count(self):
+        if self._pts is not None:
+            return self._end - self._start + 1 + (self._lead is not None) + (self._trail is not None)
         return self._reg_pts_count
 
     @reg_pts_count.setter
@@ -283,12 +537,112 @@ class RegionNode:
 
     @property
     def starshaped_list(self):
+        if self._starshaped_list is None and self._pts is not None:
+            # created when first needed, as most regions of big polylines never need one
+            self._starshaped_list = StarshapedList()
+            self._starshaped_list.starshaped_nodes_list = deque()
         return self._starshaped_list
 
     @starshaped_list.setter
     def starshaped_list(self, sl: StarshapedList):
         self._starshaped_list = sl
 
+    @property
+    def pts(self):
+        return self._pts
+
+    @property
+    def start(self):
+        return self._start if self._block is None else self._start + self._block.pos_offset
+
+    @start.setter
+    def start(self, i: int):
+        self._start = i if self._block is None else i - self._block.pos_offset
+
+    @property
+    def end(self):
+        return self._end if self._block is None else self._end + self._block.pos_offset
+
+    @end.setter
+    def end(self, i: int):
+        self._end = i if self._block is None else i - self._block.pos_offset
+
+    @property
+    def lead(self):
+        return self._lead
+
+    @lead.setter
+    def lead(self, pt: Optional[Point]):
+        self._lead = pt
+
+    @property
+    def trail(self):
+        return self._trail
+
+    @trail.setter
+    def trail(self, pt: Optional[Point]):
+        self._trail = pt
+
+    def set_span(self, pts, start: int, end: int, lead: Optional[Point] = None, trail: Optional[Point] = None) -> None:
+        """
+        Makes the region a span of pts: lead, pts[start], ..., pts[end], trail (lead and trail if not None)
+        """
+        self._pts = pts
+        self._start = start
+        self._end = end
+        self._lead = lead
+        self._trail = trail
+
+    def add_pt(self, pt: Point) -> None:
+        self.reg_pts_count += 1
+        self.reg_pts_list.append(pt)
+        return None
+
+
+class RegionBlock:
+    """
+    Run of consecutive regions of a polyline, made for the incremental edits (see Polyline.update_regions).
+    Ids and spans of its regions are kept relative to the block's offsets, so all regions
+    of the block are renumbered and moved along the polyline by changing the offsets only.
+    """
+    __slots__ = ('regions', 'starts', 'id_offset', 'pos_offset')
+
+    def __init__(self, regions: List[RegionNode], id_offset: int = 0, pos_offset: int = 0):
+        """
+        regions - in the polyline's order
+        """
+        self.regions = regions
+        self.id_offset = id_offset
+        self.pos_offset = pos_offset
+        for region in regions:
+            self.adopt(region)
+        # relative starts of the regions, to bisect
+        self.starts = [region._start for region in regions]
+
+    def adopt(self, region: RegionNode) -> RegionNode:
+        """
+        Makes region's id and span relative to the block's offsets, keeping their values
+        """
+        reg_id, start, end = region.id, region.start, region.end
+        region._block = self
+        region._id = reg_id - self.id_offset
+        region._start = start - self.pos_offset
+        region._end = end - self.pos_offset
+        return region
+
+    def first_start(self) -> int:
+        return self.starts[0] + self.pos_offset
+
+    def split(self) -> 'RegionBlock':
+        """
+        Moves the second half of the regions into a new block, returned
+        """
+        half = len(self.regions) // 2
+        block = RegionBlock(self.regions[half:], self.id_offset, self.pos_offset)
+        del self.regions[half:]
+        del self.starts[half:]
+        return block
+
 
 class RegionList:
     """
@@ -298,6 +652,10 @@ class RegionList:
     def __init__(self):
         self._region_nodes_list: Optional[deque[RegionNode]] = None
         self._count: int = 0
+        # regions in RegionBlocks, kept by the incremental edits (see Polyline.region_blocks);
+        # region_nodes_list is made of them again when read after they were changed
+        self._blocks: Optional[List[RegionBlock]] = None
+        self._blocks_changed: bool = False
 
     def __str__(self):
         if self.region_nodes_list is not None:
@@ -322,11 +680,31 @@ class RegionList:
 
     @property
     def region_nodes_list(self):
+        if self._blocks_changed:
+            # stored last first
+            self._region_nodes_list = deque(itertools.chain.from_iterable(
+                reversed(block.regions) for block in reversed(self._blocks)))
+            self._blocks_changed = False
         return self._region_nodes_list
 
     @region_nodes_list.setter
     def region_nodes_list(self, queue: deque[RegionNode]):
         self._region_nodes_list = queue
+        self._blocks = None
+        self._blocks_changed = False
+
+    @property
+    def blocks(self):
+        return self._blocks
+
+    @blocks.setter
+    def blocks(self, blocks: Optional[List[RegionBlock]]):
+        if self._blocks_changed:
+            self.region_nodes_list
+        self._blocks = blocks
+
+    def blocks_changed(self) -> None:
+        self._blocks_changed = True
 
     @property
     def count(self):
@@ -349,16 +727,84 @@ class RegionList:
         self.region_nodes_list[0].reg_pts_list.append(pt)
         return None
 
+    def add_pts(self, pts: List[Point]) -> None:
+        self.region_nodes_list[0].reg_pts_count += len(pts)
+        self.region_nodes_list[0].reg_pts_list.extend(pts)
+        return None
+
+
+class BaseLine:
+    """
+    The line through polyline's first and last point, dividing the polyline into regions.
+    Its coefficients are counted once, so that points can be checked against it and segments
+    crossed with it with no repeated work and no Point objects created.
+    """
+    __slots__ = ('sx', 'sy', 'ex', 'ey', 'dx', 'dy', 'a1', 'b1', 'c1')
+
+    def __init__(self, start: Point, end: Point):
+        self.sx, self.sy = start.x, start.y
+        self.ex, self.ey = ex, ey = end.x, end.y
+        self.dx = ex - self.sx
+        self.dy = ey - self.sy
+        # the same coefficients as Polyline.line_intersection counts for Line1 (start, end)
+        self.a1 = ey - self.sy
+        self.b1 = self.sx - ex
+        self.c1 = ex * self.sy - self.sx * ey
+
+    def side(self, x: float, y: float) -> float:
+        """
+        Return: the same value as Polyline.is_left for the point (x, y)
+        """
+        return self.dx * (y - self.sy) - (x - self.sx) * self.dy
+
+    def sign(self, x: float, y: float) -> int:
+        """
+        Return: is_left value of the point (x, y): 1 - left of the line, -1 - right of it, 0 - on it,
+                exact even where rounding makes the sign of side uncertain (see predicates.py)
+        """
+        left = self.dx * (y - self.sy)
+        right = (x - self.sx) * self.dy
+        lv = left - right
+        bound = CCW_ERRBOUND_A * (abs(left) + abs(right))
+        if lv > bound:
+            return 1
+        if lv < -bound:
+            return -1
+        return exact_orientation(self.sx, self.sy, self.ex, self.ey, x, y)
+
+    def crossing(self, x3: float, y3: float, x4: float, y4: float) -> Optional[Tuple[float, float]]:
+        """
+        Counts the intersection point of the line and the line through (x3, y3) and (x4, y4),
+        the same way Polyline.line_intersection does.
+        Return: intersection point's coordinates, None if the lines are parallel
+        """
+        a2 = y4 - y3
+        b2 = x3 - x4
+        c2 = x4 * y3 - x3 * y4
+        denominator = self.a1 * b2 - a2 * self.b1
+        if denominator == 0:
+            return None
+        return (self.b1 * c2 - b2 * self.c1) / denominator, (a2 * self.c1 - self.a1 * c2) / denominator
+
 
 class Polyline:
-    def __init__(self, id=None):
+    def __init__(self, id=None, storage='list'):
+        """
+        storage - 'list' (a list of Point objects) or 'array' (a PointArray, using much less memory)
+        """
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown storage: {storage}, expected one of: {', '.join(STORAGES)}")
         self._id: int = id
-        self.pts_list: List[Point] = []  # arrPts in phD code
+        self.pts_list: Union[List[Point], PointArray] = PointArray() if storage == 'array' else []  # arrPts in phD code
         self._pts_count: int = 0
         self._intersect_pts_list: Optional[DCLL] = None
         self._intersect_pts_count: int = 0
         self._region_list: Optional[RegionList] = None
         self._pts_list_nr_max: int = 0
+        # regions patched by the incremental edits (see update_regions): the region list built
+        # by build_regions and its engine
+        self._built_region_list: Optional[RegionList] = None
+        self._build_engine: str = 'python'
 
     def __str__(self):
         if self._pts_count == 0:
@@ -425,12 +871,41 @@ class Polyline:
     def pts_list_nr_max(self, nr_max: int):
         self._pts_list_nr_max = nr_max
 
+    @property
+    def storage(self):
+        return 'array' if isinstance(self.pts_list, PointArray) else 'list'
+
     def add_point(self, point: Point) -> Point:
         self.pts_list.append(point)
         self.pts_count += 1
         self._pts_list_nr_max = max(point.nr, self.pts_list_nr_max)
         return self.pts_list[self.pts_count - 1]
 
+    def coordinates(self) -> Tuple:
+        """
+        Return: NumPy float64 arrays of points' x and y (sharing memory with a PointArray storage)
+        """
+        import vectorized
+        np = vectorized.require_numpy()
+        if isinstance(self.pts_list, PointArray):
+            return np.frombuffer(self.pts_list.x, dtype=np.float64), np.frombuffer(self.pts_list.y, dtype=np.float64)
+        x = np.fromiter((pt.x for pt in self.pts_list), dtype=np.float64, count=self.pts_count)
+        y = np.fromiter((pt.y for pt in self.pts_list), dtype=np.float64, count=self.pts_count)
+        return x, y
+
+    def set_is_left(self, signs) -> None:
+        """
+        Stores is_left values (a NumPy int8 array) of the inner points, the first and the last one are skipped
+        """
+        n = self.pts_count
+        if n < 3:
+            return
+        if isinstance(self.pts_list, PointArray):
+            memoryview(self.pts_list.is_left)[1:n - 1] = memoryview(signs[1:n - 1])
+        else:
+            for pt, s in zip(self.pts_list[1:n - 1], signs[1:n - 1].tolist()):
+                pt.is_left = s
+
     @staticmethod
     def is_left(pt: Point, start: Point, end: Point) -> float:
         """
@@ -450,6 +925,17 @@ class Polyline:
         """
         return (end.x - start.x)*(pt.y - start.y) - (pt.x - start.x)*(end.y - start.y)
     
+    @staticmethod
+    def orientation(pt: Point, start: Point, end: Point) -> int:
+        """
+        Robust version of is_left_value(is_left(pt, start, end)): the sign of the same cross product,
+        but exact, also where rounding of is_left would flip it (see predicates.py)
+        Return: int   1 for pt left of the line through start and end
+                      0 for pt on the line
+                     -1 for pt right of the line
+        """
+        return orientation(start.x, start.y, end.x, end.y, pt.x, pt.y)
+
     @staticmethod
     def is_left_value(lv: float) -> int:
         if lv < 0:
@@ -461,17 +947,21 @@ class Polyline:
 
     def build_intersect_pts_list(self) -> DCLLNode:
         if not self.intersect_pts_list:
-            self.intersect_pts_list = DCLL()
+            self.intersect_pts_list = DCLL(index_data=True)
         self.intersect_pts_list.append(self.pts_list[0])
         self.intersect_pts_count += 1
-        return self.intersect_pts_list[0]
+        return self.intersect_pts_list.head
 
     def add_intersect_point(self, point: Point) -> DCLLNode:
+        if profiling.enabled:
+            start = time.perf_counter()
         if not self.intersect_pts_list:
             self.build_intersect_pts_list()
-        self.intersect_pts_list.append(point)
+        node = self.intersect_pts_list.append(point)
         self.intersect_pts_count += 1
-        return self.intersect_pts_list[self.intersect_pts_count - 1]
+        if profiling.enabled:
+            profiling.add_time('add_intersect_point', time.perf_counter() - start)
+        return node
 
     def line_intersection(self, p1: Point, p2: Point, p3: Point, p4: Point) -> Tuple[bool, Optional[Point]]:
         """
@@ -503,105 +993,883 @@ class Polyline:
 
         return True, pt_int
 
-    def start_new_region(self, reg_id=0) -> int:
-        if self.region_list is None:
-            self.region_list = RegionList()
-            self.region_list.region_nodes_list = deque()
+    @staticmethod
+    def new_region_node(reg_id=0) -> RegionNode:
         reg_node = RegionNode(id=reg_id)
         reg_node.starshaped_list = StarshapedList()
         reg_node.starshaped_list.starshaped_nodes_list = deque()
         reg_node.reg_pts_list = deque()
-        self.region_list.prepend(reg_node)
+        return reg_node
+
+    def new_region_span(self, reg_id: int, start: int, end: int, lead: Optional[Point] = None,
+                        trail: Optional[Point] = None) -> RegionNode:
+        """
+        Return: a new region node of polyline's vertices start to end, with crossing points lead and trail
+        """
+        reg_node = RegionNode(id=reg_id)
+        reg_node.set_span(self.pts_list, start, end, lead, trail)
+        return reg_node
+
+    def start_new_region(self, reg_id=0) -> int:
+        if self.region_list is None:
+            self.region_list = RegionList()
+            self.region_list.region_nodes_list = deque()
+        self.region_list.prepend(self.new_region_node(reg_id))
         self.region_list.count += 1
         return reg_id + 1
 
-    def build_regions(self) -> bool:
+    def build_regions(self, engine: str = 'python') -> bool:
         """
         Divides a polyline into regions, to be further simplified
+        engine - 'python' (point by point), 'numpy' (vectorized, see vectorized.py),
+                 'parallel' (vectorized in chunks by worker processes, see parallel.py),
+                 'compiled' (Numba compiled kernel, see kernel.py) or 'auto' ('compiled'
+                 if Numba is installed and works, 'python' otherwise), all of them build identical region lists
+        """
+        if engine == 'auto':
+            import kernel
+            engine = 'compiled' if kernel.usable() else 'python'
+        if engine == 'numpy':
+            build = self.build_regions_numpy
+        elif engine == 'parallel':
+            build = self.build_regions_parallel
+        elif engine == 'compiled':
+            build = self.build_regions_compiled
+        elif engine == 'python':
+            build = self.build_regions_python
+        else:
+            raise ValueError(f"Unknown engine: {engine}, expected one of: {', '.join(ENGINES)}")
+        self._build_engine = engine
+        if not profiling.enabled:
+            res = build()
+            self.mark_regions_built()
+            return res
+
+        nr_max = self.pts_list_nr_max
+        with profiling.timer('build_regions'):
+            res = build()
+        self.mark_regions_built()
+        regions = self.region_list.count if res else 0
+        profiling.count('vertices_classified', max(self.pts_count - 2, 0))
+        profiling.count('regions_started', regions)
+        profiling.count('sign_changes', max(regions - 1, 0))
+        profiling.count('intersections', self.pts_list_nr_max - nr_max)
+        return res
+
+    def mark_regions_built(self) -> None:
         """
-        next_reg_id = self.start_new_region(1)
+        Marks the region list as the one build_regions made, to be patched by the incremental edits
+        """
+        self._built_region_list = self.region_list
+        if self.region_list is not None:
+            self.region_list.blocks = None
+
+    def build_regions_python(self) -> bool:
+        """
+        Divides a polyline into regions point by point (see iter_region_spans)
+        """
+        if self.pts_count == 0:
+            self.start_new_region(1)
+            return False
+
+        if self.region_list is None:
+            self.region_list = RegionList()
+            self.region_list.region_nodes_list = deque()
+        pts = self.pts_list
+        reg_id = 0
+        for start, end, lead, trail in self.iter_region_spans(pts, pts[0], pts[self.pts_count - 1]):
+            reg_id += 1
+            self.region_list.prepend(self.new_region_span(reg_id, start, end, lead, trail))
+        self.region_list.count += reg_id
+        return True
+
+    def iter_region_spans(self, points: Iterable[Point], start: Point, end: Point, keep_intersections: bool = True,
+                          first_index: int = 0, first_is_left: int = 0) -> Iterator[Tuple]:
+        """
+        Divides a stream of polyline's points into regions, yielding each region as soon as it is finished,
+        as a span: (index of its first vertex, index of its last vertex, crossing point it starts with
+        or None, crossing point it ends with or None). Only one point of look-behind (and one of
+        look-ahead, to tell the last point) is kept, so the points may be read lazily, f.e. from a file.
+        Input:  points - polyline's points, from the first to the last one
+                start, end - polyline's first and last point, defining the line dividing regions
+                keep_intersections - if crossing points are to be stored on intersect_pts_list as well
+                first_index, first_is_left - index and is_left of the first point,
+                    if the points start inside the polyline
+        Crossing points are numbered after pts_list_nr_max.
+        """
+        points = iter(points)
+        first = next(points, None)
+        if first is None:
+            return
+        pt = next(points, None)
+        if pt is None:
+            # a single point polyline ends where it starts
+            yield first_index, first_index, None, first
+            return
+
+        base_line = BaseLine(start, end)
+        sx, sy, dx, dy = base_line.sx, base_line.sy, base_line.dx, base_line.dy
+        errbound = CCW_ERRBOUND_A
+        profiled = profiling.enabled
+        region_start = first_index
+        lead = None
+        i = first_index + 1     # index of pt
+        prev_is_left: int = first_is_left
+        prev_x, prev_y = first.x, first.y
+
+        for next_pt in points:
+            # pt is an inner point, as it is followed by next_pt
+            x, y = pt.x, pt.y
+            # BaseLine.sign, inlined
+            left = dx * (y - sy)
+            right = (x - sx) * dy
+            lv = left - right
+            bound = errbound * ((left if left > 0 else -left) + (right if right > 0 else -right))
+            if lv > bound:
+                current_is_left = 1
+            elif lv < -bound:
+                current_is_left = -1
+            else:
+                current_is_left = base_line.sign(x, y)
+            pt.is_left = current_is_left
+
+            if current_is_left != prev_is_left:
+                if current_is_left == 0:
+                    # the point on the line ends the region and starts the next one
+                    yield region_start, i, lead, None
+                    region_start = i
+                    lead = None
+                elif prev_is_left != 0:   # the point is on the other side of the line than the previous one
+                    intersection_point = None
+                    if profiled:
+                        crossing_start = time.perf_counter()
+                    if current_is_left == 1:  # point is on the left side of intersection line
+                        crossing = base_line.crossing(x, y, prev_x, prev_y)
+                    else:  # point is on the right side of intersection line
+                        crossing = base_line.crossing(prev_x, prev_y, x, y)
+                    if profiled:
+                        profiling.add_time('build_regions.intersections', time.perf_counter() - crossing_start)
+                    if crossing:
+                        # the crossing point is materialized only now, as it joins the regions
+                        self.pts_list_nr_max += 1
+                        intersection_point = Point(nr=self.pts_list_nr_max, x=crossing[0], y=crossing[1])
+                        if keep_intersections:
+                            self.add_intersect_point(intersection_point)
+
+                    yield region_start, i - 1, lead, intersection_point
+                    region_start = i
+                    lead = intersection_point
+                prev_is_left = current_is_left
+            prev_x, prev_y = x, y
+            pt = next_pt
+            i += 1
+
+        # the last polyline point ends the last region
+        yield region_start, i, lead, None
+
+    def iter_regions(self, points: Iterable[Point], start: Point, end: Point,
+                     keep_intersections: bool = True) -> Iterator[RegionNode]:
+        """
+        Divides a stream of polyline's points into regions (see iter_region_spans), yielding
+        each region, with its points, as soon as it is finished. Only the points of the current
+        region are kept.
+        """
+        buffer = deque()    # points of the current region and the ones read ahead
+        buffer_start = 0    # index of buffer[0]
+
+        def buffered():
+            for pt in points:
+                buffer.append(pt)
+                yield pt
+
+        reg_id = 0
+        for region_start, region_end, lead, trail in self.iter_region_spans(buffered(), start, end,
+                                                                            keep_intersections):
+            for _ in range(region_start - buffer_start):
+                buffer.popleft()
+            buffer_start = region_start
+            reg_id += 1
+            region = self.new_region_node(reg_id)
+            if lead is not None:
+                region.add_pt(lead)
+            for pt in itertools.islice(buffer, region_end - region_start + 1):
+                region.add_pt(pt)
+            if trail is not None:
+                region.add_pt(trail)
+            yield region
+
+    def build_regions_numpy(self) -> bool:
+        """
+        Divides a polyline into regions using NumPy: classifies all points and counts
+        all crossing points in batches, then splits regions by slicing pts_list
+        """
+        import vectorized
+
+        x, y = self.coordinates()
+        with profiling.timer('build_regions.classify'):
+            signs = vectorized.classify(x, y)
+            changes = vectorized.find_changes(signs)
+        with profiling.timer('build_regions.intersections'):
+            cx, cy = vectorized.crossings(x, y, signs, changes)
+
+        self.set_is_left(signs)
+        with profiling.timer('build_regions.assemble'):
+            return self.assemble_regions(signs.tolist(), changes.tolist(), cx.tolist(), cy.tolist())
+
+    def build_regions_parallel(self, workers: Optional[int] = None, min_chunk: Optional[int] = None) -> bool:
+        """
+        Divides a polyline into regions the way build_regions_numpy does, but points are classified
+        and crossing points counted in chunks by worker processes (see parallel.py)
+        """
+        import parallel
+
+        x, y = self.coordinates()
+        with profiling.timer('build_regions.classify'):
+            signs, changes, cx, cy = parallel.classify_parallel(x, y, workers, min_chunk or parallel.MIN_CHUNK)
+
+        self.set_is_left(signs)
+        with profiling.timer('build_regions.assemble'):
+            return self.assemble_regions(signs.tolist(), changes.tolist(), cx.tolist(), cy.tolist())
+
+    def build_regions_compiled(self) -> bool:
+        """
+        Divides a polyline into regions the way build_regions_numpy does, but points are classified
+        and crossing points counted by the Numba compiled kernel, in single passes (see kernel.py)
+        """
+        import kernel
+        if not kernel.available():
+            raise ImportError("The compiled engine requires Numba: pip install numba")
 
-        if self.pts_count > 0:
-            self.region_list.add_pt(self.pts_list[0])
+        x, y = self.coordinates()
+        with profiling.timer('build_regions.classify'):
+            signs, changes, cx, cy = kernel.classify_crossings(x, y)
 
-            # current_is_left: Optional[int] = None
-            prev_is_left: int = 0
+        self.set_is_left(signs)
+        with profiling.timer('build_regions.assemble'):
+            return self.assemble_regions(signs.tolist(), changes.tolist(), cx.tolist(), cy.tolist())
 
-            for i in range(1, self.pts_count - 1):
-                current_is_left = self.is_left_value(self.is_left(self.pts_list[i], self.pts_list[0],
-                                                                  self.pts_list[self.pts_count - 1]))
-                self.pts_list[i].is_left = current_is_left
+    def assemble_regions(self, signs, changes, crossing_x, crossing_y) -> bool:
+        """
+        Builds the region list from the points' classification made beforehand
+        (by a vectorized engine), exactly as build_regions does point by point.
+        Regions are spans of pts_list, so the work done here grows with the number of regions only.
+        Input:  signs - is_left values of the points
+                changes - ascending indices i where a new region starts (see vectorized.find_changes)
+                crossing_x, crossing_y - for each change: coordinates of the crossing point
+                    of segment (i - 1, i) and the start-end line, NaN if there is none
+        """
+        if self.pts_count == 0:
+            self.start_new_region(1)
+            return False
+
+        if self.region_list is None:
+            self.region_list = RegionList()
+            self.region_list.region_nodes_list = deque()
+        regions = self.region_list.region_nodes_list
+        reg_id = 1
+        region_start = 0
+        lead = None
+        for i, ix, iy in zip(changes, crossing_x, crossing_y):
+            if signs[i] == 0:
+                # the point on the line ends the region and starts the next one
+                regions.appendleft(self.new_region_span(reg_id, region_start, i, lead))
+                lead = None
+            else:
+                intersection_point = None
+                if not math.isnan(ix):
+                    self.pts_list_nr_max += 1
+                    intersection_point = Point(nr=self.pts_list_nr_max, x=ix, y=iy)
+                    self.add_intersect_point(intersection_point)
+                regions.appendleft(self.new_region_span(reg_id, region_start, i - 1, lead, intersection_point))
+                lead = intersection_point
+            region_start = i
+            reg_id += 1
+
+        # the last polyline point ends the last region
+        last = self.pts_count - 1
+        regions.appendleft(self.new_region_span(reg_id, region_start, last, lead,
+                                                self.pts_list[0] if last == 0 else None))
+        self.region_list.count += reg_id
+        return True
+
+    def update_point(self, index: int, x: float, y: float) -> Point:
+        """
+        Moves the point at index to (x, y), patching built regions locally (see update_regions)
+        Return: the moved point
+        """
+        if not 0 <= index < self.pts_count:
+            raise IndexError(f"Point index out of range: {index}, size: {self.pts_count}")
+        pt = self.pts_list[index]
+        pt.x, pt.y = x, y
+        self.edit_regions(index, index + 1, 0, index in (0, self.pts_count - 1))
+        return pt
+
+    def insert_point(self, index: int, point: Point) -> Point:
+        """
+        Inserts point before the point at index (index pts_count appends it),
+        patching built regions locally (see update_regions)
+        Return: the inserted point
+        """
+        if not 0 <= index <= self.pts_count:
+            raise IndexError(f"Point index out of range: {index}, size: {self.pts_count}")
+        self.pts_list.insert(index, point)
+        self.pts_count += 1
+        self.pts_list_nr_max = max(point.nr, self.pts_list_nr_max)
+        self.edit_regions(index, index, 1, index in (0, self.pts_count - 1))
+        return self.pts_list[index]
+
+    def delete_point(self, index: int) -> Point:
+        """
+        Deletes the point at index, patching built regions locally (see update_regions)
+        Return: the deleted point
+        """
+        if not 0 <= index < self.pts_count:
+            raise IndexError(f"Point index out of range: {index}, size: {self.pts_count}")
+        pt = self.pts_list[index]
+        if isinstance(pt, PointView):
+            pt = Point(nr=pt.nr, x=pt.x, y=pt.y)
+        del self.pts_list[index]
+        self.pts_count -= 1
+        self.edit_regions(index, index + 1, -1, index in (0, self.pts_count))
+        return pt
+
+    def edit_regions(self, lo: int, hi: int, shift: int, base_line_moved: bool) -> None:
+        """
+        Brings built regions up to date after an edit of the points: locally, with update_regions,
+        or by building them again if the first or the last point (so the base line) changed
+        or if the regions were not made by build_regions (f.e. restored from a cache)
+        """
+        if self.region_list is None:
+            return
+        if base_line_moved or self._built_region_list is not self.region_list:
+            self.rebuild_regions()
+            return
+        with profiling.timer('update_regions'):
+            self.update_regions(lo, hi, shift)
+
+    def rebuild_regions(self) -> bool:
+        """
+        Drops the regions and crossing points and builds them again, with the last used engine
+        """
+        self.region_list = None
+        self.intersect_pts_list = None
+        self.intersect_pts_count = 0
+        return self.build_regions(self._build_engine)
+
+    def region_starts(self) -> List[int]:
+        """
+        Return: index of the first vertex of each region, in the polyline's order
+        """
+        return [region.start for region in reversed(self.region_list.region_nodes_list)]
 
-                if current_is_left == prev_is_left:
-                    self.region_list.add_pt(self.pts_list[i])
+    def region_blocks(self) -> List[RegionBlock]:
+        """
+        Return: the regions in RegionBlocks of about the square root of their number each, in the
+        polyline's order, made on the first call and kept up to date by update_regions
+        """
+        region_list = self.region_list
+        if region_list.blocks is None:
+            regions = list(reversed(region_list.region_nodes_list))
+            size = max(REGION_BLOCK_MIN, math.isqrt(len(regions)))
+            region_list.blocks = [RegionBlock(regions[i:i + size]) for i in range(0, len(regions), size)]
+        return region_list.blocks
+
+    def update_regions(self, lo: int, hi: int, shift: int) -> None:
+        """
+        Patches built regions after an edit of inner points. A region starts where a vertex's side
+        of the base line differs from the previous vertex's one, so only region starts between
+        lo and hi may change. The regions from the last one starting before lo to the first one
+        starting after hi (both of them kept) are built again and their crossing points are
+        replaced on intersect_pts_list. The regions after them are renumbered (and for inserted
+        or deleted points moved) by the offsets of their RegionBlocks (see region_blocks), so an edit
+        costs O(size of the rebuilt regions + size of a block + number of blocks).
+        Input:  lo, hi - range of the vertices (numbered as before the edit) whose regions may start anew
+                shift - change of the number of points: vertices after hi moved by it
+        """
+        blocks = self.region_blocks()
+        count = self.region_list.count
+        pts = self.pts_list
+        firsts = [block.first_start() for block in blocks]
+        # the last region starting before lo: regions[i_lo] of blocks[b_lo]
+        b_lo = bisect.bisect_left(firsts, lo) - 1
+        block = blocks[b_lo]
+        i_lo = bisect.bisect_left(block.starts, lo - block.pos_offset) - 1
+        # the first region starting after hi, if any: regions[i_end] of blocks[b_end]
+        b_end = bisect.bisect_right(firsts, hi) - 1
+        i_end = bisect.bisect_right(blocks[b_end].starts, hi - blocks[b_end].pos_offset)
+        if i_end == len(blocks[b_end].regions) and b_end + 1 < len(blocks):
+            b_end, i_end = b_end + 1, 0
+        end_block = blocks[b_end]
+        end_region = end_block.regions[i_end] if i_end < len(end_block.regions) else None
+        if b_lo == b_end:
+            old_regions = block.regions[i_lo:i_end]
+        else:
+            old_regions = block.regions[i_lo:] + [region for b in blocks[b_lo + 1:b_end] for region in b.regions] \
+                + end_block.regions[:i_end]
+
+        first_id, a, lead = old_regions[0].id, old_regions[0].start, old_regions[0].lead
+        old_crossings = [region.lead for region in old_regions[1:] if region.lead is not None]
+        if end_region is not None:
+            end_lead = end_region.lead
+            stop = end_region.start + shift + 1
+        else:
+            end_lead = None
+            stop = self.pts_count
+
+        spans = list(self.iter_region_spans((pts[i] for i in range(a, stop)), pts[0], pts[self.pts_count - 1],
+                                            keep_intersections=False, first_index=a,
+                                            first_is_left=pts[a].is_left if a else 0))
+        new_regions = [self.new_region_span(first_id + k, *span) for k, span in enumerate(spans)]
+        new_regions[0].lead = lead
+        if end_region is not None and pts[stop - 1].is_left != 0:
+            # the kept region starts with its own vertex, so the region before it ends
+            # at the vertex before, with the kept region's crossing point (if any)
+            new_regions[-1].end = stop - 2
+            new_regions[-1].trail = end_lead
+        new_crossings = [region.lead for region in new_regions[1:] if region.lead is not None]
+
+        # crossing points in the polyline's order
+        if old_crossings or new_crossings:
+            ipl = self.intersect_pts_list
+            if old_crossings:
+                anchor = ipl.find_node_by_data(old_crossings[0]).prev
+            elif lead is not None:
+                anchor = ipl.find_node_by_data(lead)
+            elif end_lead is not None:
+                anchor = ipl.find_node_by_data(end_lead).prev
+            else:
+                anchor = ipl.head if ipl else None
+                earlier = itertools.chain(reversed(block.regions[:i_lo]),
+                                          *(reversed(b.regions) for b in reversed(blocks[:b_lo])))
+                for region in earlier:
+                    if region.lead is not None:
+                        anchor = ipl.find_node_by_data(region.lead)
+                        break
+            for crossing in old_crossings:
+                ipl.delete_data(crossing)
+            self.intersect_pts_count -= len(old_crossings)
+            for crossing in new_crossings:
+                if anchor is None:
+                    anchor = self.add_intersect_point(crossing)
                 else:
-                    if current_is_left == 0:
-                        self.region_list.add_pt(self.pts_list[i])
-
-                        next_reg_id = self.start_new_region(next_reg_id)
-                        self.region_list.add_pt(self.pts_list[i])
-
-                        prev_is_left = current_is_left
-                    elif (prev_is_left == 1 and current_is_left == -1) or (prev_is_left == -1 and current_is_left == 1):
-                        intersection_point = None
-                        if current_is_left == 1:  # point is on the left side of intersection line
-                            res, intersection_point = self.line_intersection(self.pts_list[0],
-                                                                             self.pts_list[self.pts_count - 1],
-                                                                             self.pts_list[i],
-                                                                             self.pts_list[i-1])
-                            if res:
-                                self.add_intersect_point(intersection_point)
-                                self.region_list.add_pt(intersection_point)
-                        if current_is_left == -1:  # point is on the right side of intersection line
-                            res, intersection_point = self.line_intersection(self.pts_list[0],
-                                                                             self.pts_list[self.pts_count - 1],
-                                                                             self.pts_list[i-1],
-                                                                             self.pts_list[i])
-                            if res:
-                                self.add_intersect_point(intersection_point)
-                                self.region_list.add_pt(intersection_point)
-
-                        next_reg_id = self.start_new_region(next_reg_id)
-                        if intersection_point:
-                            self.region_list.add_pt(intersection_point)
-                        self.region_list.add_pt(self.pts_list[i])
-
-                        prev_is_left = current_is_left
-                    elif prev_is_left == 0:
-                        self.region_list.add_pt(self.pts_list[i])
-                        prev_is_left = current_is_left
-
-            # adding last polyline point to a region
-            self.region_list.add_pt(self.pts_list[self.pts_count - 1])
-            return True
+                    anchor = self.intersect_pts_list.insert_after(anchor, crossing)
+                    self.intersect_pts_count += 1
+            if self.intersect_pts_count == 1:
+                # only the first point is left, build_regions would have made no list at all
+                self.intersect_pts_list = None
+                self.intersect_pts_count = 0
+
+        # the new regions replace the old ones in the block of the first of them
+        added = len(new_regions) - len(old_regions)
+        if b_lo == b_end:
+            del block.regions[i_lo:i_end]
+            del block.starts[i_lo:i_end]
         else:
-            return False
+            del block.regions[i_lo:]
+            del block.starts[i_lo:]
+            del end_block.regions[:i_end]
+            del end_block.starts[:i_end]
+            del blocks[b_lo + 1:b_end]
+            if not end_block.regions:
+                del blocks[b_lo + 1]
+        block.regions[i_lo:i_lo] = [block.adopt(region) for region in new_regions]
+        block.starts[i_lo:i_lo] = [region._start for region in new_regions]
+        if added or shift:
+            if b_lo == b_end:
+                # the rest of the block one by one, the blocks after it by their offsets
+                k = i_lo + len(new_regions)
+                for region in itertools.islice(block.regions, k, None):
+                    region._id += added
+                    region._start += shift
+                    region._end += shift
+                block.starts[k:] = [start + shift for start in block.starts[k:]]
+            for b in itertools.islice(blocks, b_lo + 1, None):
+                b.id_offset += added
+                b.pos_offset += shift
+        if len(block.regions) > 2 * max(REGION_BLOCK_MIN, math.isqrt(count)):
+            blocks.insert(b_lo + 1, block.split())
+        self.region_list.count = count + added
+        self.region_list.blocks_changed()
+
+
+def output_modes_arg(value: str) -> List[str]:
+    """
+    Input: comma separated output modes, e.g. 'files,binary'
+    Return: list of the modes
+    """
+    modes = [mode.strip() for mode in value.split(',')]
+    for mode in modes:
+        if mode not in OUTPUT_MODES:
+            raise argparse.ArgumentTypeError(f"invalid output mode: '{mode}' (choose from {', '.join(OUTPUT_MODES)})")
+    return modes
 
 
-def input_parsing() -> Tuple:
+class OutputModesAction(argparse.Action):
+    """
+    Collects the modes of all --output-mode switches, replacing the default ones
+    """
+    def __call__(self, parser, namespace, values, option_string=None):
+        modes = getattr(namespace, self.dest)
+        if modes is self.default:
+            modes = []
+        setattr(namespace, self.dest, modes + values)
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Breaks polyline into regions.")
-    parser.add_argument("-f", default="data.csv", help="Input file", type=str)
+    parser.add_argument("-f", default="data.csv", help=f"Input file (.csv or {BINARY_SUFFIX})", type=str)
+    parser.add_argument("-e", "--engine", default="auto", choices=ENGINES,
+                        help="Regions building engine ('auto' - 'compiled' if Numba is installed and works, 'python' otherwise)")
+    parser.add_argument("-s", "--storage", default="list", choices=STORAGES, help="Polyline's points storage")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read points lazily and write each region as soon as it is built (.csv input only)")
+    parser.add_argument("--output-mode", default=["files"], type=output_modes_arg, action=OutputModesAction,
+                        metavar="MODE[,MODE...]",
+                        help=f"Write regions into separate csv files, a single csv file, a single binary "
+                             f"{REGIONS_BINARY_SUFFIX} file and/or a GeoJSON file ({', '.join(OUTPUT_MODES)}; "
+                             f"comma separated or the switch repeated for several of them)")
+    parser.add_argument("--cache", default=None, metavar="DIR",
+                        help="Directory of a cache of built regions: unchanged inputs are neither parsed nor built again")
+    parser.add_argument("--cache-size", default=1024, type=int, help="Cache size cap, in MB")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print counters and timers of reading, building and writing regions at the end")
+
+    subparsers = parser.add_subparsers(dest="command")
+    convert = subparsers.add_parser("convert", help=f"Converts a csv polyline file into the binary {BINARY_SUFFIX} format")
+    convert.add_argument("input", help="Input .csv file", type=str)
+    convert.add_argument("-o", "--output", help=f"Output file (the input file name with {BINARY_SUFFIX} by default)",
+                         type=str)
+
+    batch = subparsers.add_parser("batch", help="Builds regions of many polyline files with a pool of processes, "
+                                                "without prompting (the options above apply to every file)")
+    batch.add_argument("inputs", nargs="+", help="Input files or glob patterns", type=str)
+    batch.add_argument("-w", "--workers", default=None, type=int,
+                       help="Number of worker processes (the number of CPUs by default, 1 - no pool)")
+    batch.add_argument("--chunksize", default=16, type=int, help="Number of files handed to a worker at once")
+
+    serve = subparsers.add_parser("serve", help="Runs a service building regions of polylines sent over "
+                                                "localhost HTTP or a Unix socket (see service.py)")
+    serve.add_argument("--host", default="127.0.0.1", help="Host to listen on", type=str)
+    serve.add_argument("--port", default=None, type=int,
+                       help="Port to listen on (8765 by default, no TCP port if only --unix is given)")
+    serve.add_argument("--unix", default=None, help="Unix socket path to listen on", type=str)
+    serve.add_argument("-w", "--workers", default=None, type=int,
+                       help="Number of worker processes (the number of CPUs by default)")
+    serve.add_argument("--queue-size", default=1024, type=int, help="Number of requests waiting to be built")
+    serve.add_argument("--batch-size", default=64, type=int, help="Number of requests handed to a worker at once")
+    return parser
+
+
+def input_parsing() -> Tuple:
+    parser = build_parser()
     args = parser.parse_args()
     return parser, args
 
 
 def input_parsing_1(args):
-    parser = argparse.ArgumentParser(description="Breaks polyline into regions.")
-    parser.add_argument("-f", default="data.csv", help="Input file", type=str)
+    parser = build_parser()
     parser_args = parser.parse_args(args)
     return parser_args
 
 
-def fill_poly_with_data(csv_reader) -> Polyline:
-    polyline = Polyline(id=1)
+def iter_csv_points(csv_reader) -> Iterator[Point]:
+    """
+    Yields points of csv rows, skipping the header row.
+    Points of 2 column rows (X,Y) are numbered with the row index.
+    """
     for i, row in enumerate(csv_reader):
         if i > 0:
             if len(row) == 2:
-                pt = Point(nr=i, x=float(row[0]), y=float(row[1]))
-                polyline.add_point(pt)
+                yield Point(nr=i, x=float(row[0]), y=float(row[1]))
             elif len(row) == 3:
-                pt = Point(nr=row[0], x=float(row[1]), y=float(row[2]))
-                polyline.add_point(pt)
+                yield Point(nr=int(row[0]), x=float(row[1]), y=float(row[2]))
+
+
+def fill_poly_with_data(csv_reader, storage='list') -> Polyline:
+    polyline = Polyline(id=1, storage=storage)
+    for pt in iter_csv_points(csv_reader):
+        polyline.add_point(pt)
+    return polyline
+
+
+def iter_polylines(csv_reader, storage='list') -> Iterator[Polyline]:
+    """
+    Yields polylines of a multi-polyline csv file (Id,Nr,X,Y rows, header row skipped), one Polyline
+    per group of contiguous rows with the same Id, as soon as the group ends, so only one polyline
+    is kept in memory at a time. Ids are kept as strings, unless all digits.
+    Raises ValueError if rows of a polyline are not contiguous (its Id starts another group),
+    as outputs are named after the Ids.
+    """
+    polyline = None
+    seen = set()
+    for i, row in enumerate(csv_reader):
+        if i == 0 or len(row) != 4:
+            continue
+        id = int(row[0]) if row[0].isdigit() else row[0]
+        if polyline is None or id != polyline.id:
+            if id in seen:
+                raise ValueError(f"rows of polyline {id} are not contiguous (row {i + 1})")
+            seen.add(id)
+            if polyline is not None:
+                yield polyline
+            polyline = Polyline(id=id, storage=storage)
+        polyline.add_point(Point(nr=int(row[1]), x=float(row[2]), y=float(row[3])))
+    if polyline is not None:
+        yield polyline
+
+
+def is_multi_polyline_file(file_name: str) -> bool:
+    """
+    Return: True - if the csv file's header row has 4 columns (Id,Nr,X,Y)
+    """
+    if file_name.endswith(BINARY_SUFFIX):
+        return False
+    with open(file_name, newline='') as f:
+        return len(next(csv.reader(f), [])) == 4
+
+
+def polyline_output_name(input_name: str, polyline_id) -> str:
+    """
+    Return: name output files of a polyline of a multi-polyline file are named after
+    """
+    return input_name.removesuffix('.csv') + '_' + str(polyline_id) + '.csv'
+
+
+def iter_input_polylines(file_name: str, storage: str = 'list') -> Iterator[Tuple[Polyline, str]]:
+    """
+    Yields (polyline, output name) pairs of an input file: a single one for .csv (X,Y or Nr,X,Y)
+    and .plb files, and one per polyline for multi-polyline (Id,Nr,X,Y) csv files, read lazily.
+    """
+    if is_multi_polyline_file(file_name):
+        with open(file_name, newline='') as f:
+            polylines = iter_polylines(csv.reader(f), storage)
+            while True:
+                # polylines are read lazily, the reading of each one is timed as load_input's is
+                start = time.perf_counter()
+                polyline = next(polylines, None)
+                if polyline is None:
+                    return
+                if profiling.enabled:
+                    profiling.add_time('read_data', time.perf_counter() - start)
+                    profiling.count('points_read', polyline.pts_count)
+                yield polyline, polyline_output_name(file_name, polyline.id)
+    else:
+        yield load_input(file_name, storage), file_name
+
+
+def load_polyline(file_name: str, chunk_size: int = 1 << 22) -> Polyline:
+    """
+    Bulk loads a polyline from a csv file into the 'array' storage, much faster than fill_poly_with_data:
+    the file is read in big chunks and whole columns are parsed straight into typed arrays.
+    The layout (X,Y or Nr,X,Y) is taken from the header row. Chunks with blank or irregular rows
+    are parsed row by row, the way fill_poly_with_data does it, so both give the same polyline.
+    """
+    polyline = Polyline(id=1, storage='array')
+    pts = polyline.pts_list
+    with open(file_name) as f:
+        columns = len(next(csv.reader([f.readline()]), []))
+        row_index = 1
+        rest = ''
+        while True:
+            chunk = f.read(chunk_size)
+            text = rest + chunk
+            if chunk:
+                # the chunk's last, possibly partial, line is parsed with the next chunk
+                cut = text.rfind('\n') + 1
+                text, rest = text[:cut], text[cut:]
+            if text:
+                lines = text.split('\n')
+                if lines[-1] == '':
+                    lines.pop()
+                load_rows(pts, lines, columns, row_index)
+                row_index += len(lines)
+            if not chunk:
+                break
+
+    polyline.pts_count = len(pts)
+    polyline.pts_list_nr_max = max(max(pts.nr, default=0), 0)
+    return polyline
+
+
+def load_rows(pts: PointArray, lines: List[str], columns: int, row_index: int) -> None:
+    """
+    Parses csv lines into pts columns, row_index being the index of lines[0] in the file
+    """
+    # every row must have the width, otherwise fields of short and long rows would shift the columns
+    if columns in (2, 3) and set(map(operator.methodcaller('count', ','), lines)) == {columns - 1}:
+        fields = ','.join(lines).split(',')
+        try:
+            x = array('d', map(float, fields[columns - 2::columns]))
+            y = array('d', map(float, fields[columns - 1::columns]))
+            if columns == 3:
+                nr = array('q', map(int, fields[0::3]))
+            else:
+                nr = array('q', range(row_index, row_index + len(lines)))
+        except ValueError:
+            pass
+        else:
+            pts.extend(nr, x, y)
+            return
+
+    # irregular rows - parsing them one by one, numbering 2 column rows with their index
+    for i, row in enumerate(csv.reader(lines), row_index):
+        if len(row) == 2:
+            pts.append(Point(nr=i, x=float(row[0]), y=float(row[1])))
+        elif len(row) == 3:
+            pts.append(Point(nr=int(row[0]), x=float(row[1]), y=float(row[2])))
+
+
+def write_binary_polyline(polyline: Polyline, file_name: str) -> None:
+    """
+    Writes a polyline in the binary format: a header (magic, version, points count, nr_max)
+    followed by little-endian nr (int64), x and y (float64) columns.
+    """
+    pts = polyline.pts_list
+    if isinstance(pts, PointArray):
+        columns = [array('q', pts.nr), array('d', pts.x), array('d', pts.y)]
+    else:
+        columns = [array('q', (pt.nr for pt in pts)), array('d', (pt.x for pt in pts)), array('d', (pt.y for pt in pts))]
+    with open(file_name, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, polyline.pts_count, polyline.pts_list_nr_max))
+        for column in columns:
+            if sys.byteorder != 'little':
+                column.byteswap()
+            column.tofile(f)
+
+
+def load_binary_polyline(file_name: str) -> Polyline:
+    """
+    Loads a polyline written by write_binary_polyline. The file is memory-mapped and
+    the 'array' storage columns are views of the mapping, so nothing is parsed or copied.
+    The mapping is copy-on-write: changing points never changes the file.
+    """
+    with open(file_name, 'rb') as f:
+        header = f.read(BINARY_HEADER.size)
+        if len(header) < BINARY_HEADER.size:
+            raise ValueError(f"{file_name} is not a binary polyline file")
+        magic, version, count, nr_max = BINARY_HEADER.unpack(header)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError(f"{file_name} is not a binary polyline file (version {BINARY_VERSION})")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(mm) < BINARY_HEADER.size + 24 * count:
+        raise ValueError(f"{file_name} is truncated")
+
+    view = memoryview(mm)
+    columns = []
+    for i, typecode in enumerate('qdd'):
+        offset = BINARY_HEADER.size + 8 * count * i
+        column = view[offset:offset + 8 * count].cast(typecode)
+        if sys.byteorder != 'little':
+            column = array(typecode, column)
+            column.byteswap()
+        columns.append(column)
+
+    polyline = Polyline(id=1, storage='array')
+    polyline.pts_list = PointArray(*columns)
+    polyline.pts_count = count
+    polyline.pts_list_nr_max = nr_max
+    return polyline
+
+
+def convert_to_binary(input_name: str, output_name: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Converts a csv polyline file into the binary format.
+    Return: output file name, number of points
+    """
+    if output_name is None:
+        output_name = input_name.removesuffix('.csv') + BINARY_SUFFIX
+    polyline = load_polyline(input_name)
+    write_binary_polyline(polyline, output_name)
+    return output_name, polyline.pts_count
+
+
+def scan_polyline_file(file_name: str) -> Tuple[Optional[Point], Optional[Point], int]:
+    """
+    Finds polyline's first and last point and the greatest point number without loading the polyline:
+    the first point is read from the file's beginning, the last one (of the last row with 2 or 3 fields,
+    as iter_csv_points reads them) from its end, after a seek. The layout (X,Y or Nr,X,Y) is taken
+    from the header row: the greatest number is the last row's index for 2 column files (counting
+    line breaks), while for 3 column files it takes one pass through the file's Nr column.
+    Return: first point, last point (both None if there are no points), the greatest point number
+    """
+    with open(file_name, newline='') as f:
+        first = next(iter_csv_points(csv.reader(f)), None)
+    if first is None:
+        return None, None, 0
+
+    with open(file_name, 'rb') as f:
+        columns = len(next(csv.reader([f.readline().decode()]), []))
+        header_end = f.tell()
+        offset = f.seek(0, os.SEEK_END)
+        carry = b''
+        row = None
+        while row is None and offset > header_end:
+            step = min(offset - header_end, 4096)
+            offset -= step
+            f.seek(offset)
+            block = f.read(step) + carry
+            lines = block.split(b'\n')
+            # lines[0] may be a part of a line, unless the block starts right after the header
+            line_offset = offset + len(block)
+            for line in reversed(lines if offset == header_end else lines[1:]):
+                line_offset -= len(line)
+                fields = next(csv.reader([line.decode().strip()]), [])
+                if len(fields) in (2, 3):
+                    row, last_line_offset = fields, line_offset
+                    break
+                line_offset -= 1
+            carry = lines[0]
+        if row is None:
+            raise ValueError(f"No last point found in {file_name}")
+
+        row_index = 0
+        if columns != 3 or len(row) == 2:
+            # the last row's index is the number of line breaks before it
+            f.seek(0)
+            while f.tell() < last_line_offset:
+                row_index += f.read(min(1 << 20, last_line_offset - f.tell())).count(b'\n')
+        if len(row) == 3:
+            last = Point(nr=int(row[0]), x=float(row[1]), y=float(row[2]))
+        else:
+            last = Point(nr=row_index, x=float(row[0]), y=float(row[1]))
+
+        if columns == 3:
+            f.seek(0)
+            f.readline()
+            # 2 field rows are numbered with their index, as iter_csv_points does
+            nr_max = max(int(line.split(b',', 1)[0]) if line.count(b',') == 2 else i
+                         for i, line in enumerate(f, 1) if line.count(b',') in (1, 2))
+        else:
+            nr_max = max(row_index, last.nr)
+    return first, last, nr_max
+
+
+def stream_regions(file_name: str) -> Iterator[RegionNode]:
+    """
+    Divides the polyline stored in a file into regions, reading its points lazily
+    and yielding each region as soon as it is finished, so memory use does not grow with the file size.
+    """
+    start, end, nr_max = scan_polyline_file(file_name)
+    if start is None:
+        return
+    polyline = Polyline(id=1)
+    polyline.pts_list_nr_max = nr_max
+    with open(file_name, newline='') as f:
+        yield from polyline.iter_regions(iter_csv_points(csv.reader(f)), start, end, keep_intersections=False)
+
+
+def load_input(file_name: str, storage: str = 'list') -> Polyline:
+    with profiling.timer('read_data'):
+        if file_name.endswith(BINARY_SUFFIX):
+            polyline = load_binary_polyline(file_name)
+        elif storage == 'array':
+            polyline = load_polyline(file_name)
+        else:
+            with open(file_name) as f_input:
+                reader = csv.reader(f_input)
+                polyline = fill_poly_with_data(reader, storage)
+    if profiling.enabled:
+        profiling.count('points_read', polyline.pts_count)
     return polyline
 
 
@@ -609,9 +1877,7 @@ def read_data(args) -> Tuple[Polyline, str]:
     # parser, args = input_parsing()
     parsed_args = input_parsing_1(args)
     try:
-        with open(parsed_args.f) as f_input:
-            reader = csv.reader(f_input)
-            polyline = fill_poly_with_data(reader)
+        polyline = load_input(parsed_args.f, parsed_args.storage)
     except FileNotFoundError as e:
         # parser.exit(message="Invalid input file \n")
         sys.exit('Invalid input file \n')
@@ -619,68 +1885,450 @@ def read_data(args) -> Tuple[Polyline, str]:
         return polyline, parsed_args.f
 
 
-def prepare_polyline(polyline: Polyline) -> bool:
-    return polyline.build_regions()
+def prepare_polyline(polyline: Polyline, engine: str = 'python', cache=None) -> bool:
+    """
+    cache - region_cache.RegionCache to restore the regions from or store them in, if given
+    """
+    if cache is None:
+        return polyline.build_regions(engine)
+    import region_cache
+    return region_cache.build_regions_cached(polyline, cache, engine)
+
+
+def open_cache(directory: Optional[str], size_mb: int = 1024):
+    """
+    Return: region_cache.RegionCache in the directory, None if no directory is given
+    """
+    if not directory:
+        return None
+    import region_cache
+    return region_cache.RegionCache(directory, size_mb << 20)
+
+
+def iter_built_polylines(file_name: str, engine: str = 'python', storage: str = 'list',
+                         cache=None) -> Iterator[Tuple[Polyline, str, bool]]:
+    """
+    Yields (polyline, output name, True if divided into regions) of each polyline of an input file.
+    With a cache (see open_cache), a single polyline file known to the cache is restored
+    with no parsing, and regions of other polylines are restored or built and stored.
+    """
+    if cache is not None and not is_multi_polyline_file(file_name):
+        import region_cache
+        load = functools.partial(load_input, storage=storage)
+        polyline, res = region_cache.load_regions_cached(file_name, cache, load, engine, storage)
+        yield polyline, file_name, res
+        return
+    for polyline, output_name in iter_input_polylines(file_name, storage):
+        yield polyline, output_name, prepare_polyline(polyline, engine, cache)
 
 
 def write_to_file(output_name: str, current_region: RegionNode):
     with open(output_name, 'w') as file:
         writer = csv.DictWriter(file, fieldnames=['Nr', 'X', 'Y'])
         writer.writerow({'Nr': 'Nr', 'X': 'X', 'Y': 'Y'})
-        while True:
-            try:
-                pt = current_region.reg_pts_list.pop()
-            except IndexError:
-                pt = None
-                break
-            else:
-                writer.writerow({'Nr': pt.nr, 'X': pt.x, 'Y': pt.y})
+        writer.writerows([{'Nr': pt.nr, 'X': pt.x, 'Y': pt.y} for pt in region_points(current_region)])
     return current_region
 
 
-def process_regions(current_region: RegionNode, polyline: Polyline, input_name: str, digits_number: int) -> int:
+def region_points(region: RegionNode) -> Iterator[Point]:
+    """
+    Yields region's points in the order they are written to output files (the region is not changed)
+    """
+    return reversed(region.reg_pts_list)
+
+
+def region_file_name(input_name: str, i: int, digits_number: int) -> str:
+    return input_name.removesuffix('.csv').removesuffix(BINARY_SUFFIX) + '_reg' + str(i).zfill(digits_number) + '.csv'
+
+
+def regions_file_name(input_name: str, suffix: str) -> str:
+    return input_name.removesuffix('.csv').removesuffix(BINARY_SUFFIX) + '_regions' + suffix
+
+
+class RegionSink:
+    """
+    Region writer: gets regions one by one, in order, between begin() and end(),
+    so that several sinks can be fed in one pass over the regions
+    """
+    def __init__(self, input_name: str):
+        self.input_name = input_name
+
+    def begin(self, region_count: Optional[int]) -> None:
+        """
+        region_count - number of regions to come, None if unknown (when streaming)
+        """
+
+    def write_region(self, i: int, region: RegionNode) -> None:
+        """
+        i - region's order number, starting with 1
+        """
+        raise NotImplementedError
+
+    def end(self, region_count: int) -> None:
+        pass
+
+
+class RegionFilesSink(RegionSink):
+    """
+    Writes each region's points into a separate csv file (the default output)
+    """
+    def begin(self, region_count: Optional[int]) -> None:
+        # with the number of regions unknown, files are renamed to their zero padded names at the end
+        self.digits_number = len(str(region_count)) if region_count is not None else None
+
+    def write_region(self, i: int, region: RegionNode) -> None:
+        write_to_file(region_file_name(self.input_name, i, self.digits_number or 1), region)
+
+    def end(self, region_count: int) -> None:
+        digits_number = len(str(region_count))
+        if self.digits_number is None and digits_number > 1:
+            for i in range(1, 10 ** (digits_number - 1)):
+                os.replace(region_file_name(self.input_name, i, 1), region_file_name(self.input_name, i, digits_number))
+
+
+class SingleCsvSink(RegionSink):
+    """
+    Writes the points of all regions into one <input>_regions.csv file with a Region column,
+    a region's rows at a time
+    """
+    def begin(self, region_count: Optional[int]) -> None:
+        self.file = open(regions_file_name(self.input_name, '.csv'), 'w', buffering=1 << 20)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['Region', 'Nr', 'X', 'Y'])
+
+    def write_region(self, i: int, region: RegionNode) -> None:
+        self.writer.writerows([(i, pt.nr, pt.x, pt.y) for pt in region_points(region)])
+
+    def end(self, region_count: int) -> None:
+        self.file.close()
+
+
+class BinarySink(RegionSink):
+    """
+    Writes the points of all regions into one binary <input>_regions.plr file: a header (magic, version,
+    regions count, points count), an offsets index (int64, regions count + 1 items: region k's points
+    are the items offsets[k] to offsets[k + 1] - 1 of the columns) and little-endian nr (int64),
+    x and y (float64) columns. The columns are collected in memory and written at the end.
+    """
+    def begin(self, region_count: Optional[int]) -> None:
+        self.columns = (array('q', [0]), array('q'), array('d'), array('d'))
+
+    def write_region(self, i: int, region: RegionNode) -> None:
+        offsets, nr, x, y = self.columns
+        for pt in region_points(region):
+            nr.append(pt.nr)
+            x.append(pt.x)
+            y.append(pt.y)
+        offsets.append(len(nr))
+
+    def end(self, region_count: int) -> None:
+        with open(regions_file_name(self.input_name, REGIONS_BINARY_SUFFIX), 'wb') as file:
+            self.dump(file, region_count)
+
+    def dump(self, file, region_count: int) -> None:
+        """
+        Writes the collected regions into a binary file object
+        """
+        file.write(REGIONS_HEADER.pack(REGIONS_MAGIC, BINARY_VERSION, region_count, len(self.columns[1])))
+        for column in self.columns:
+            if sys.byteorder != 'little':
+                column.byteswap()
+            column.tofile(file)
+
+
+class GeoJsonSink(RegionSink):
+    """
+    Writes all regions into one <input>_regions.geojson file, as a FeatureCollection
+    of LineStrings with the region's number and its points' numbers
+    """
+    def begin(self, region_count: Optional[int]) -> None:
+        self.file = open(regions_file_name(self.input_name, '.geojson'), 'w', buffering=1 << 20)
+        self.file.write('{"type": "FeatureCollection", "features": [')
+
+    def write_region(self, i: int, region: RegionNode) -> None:
+        pts = list(region_points(region))
+        feature = {'type': 'Feature',
+                   'properties': {'region': i, 'nr': [pt.nr for pt in pts]},
+                   'geometry': {'type': 'LineString', 'coordinates': [[pt.x, pt.y] for pt in pts]}}
+        self.file.write((',\n' if i > 1 else '\n') + json.dumps(feature))
+
+    def end(self, region_count: int) -> None:
+        self.file.write('\n]}\n')
+        self.file.close()
+
+
+SINKS = {'files': RegionFilesSink, 'single': SingleCsvSink, 'binary': BinarySink, 'geojson': GeoJsonSink}
+
+
+def make_sinks(input_name: str, output_modes: Union[str, Iterable[str]]) -> List[RegionSink]:
+    if isinstance(output_modes, str):
+        output_modes = [output_modes]
+    sinks = []
+    for mode in output_modes:
+        if mode not in SINKS:
+            raise ValueError(f"Unknown output mode: {mode}, expected one of: {', '.join(OUTPUT_MODES)}")
+        sinks.append(SINKS[mode](input_name))
+    return sinks
+
+
+def feed_sinks(regions: Iterable[RegionNode], sinks: List[RegionSink], region_count: Optional[int]) -> int:
+    """
+    Passes each region to all sinks, in one pass over the regions.
+    Return: number of regions
+    """
+    for sink in sinks:
+        sink.begin(region_count)
     i = 0
-    while current_region:
+    for region in regions:
         i += 1
-        output_name = input_name.removesuffix('.csv')
-        output_name += ('_reg' + str(i).zfill(digits_number) + '.csv')
-        current_region = write_to_file(output_name, current_region)
-        try:
-            current_region = polyline.region_list.region_nodes_list.pop()
-        except IndexError:
-            current_region = None
-            break
-        else:
-            continue
+        for sink in sinks:
+            sink.write_region(i, region)
+    for sink in sinks:
+        sink.end(i)
     return i
 
 
-def write_regions(polyline: Polyline, input_name: str) -> Tuple[bool, int]:
+def read_regions_binary(file_name: str) -> List[List[Tuple[int, float, float]]]:
+    """
+    Reads a file written by BinarySink.
+    Return: list of regions, each one being a list of its points' (nr, x, y)
+    """
+    with open(file_name, 'rb') as file:
+        return load_regions_binary(file, file_name)
+
+
+def load_regions_binary(file, name: str = 'data') -> List[List[Tuple[int, float, float]]]:
+    """
+    Reads regions written by BinarySink from a binary file object
+    """
+    magic, version, region_count, pts_count = REGIONS_HEADER.unpack(file.read(REGIONS_HEADER.size))
+    if magic != REGIONS_MAGIC or version != BINARY_VERSION:
+        raise ValueError(f"{name} is not a binary regions file (version {BINARY_VERSION})")
+    columns = []
+    for typecode, count in (('q', region_count + 1), ('q', pts_count), ('d', pts_count), ('d', pts_count)):
+        column = array(typecode)
+        column.fromfile(file, count)
+        if sys.byteorder != 'little':
+            column.byteswap()
+        columns.append(column)
+    offsets, nr, x, y = columns
+    return [list(zip(nr[offsets[k]:offsets[k + 1]], x[offsets[k]:offsets[k + 1]], y[offsets[k]:offsets[k + 1]]))
+            for k in range(region_count)]
+
+
+def write_regions(polyline: Polyline, input_name: str,
+                  output_modes: Union[str, Iterable[str]] = 'files') -> Tuple[bool, int]:
     """
-    Writes each polyline's region's points into a separate file.
+    Writes each polyline's region's points into a separate file, or into the outputs of
+    any of OUTPUT_MODES, all of them fed in one pass. The region list is left intact,
+    so it may be written again or processed further.
     Return: True - if succeeded
             False - if no regions found
     """
-    if polyline.region_list:
-        file_count = 0
-        digits_number = len(str(polyline.region_list.count))
-        try:
-            current_region = polyline.region_list.region_nodes_list.pop()
-        except IndexError:
-            current_region = None
-            return False, file_count
-        else:
-            file_count = process_regions(current_region, polyline, input_name, digits_number)
-        return True, file_count
+    sinks = make_sinks(input_name, output_modes)
+    if polyline.region_list and polyline.region_list.region_nodes_list:
+        regions = reversed(polyline.region_list.region_nodes_list)
+        with profiling.timer('write_regions'):
+            region_count = feed_sinks(regions, sinks, polyline.region_list.count)
+        if profiling.enabled:
+            profiling.count('regions_written', region_count)
+        return True, region_count
     else:
         return False, 0
 
 
+def write_regions_stream(regions: Iterable[RegionNode], input_name: str,
+                         output_modes: Union[str, Iterable[str]] = 'files') -> Tuple[bool, int]:
+    """
+    Writes each region's points into a separate file (or into the outputs of any of OUTPUT_MODES)
+    as soon as the region comes. As the number of regions is known only at the end,
+    separate files are renamed to their zero padded names afterwards.
+    Return: True - if succeeded
+            False - if no regions found
+    """
+    # reading, building and writing regions are interleaved, so they are timed together
+    with profiling.timer('stream_regions'):
+        region_count = feed_sinks(regions, make_sinks(input_name, output_modes), None)
+    if profiling.enabled:
+        profiling.count('regions_written', region_count)
+    return region_count > 0, region_count
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """
+    Expands glob patterns (quoted, or on shells not expanding them) into sorted file names,
+    keeping plain file names as they are
+    """
+    file_names = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            file_names.extend(sorted(glob.glob(pattern)))
+        else:
+            file_names.append(pattern)
+    return file_names
+
+
+def process_file(file_name: str, engine: str = 'python', storage: str = 'list',
+                 output_modes: Union[str, Iterable[str]] = 'files', cache_dir: Optional[str] = None,
+                 cache_size: int = 1024) -> Tuple[str, int, int, Optional[str]]:
+    """
+    Builds and writes regions of a polyline file, or of each polyline of a multi-polyline file
+    (read_data -> prepare_polyline -> write_regions without exiting or prompting),
+    so that it can be run in a worker process.
+    cache_dir, cache_size - directory and size cap (MB) of a regions cache shared by the workers
+    Return: (file name, points count, regions count, error message or None)
+    """
+    pts_count = region_count = 0
+    try:
+        cache = open_cache(cache_dir, cache_size)
+        for polyline, output_name, res in iter_built_polylines(file_name, engine, storage, cache):
+            pts_count += polyline.pts_count
+            if not res:
+                return file_name, pts_count, region_count, f"Unable to build polyline {polyline.id}'s regions"
+            output, count = write_regions(polyline, output_name, output_modes)
+            if not output:
+                return file_name, pts_count, region_count, f"Building polyline {polyline.id}'s regions failed"
+            region_count += count
+    except (OSError, ValueError) as e:
+        return file_name, pts_count, region_count, f'Invalid input file: {e}'
+    return file_name, pts_count, region_count, None
+
+
+def process_file_profiled(file_name: str, **options) -> Tuple[Tuple, dict]:
+    """
+    Runs process_file with instrumentation enabled, in a worker process.
+    Return: process_file's result, the worker's stats (see profiling.py)
+    """
+    with profiling.profile() as stats:
+        result = process_file(file_name, **options)
+    return result, stats
+
+
+def merge_worker_stats(results: Iterable[Tuple[Tuple, dict]]) -> Iterator[Tuple]:
+    """
+    Yields process_file_profiled's results, adding the workers' stats to this process's ones
+    """
+    for result, stats in results:
+        profiling.merge(stats)
+        yield result
+
+
+def process_batch(file_names: List[str], workers: Optional[int] = None, chunksize: int = 16,
+                  engine: str = 'python', storage: str = 'list',
+                  output_modes: Union[str, Iterable[str]] = 'files', cache_dir: Optional[str] = None,
+                  cache_size: int = 1024) -> dict:
+    """
+    Processes polyline files with a pool of worker processes; the files are handed out
+    to the workers in chunks of chunksize files. workers == 1 processes them in this process.
+    When instrumentation is enabled, the workers' stats are added to this process's ones.
+    Return: summary: numbers of polylines, vertices and regions, failures ((file name, message) list),
+            elapsed seconds, polylines/s and vertices/s
+    """
+    task = functools.partial(process_file, engine=engine, storage=storage, output_modes=output_modes,
+                             cache_dir=cache_dir, cache_size=cache_size)
+    start = time.perf_counter()
+    if workers == 1:
+        results = map(task, file_names)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        if profiling.enabled:
+            task = functools.partial(process_file_profiled, **task.keywords)
+        results = executor.map(task, file_names, chunksize=max(1, chunksize))
+        if profiling.enabled:
+            results = merge_worker_stats(results)
+    polylines = vertices = regions = 0
+    failures = []
+    try:
+        for file_name, pts_count, region_count, error in results:
+            polylines += 1
+            vertices += pts_count
+            regions += region_count
+            if error:
+                failures.append((file_name, error))
+    finally:
+        if executor:
+            executor.shutdown()
+    elapsed = time.perf_counter() - start
+    return {'polylines': polylines, 'vertices': vertices, 'regions': regions, 'failures': failures,
+            'seconds': elapsed, 'polylines_per_s': polylines / elapsed if elapsed else 0.0,
+            'vertices_per_s': vertices / elapsed if elapsed else 0.0}
+
+
 def main(args=None):
-    polyline, file_name = read_data(args)
-    res = prepare_polyline(polyline)
+    parsed_args = input_parsing_1(args)
+    if parsed_args.profile:
+        with profiling.profile() as stats:
+            result = run_command(parsed_args, args)
+        print(profiling.report(stats))
+    else:
+        result = run_command(parsed_args, args)
+    if parsed_args.command is None:
+        input('Press Enter to continue...')
+    return result
+
+
+def run_command(parsed_args, args):
+    if parsed_args.command == 'convert':
+        try:
+            output_name, pts_count = convert_to_binary(parsed_args.input, parsed_args.output)
+        except FileNotFoundError:
+            sys.exit('Invalid input file \n')
+        print(f'---------- {pts_count} points written to {output_name} ----------')
+        return None
+    if parsed_args.command == 'serve':
+        import service
+        host = None if parsed_args.unix and parsed_args.port is None else parsed_args.host
+        service.serve(host, parsed_args.port or 8765, parsed_args.unix, workers=parsed_args.workers,
+                      queue_size=parsed_args.queue_size, batch_size=parsed_args.batch_size,
+                      engine=parsed_args.engine)
+        return None
+    if parsed_args.command == 'batch':
+        file_names = expand_inputs(parsed_args.inputs)
+        summary = process_batch(file_names, parsed_args.workers, parsed_args.chunksize,
+                                parsed_args.engine, parsed_args.storage, parsed_args.output_mode,
+                                parsed_args.cache, parsed_args.cache_size)
+        for file_name, error in summary['failures']:
+            print(f'{file_name}: {error}', file=sys.stderr)
+        print(f"---------- {summary['polylines']} polylines, {summary['vertices']} vertices, "
+              f"{summary['regions']} regions in {summary['seconds']:.3f} s: "
+              f"{summary['polylines_per_s']:.1f} polylines/s, {summary['vertices_per_s']:.0f} vertices/s, "
+              f"{len(summary['failures'])} failed ----------")
+        return 1 if summary['failures'] else None
+
+    try:
+        multi_polyline = is_multi_polyline_file(parsed_args.f)
+    except FileNotFoundError:
+        sys.exit('Invalid input file \n')
+    cache = open_cache(parsed_args.cache, parsed_args.cache_size)
+    if multi_polyline or (cache is not None and not parsed_args.stream):
+        # polylines are read one by one, each one's regions written before the next one is read
+        res, output, file_count = False, True, 0
+        try:
+            for polyline, output_name, built in iter_built_polylines(parsed_args.f, parsed_args.engine,
+                                                                     parsed_args.storage, cache):
+                if built:
+                    res = True
+                    polyline_output, region_count = write_regions(polyline, output_name, parsed_args.output_mode)
+                    output = output and polyline_output
+                    file_count += region_count
+        except FileNotFoundError:
+            sys.exit('Invalid input file \n')
+        except ValueError as e:
+            sys.exit(f'Invalid input file: {e} \n')
+    elif parsed_args.stream and not parsed_args.f.endswith(BINARY_SUFFIX):
+        try:
+            output, file_count = write_regions_stream(stream_regions(parsed_args.f), parsed_args.f,
+                                                      parsed_args.output_mode)
+        except FileNotFoundError:
+            sys.exit('Invalid input file \n')
+        res = True
+    else:
+        polyline, file_name = read_data(args)
+        res = prepare_polyline(polyline, parsed_args.engine)
+        if res:
+            output, file_count = write_regions(polyline, file_name, parsed_args.output_mode)
     if res:
-        output, file_count = write_regions(polyline, file_name)
         if output:
             print('')
             if file_count == 1:
@@ -694,7 +2342,6 @@ def main(args=None):
             print('')
     else:
         print("---------- Unable to build polyline's regions ----------")
-    input('Press Enter to continue...')
 
 
 if __name__ == "__main__":
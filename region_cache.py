@@ -0,0 +1,334 @@
+"""
+Persistent on-disk cache of built regions, so that polylines not changed since the last run
+are neither parsed nor divided into regions again.
+
+Entries are keyed by a hash of the input file's bytes (so a hit skips parsing too) or of the
+polyline's coordinates, mixed with EPS and REGIONS_ALGORITHM_VERSION. An entry is the
+polyline's points, crossing points and regions (spans of the points) in a compact binary form
+(see dump_region_list), so a restored polyline is the same as a built one, edits included.
+
+The cache directory is shared safely by several processes: entries are written into temporary
+files and renamed into place atomically, an entry's modification time marks its last use,
+and the least recently used entries are evicted, down to 90% of its size cap, when the directory
+exceeds it (one process at a time evicts, under a lock file where fcntl is available). Each process
+keeps count of the cache's size, so the directory is only scanned when an eviction is due.
+"""
+
+from array import array
+from collections import deque
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+from typing import List, Optional, Tuple
+
+import profiling
+from project import EPS, PointArray, Point, Polyline, RegionList
+
+try:
+    import fcntl
+except ImportError:     # no advisory locks (Windows): evictions may overlap, which only wastes work
+    fcntl = None
+
+# to be increased with every change of the regions a polyline is divided into, or of the entries' layout
+REGIONS_ALGORITHM_VERSION = 3
+CACHE_SUFFIX = '.plc'
+CACHE_MAGIC = b'PLC\0'
+CACHE_HEADER = struct.Struct('<4sIqqqq')   # magic, version, regions count, points count, crossings count, nr_max
+NO_POINT = -1       # region's lead or trail index: none
+FIRST_POINT = -2    # region's trail index: the polyline's first point (of a single point polyline)
+DEFAULT_MAX_BYTES = 1 << 30
+EVICT_TO = 0.9      # part of max_bytes an eviction made by put leaves, so that the next puts need none
+HASH_BLOCK = 1 << 20
+
+
+def new_hash():
+    h = hashlib.blake2b(digest_size=20)
+    h.update(struct.pack('<dI', EPS, REGIONS_ALGORITHM_VERSION))
+    return h
+
+
+def file_key(file_name: str) -> str:
+    """
+    Return: cache key of an input file, taken from its bytes, without parsing it
+    """
+    h = new_hash()
+    h.update(b'file')
+    with open(file_name, 'rb') as f:
+        while block := f.read(HASH_BLOCK):
+            h.update(block)
+    return h.hexdigest()
+
+
+def polyline_key(polyline: Polyline) -> str:
+    """
+    Return: cache key of a polyline, taken from its points' numbers and coordinates
+    """
+    h = new_hash()
+    h.update(b'points')
+    pts = polyline.pts_list
+    if isinstance(pts, PointArray):
+        columns = (array('q', pts.nr), array('d', pts.x), array('d', pts.y))
+    else:
+        columns = (array('q', (pt.nr for pt in pts)), array('d', (pt.x for pt in pts)),
+                   array('d', (pt.y for pt in pts)))
+    for column in columns:
+        if sys.byteorder != 'little':
+            column.byteswap()
+        h.update(column.tobytes())
+    return h.hexdigest()
+
+
+def dump_region_list(polyline: Polyline) -> bytes:
+    """
+    Serializes polyline's points and regions: a header, nr, x, y and is_left columns of the points,
+    nr, x and y columns of the crossing points (in intersect_pts_list's order) and id, start, end,
+    lead and trail columns of the regions (leads and trails as indices of crossing points, see
+    NO_POINT and FIRST_POINT), all little-endian. Regions are kept in the order they are stored in.
+    Regions must be spans of the points, as build_regions makes them.
+    """
+    regions = polyline.region_list.region_nodes_list if polyline.region_list else ()
+    pts = polyline.pts_list
+    if isinstance(pts, PointArray):
+        nr, x, y, is_left = array('q', pts.nr), array('d', pts.x), array('d', pts.y), array('b', pts.is_left)
+    else:
+        nr, x, y = array('q', (pt.nr for pt in pts)), array('d', (pt.x for pt in pts)), array('d', (pt.y for pt in pts))
+        is_left = array('b', (pt.is_left for pt in pts))
+    # the first item of intersect_pts_list is the polyline's first point, not a crossing point
+    crossings = [node.data for node in polyline.intersect_pts_list][1:] if polyline.intersect_pts_list else []
+    crossing_index = {id(pt): k for k, pt in enumerate(crossings)}
+
+    def point_index(pt: Optional[Point]) -> int:
+        if pt is None:
+            return NO_POINT
+        return crossing_index.get(id(pt), FIRST_POINT)
+
+    crossing_nr = array('q', (pt.nr for pt in crossings))
+    crossing_x, crossing_y = array('d', (pt.x for pt in crossings)), array('d', (pt.y for pt in crossings))
+    ids, starts, ends, leads, trails = array('q'), array('q'), array('q'), array('q'), array('q')
+    for region in regions:
+        if region.pts is None:
+            raise ValueError("Only regions built by build_regions (spans of the points) can be stored")
+        ids.append(region.id)
+        starts.append(region.start)
+        ends.append(region.end)
+        leads.append(point_index(region.lead))
+        trails.append(point_index(region.trail))
+    header = CACHE_HEADER.pack(CACHE_MAGIC, REGIONS_ALGORITHM_VERSION, len(ids), len(nr), len(crossings),
+                               polyline.pts_list_nr_max)
+    columns = [nr, x, y, is_left, crossing_nr, crossing_x, crossing_y, ids, starts, ends, leads, trails]
+    if sys.byteorder != 'little':
+        for column in columns:
+            column.byteswap()
+    return header + b''.join(column.tobytes() for column in columns)
+
+
+def load_region_list(data: bytes, polyline: Optional[Polyline] = None, storage: str = 'list') -> Polyline:
+    """
+    Restores a polyline serialized by dump_region_list into polyline (a new Polyline of storage,
+    if None; given polyline has to have the stored points already), as if it was divided into
+    regions by build_regions: with the points' is_left values and the crossing points
+    """
+    magic, version, region_count, pts_count, crossing_count, nr_max = CACHE_HEADER.unpack_from(data)
+    if magic != CACHE_MAGIC or version != REGIONS_ALGORITHM_VERSION:
+        raise ValueError(f"Not a cache entry of regions (version {REGIONS_ALGORITHM_VERSION})")
+    columns = []
+    offset = CACHE_HEADER.size
+    counts = (pts_count, crossing_count, region_count)
+    for typecode, count in zip('qddbqddqqqqq', (0, 0, 0, 0, 1, 1, 1, 2, 2, 2, 2, 2)):
+        column = array(typecode)
+        size = column.itemsize * counts[count]
+        column.frombytes(data[offset:offset + size])
+        if sys.byteorder != 'little':
+            column.byteswap()
+        offset += size
+        columns.append(column)
+    nr, x, y, is_left, crossing_nr, crossing_x, crossing_y, ids, starts, ends, leads, trails = columns
+
+    if polyline is None:
+        polyline = Polyline(id=1, storage=storage)
+        if storage == 'array':
+            polyline.pts_list.extend(nr, x, y)
+        else:
+            polyline.pts_list.extend(Point(nr=nr[i], x=x[i], y=y[i]) for i in range(pts_count))
+        polyline.pts_count = pts_count
+    pts = polyline.pts_list
+    if isinstance(pts, PointArray):
+        pts.is_left[:] = is_left
+    else:
+        for pt, side in zip(pts, is_left):
+            pt.is_left = side
+
+    polyline.intersect_pts_list = None
+    polyline.intersect_pts_count = 0
+    crossings = [Point(nr=crossing_nr[k], x=crossing_x[k], y=crossing_y[k]) for k in range(crossing_count)]
+    if crossings:
+        # restored, not counted: add_intersect_point would time them as crossings being added
+        polyline.build_intersect_pts_list()
+        for crossing in crossings:
+            polyline.intersect_pts_list.append(crossing)
+        polyline.intersect_pts_count += crossing_count
+
+    def point_at(index: int) -> Optional[Point]:
+        if index == NO_POINT:
+            return None
+        return pts[0] if index == FIRST_POINT else crossings[index]
+
+    polyline.region_list = RegionList()
+    polyline.region_list.region_nodes_list = deque(
+        polyline.new_region_span(ids[k], starts[k], ends[k], point_at(leads[k]), point_at(trails[k]))
+        for k in range(region_count))
+    polyline.region_list.count = region_count
+    polyline.pts_list_nr_max = nr_max
+    polyline.mark_regions_built()
+    return polyline
+
+
+class RegionCache:
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        # bytes of the entries found by the last scan of the directory, plus the ones put since
+        # (entries put by other processes are only seen by the next scan)
+        self.known_size: Optional[int] = None
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return: the entry of key (marking it as used now), None if there is none
+        """
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self.path(key))
+        except FileNotFoundError:   # never stored, or evicted by another process meanwhile
+            self.misses += 1
+            if profiling.enabled:
+                profiling.count('cache_misses')
+            return None
+        self.hits += 1
+        if profiling.enabled:
+            profiling.count('cache_hits')
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Stores an entry atomically (readers see either no entry or the whole of it),
+        then evicts least recently used entries if the cache got too big, as far as known_size tells,
+        so the directory is scanned once per eviction, not once per entry
+        """
+        try:
+            replaced = os.stat(self.path(key)).st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(temp_name, 0o644)
+            os.replace(temp_name, self.path(key))
+        except BaseException:
+            if os.path.exists(temp_name):
+                os.remove(temp_name)
+            raise
+        if self.known_size is None:
+            self.known_size = self.size()
+        else:
+            self.known_size += len(data) - replaced
+        if self.known_size > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_TO))
+
+    def entries(self) -> List[os.DirEntry]:
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith(CACHE_SUFFIX)]
+
+    def size(self) -> int:
+        total = 0
+        for entry in self.entries():
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Removes least recently used entries until the cache is not bigger than max_bytes
+        (self.max_bytes by default)
+        Return: number of removed entries
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = []
+            for entry in self.entries():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                stats.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in stats)
+            removed = 0
+            for _, size, path in sorted(stats):
+                if total <= max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+        self.known_size = total
+        return removed
+
+    def clear(self) -> None:
+        for entry in self.entries():
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        self.known_size = 0
+
+
+def build_regions_cached(polyline: Polyline, cache: RegionCache, engine: str = 'python',
+                         key: Optional[str] = None) -> bool:
+    """
+    Divides a polyline into regions, or restores them from the cache
+    key - cache key (polyline_key of polyline by default)
+    """
+    key = key or polyline_key(polyline)
+    data = cache.get(key)
+    if data is not None:
+        with profiling.timer('cache_restore'):
+            load_region_list(data, polyline)
+        return True
+    res = polyline.build_regions(engine)
+    if res:
+        cache.put(key, dump_region_list(polyline))
+    return res
+
+
+def load_regions_cached(file_name: str, cache: RegionCache, load, engine: str = 'python',
+                        storage: str = 'list') -> Tuple[Polyline, bool]:
+    """
+    Divides the polyline of a single polyline input file into regions: restores it from the cache
+    (into storage), with no parsing, when the file's bytes are known, or else loads the polyline
+    with load(file_name), builds its regions and stores them in the cache.
+    Return: polyline, True if it is divided into regions
+    """
+    key = file_key(file_name)
+    data = cache.get(key)
+    if data is not None:
+        with profiling.timer('cache_restore'):
+            return load_region_list(data, storage=storage), True
+    polyline = load(file_name)
+    res = polyline.build_regions(engine)
+    if res:
+        cache.put(key, dump_region_list(polyline))
+    return polyline, res
@@ -0,0 +1,257 @@
+"""
+Polyline's Regions Builder service: a long-running asyncio server answering HTTP requests
+on localhost or on a Unix socket, so that many polylines are processed by one warm process
+with no interpreter start-up per polyline.
+
+    POST /regions
+    {"points": [[x, y], ...] or [[nr, x, y], ...], "engine": "python", "format": "json"}
+
+is answered with {"count": <regions count>, "regions": [[[nr, x, y], ...], ...]} or, for
+"format": "binary", with the regions in the binary .plr layout (see project.BinarySink).
+Points of [x, y] pairs are numbered from 1. GET /stats answers with the service's counters.
+
+Requests are put into a bounded queue, so when it is full new requests wait (backpressure).
+Batcher tasks take batches of queued requests and build their regions in an executor,
+a pool of processes by default, one batch per executor call.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+import io
+import json
+import math
+import os
+from typing import List, Optional, Tuple
+
+from project import ENGINES, BinarySink, Point, Polyline, region_points
+
+FORMATS = ('json', 'binary')
+MAX_BODY_SIZE = 1 << 28
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+
+def polyline_from_points(points) -> Polyline:
+    """
+    Input: points - list of [x, y] or [nr, x, y] lists
+    """
+    if not isinstance(points, list):
+        raise ValueError("points must be a list of [x, y] or [nr, x, y] lists")
+    polyline = Polyline(id=1)
+    for i, row in enumerate(points, 1):
+        if len(row) == 2:
+            nr, x, y = i, float(row[0]), float(row[1])
+        elif len(row) == 3:
+            nr, x, y = int(row[0]), float(row[1]), float(row[2])
+        else:
+            raise ValueError(f"point {i} is not an [x, y] or [nr, x, y] list")
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError(f"point {i} has a non-finite coordinate")
+        polyline.add_point(Point(nr=nr, x=x, y=y))
+    return polyline
+
+
+def build_response(points, engine: str = 'python', output_format: str = 'json') -> bytes:
+    """
+    Builds regions of the polyline of points and encodes them in output_format
+    """
+    polyline = polyline_from_points(points)
+    if polyline.build_regions(engine):
+        regions = list(reversed(polyline.region_list.region_nodes_list))
+    else:
+        regions = []
+    if output_format == 'binary':
+        sink = BinarySink('')
+        sink.begin(len(regions))
+        for i, region in enumerate(regions, 1):
+            sink.write_region(i, region)
+        buffer = io.BytesIO()
+        sink.dump(buffer, len(regions))
+        return buffer.getvalue()
+    return json.dumps({'count': len(regions),
+                       'regions': [[[pt.nr, pt.x, pt.y] for pt in region_points(region)] for region in regions]
+                       }).encode()
+
+
+def build_batch(jobs: List[Tuple]) -> List[Tuple[int, bytes]]:
+    """
+    Runs build_response for each (points, engine, output_format) job, in an executor's worker.
+    A failing job does not fail the others of the batch.
+    Return: (HTTP status, body) of each job
+    """
+    results = []
+    for points, engine, output_format in jobs:
+        try:
+            results.append((200, build_response(points, engine, output_format)))
+        except (ValueError, TypeError) as e:
+            results.append((400, json.dumps({'error': str(e)}).encode()))
+        except Exception as e:
+            results.append((500, json.dumps({'error': repr(e)}).encode()))
+    return results
+
+
+class RegionService:
+    def __init__(self, executor: Optional[Executor] = None, workers: Optional[int] = None,
+                 queue_size: int = 1024, batch_size: int = 64, engine: str = 'python'):
+        """
+        executor - where regions are built, a ProcessPoolExecutor of workers processes by default
+        queue_size - number of requests waiting for a batcher, before new ones have to wait
+        batch_size - greatest number of requests handed to the executor at once
+        engine - regions building engine of requests not choosing one
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.own_executor = executor is None
+        self.executor = executor
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.engine = engine
+        self.queue: Optional[asyncio.Queue] = None
+        self.batchers: List[asyncio.Task] = []
+        self.servers: List[asyncio.AbstractServer] = []
+        self.connections = set()
+        self.unix_path: Optional[str] = None
+        self.stats = {'requests': 0, 'batches': 0, 'errors': 0}
+
+    async def start(self, host: Optional[str] = '127.0.0.1', port: int = 8765,
+                    unix_path: Optional[str] = None) -> List[asyncio.AbstractServer]:
+        """
+        Starts listening on host:port (if host is given) and on the unix_path socket (if given)
+        Return: started servers
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        # one batch in the executor per its worker
+        self.batchers = [asyncio.create_task(self.batcher()) for _ in range(self.workers)]
+        if host is not None:
+            self.servers.append(await asyncio.start_server(self.handle, host, port))
+        if unix_path is not None:
+            self.servers.append(await asyncio.start_unix_server(self.handle, unix_path))
+            self.unix_path = unix_path
+        return self.servers
+
+    async def close(self) -> None:
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        tasks = self.batchers + list(self.connections)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.own_executor and self.executor:
+            self.executor.shutdown()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    async def submit(self, points, engine: str, output_format: str) -> Tuple[int, bytes]:
+        """
+        Queues a request (waiting while the queue is full) and waits for its result
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put(((points, engine, output_format), future))
+        return await future
+
+    async def batcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            jobs = [job for job, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, build_batch, jobs)
+            except Exception as e:
+                results = [(500, json.dumps({'error': repr(e)}).encode())] * len(batch)
+            self.stats['batches'] += 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def respond(self, method: str, path: str, body: bytes) -> Tuple[int, bytes, str]:
+        """
+        Return: HTTP status, body and content type answering a request
+        """
+        if path == '/stats' and method == 'GET':
+            return 200, json.dumps(dict(self.stats, queued=self.queue.qsize())).encode(), 'application/json'
+        if path != '/regions':
+            return 404, b'{"error": "unknown path"}', 'application/json'
+        if method != 'POST':
+            return 405, b'{"error": "POST expected"}', 'application/json'
+        try:
+            request = json.loads(body)
+            points = request['points']
+            engine = request.get('engine', self.engine)
+            output_format = request.get('format', 'json')
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown engine: {engine}, expected one of: {', '.join(ENGINES)}")
+            if output_format not in FORMATS:
+                raise ValueError(f"Unknown format: {output_format}, expected one of: {', '.join(FORMATS)}")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            return 400, json.dumps({'error': f'Invalid request: {e!r}'}).encode(), 'application/json'
+        status, response = await self.submit(points, engine, output_format)
+        if status == 200 and output_format == 'binary':
+            return status, response, 'application/octet-stream'
+        return status, response, 'application/json'
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serves HTTP/1.1 requests of a connection, keeping it alive until the client closes it
+        """
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, version = request_line.decode('latin-1').split()
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_SIZE:
+                    status, body, content_type = 413, b'{"error": "request too large"}', 'application/json'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length)
+                    self.stats['requests'] += 1
+                    status, body, content_type = await self.respond(method, path.split('?')[0], body)
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                if status != 200:
+                    self.stats['errors'] += 1
+                writer.write(f'HTTP/1.1 {status} {REASONS.get(status, "Error")}\r\n'
+                             f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                             f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+
+
+async def run_service(host: Optional[str] = '127.0.0.1', port: int = 8765, unix_path: Optional[str] = None,
+                      **options) -> None:
+    """
+    Runs the service until cancelled (f.e. with Ctrl+C)
+    """
+    service = RegionService(**options)
+    servers = await service.start(host, port, unix_path)
+    for server in servers:
+        for sock in server.sockets:
+            print(f'---------- Serving regions on {sock.getsockname()} ----------')
+    try:
+        await asyncio.gather(*(server.serve_forever() for server in servers))
+    finally:
+        await service.close()
+
+
+def serve(host: Optional[str] = '127.0.0.1', port: int = 8765, unix_path: Optional[str] = None,
+          **options) -> None:
+    try:
+        asyncio.run(run_service(host, port, unix_path, **options))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,7 @@
 # from project import Point
-from dcll import DCLLNode, DCLL
+import random
+from dcll import DCLLNode, DCLL, CompactDCLL
+import pytest
 
 
 def test_node_init():
@@ -22,7 +24,32 @@ def test_dcll_append():
     dcll = DCLL()
     for i in range(5):
         r = dcll.append(data=i)
-        assert r == i
+        assert isinstance(r, DCLLNode)
+        assert r.data == i
+        assert r is dcll.tail
+        assert r.next is dcll.head
+    assert [it.data for it in dcll] == [0, 1, 2, 3, 4]
+
+
+def test_dcll_prepend():
+    dcll = DCLL()
+    for i in range(5):
+        r = dcll.prepend(data=i)
+        assert r is dcll.head
+        assert r.prev is dcll.tail
+    assert [it.data for it in dcll] == [4, 3, 2, 1, 0]
+    assert dcll.tail.data == 0
+
+
+def test_dcll_insert():
+    dcll = DCLL()
+    for i in (1, 3):
+        dcll.append(i)
+    assert dcll.insert(2, 1) == 2
+    assert dcll.insert(0, 0) == 0
+    assert dcll.insert(4, len(dcll)) == 4
+    assert [it.data for it in dcll] == [0, 1, 2, 3, 4]
+    assert dcll.tail.data == 4
 
 
 def test_dcll_remove():
@@ -63,3 +90,246 @@ def test_dcll_setitem():
 
     dcll[len(dcll)] = DCLLNode(200)
     assert dcll[len(dcll) - 1].data == 200
+
+
+def test_dcll_node_at_shortest_walk():
+    dcll = DCLL()
+    for i in range(9):
+        dcll.append(i)
+    assert dcll.node_at(8) is dcll.head.prev
+    assert dcll.node_at(-1) is dcll.tail
+    for i in reversed(range(9)):
+        assert dcll[i].data == i
+        assert dcll.get(i) == i
+
+
+def test_dcll_finger():
+    dcll = DCLL(finger=True)
+    for i in range(10):
+        dcll.append(i)
+    for i in range(len(dcll)):
+        assert dcll[i].data == i
+        assert dcll._finger is dcll[i]
+    dcll.insert(100, 5)
+    assert dcll._finger is None
+    assert [dcll[i].data for i in range(len(dcll))] == [0, 1, 2, 3, 4, 100, 5, 6, 7, 8, 9]
+    dcll.remove(5)
+    assert [dcll[i].data for i in reversed(range(len(dcll)))] == list(reversed(range(10)))
+
+
+def test_dcll_remove_head():
+    dcll = DCLL()
+    for i in range(3):
+        dcll.append(i)
+    assert dcll.remove(0) == 2
+    assert [it.data for it in dcll] == [1, 2]
+
+
+def test_dcll_move():
+    for from_index in range(6):
+        for to_index in range(6):
+            dcll = DCLL()
+            expected = list(range(6))
+            for i in expected:
+                dcll.append(i)
+            expected.insert(to_index, expected.pop(from_index))
+            item = dcll[from_index]
+            assert dcll.move(item, from_index, to_index) is item
+            assert [it.data for it in dcll] == expected
+            assert dcll.tail is dcll.head.prev
+
+
+@pytest.fixture(params=[DCLL, CompactDCLL])
+def dcll_class(request):
+    return request.param
+
+
+def test_compact_dcll_api(dcll_class):
+    dcll = dcll_class()
+    nodes = [dcll.append(i) for i in range(6)]
+    assert [it.data for it in dcll] == [0, 1, 2, 3, 4, 5]
+    assert nodes[5].next == dcll.head
+    assert dcll.prepend(-1).data == -1
+    assert dcll.insert(10, 3) == 10
+    assert [it.data for it in dcll] == [-1, 0, 1, 10, 2, 3, 4, 5]
+    assert dcll.remove(3) == 1
+    dcll.delete_node(dcll.head)
+    assert [dcll.get(i) for i in range(len(dcll))] == [0, 1, 2, 3, 4, 5]
+    dcll.move(dcll[4], 4, 1)
+    assert [it.data for it in dcll] == [0, 4, 1, 2, 3, 5]
+    dcll.move(dcll[0], 0, 5)
+    assert [it.data for it in dcll] == [4, 1, 2, 3, 5, 0]
+    dcll.set_order(sorted(dcll, key=lambda n: n.data))
+    assert [it.data for it in dcll] == [0, 1, 2, 3, 4, 5]
+    assert dcll.tail.data == 5
+    assert dcll.find_node_by_data(3).data == 3
+    assert dcll.clear_list()
+    assert len(dcll) == 0
+
+
+def test_compact_dcll_reuses_slots():
+    dcll = CompactDCLL()
+    for i in range(4):
+        dcll.append(i)
+    dcll.remove(1)
+    dcll.remove(1)
+    node = dcll.append(7)
+    assert node.slot in (1, 2)
+    assert len(dcll._data) == 4
+    assert [it.data for it in dcll] == [0, 3, 7]
+
+
+def legacy_set_order(dcll, order_list):
+    # the original index() + move() implementation of DCLL.set_order, kept as a reference
+    from_data = dcll.head.prev
+    for i, item in enumerate(order_list):
+        if i < dcll.count - 1:
+            current_index = dcll.index(item.data, i, from_data.next)
+            from_data = dcll.move(item, current_index, i)
+        if i == 0:
+            dcll.head = item
+    dcll.tail = dcll.head.prev
+    return dcll.head
+
+
+def test_dcll_set_order_matches_legacy():
+    rng = random.Random(2022)
+    for _ in range(300):
+        n = rng.randint(3, 40)
+        data = rng.sample(range(1000), n)
+        lists = []
+        for _ in range(2):
+            dcll = DCLL()
+            for d in data:
+                dcll.append(d)
+            lists.append(dcll)
+        order = rng.sample(range(n), rng.randint(1, n))
+        expected = legacy_set_order(lists[0], [lists[0][i] for i in order])
+        actual = lists[1].set_order([lists[1][i] for i in order])
+        assert actual.data == expected.data
+        assert [it.data for it in lists[1]] == [it.data for it in lists[0]]
+        assert [lists[1][i].prev.data for i in range(n)] == [lists[0][(i - 1) % n].data for i in range(n)]
+
+
+def test_dcll_set_order_errors(dcll_class):
+    dcll = dcll_class()
+    for i in range(2):
+        dcll.append(i)
+    assert dcll.set_order([dcll[1], dcll[0]]).data == 1
+    assert [it.data for it in dcll] == [1, 0]
+    with pytest.raises(ValueError):
+        dcll.set_order([dcll[0], dcll[0]])
+    other = dcll_class()
+    other.append(5)
+    # a node of another list, whether the order is longer or as long as the list
+    with pytest.raises(ValueError):
+        dcll.set_order([other[0], dcll[0], dcll[1]])
+    with pytest.raises(ValueError):
+        dcll.set_order([other[0], dcll[0]])
+    with pytest.raises(ValueError):
+        dcll.set_order([DCLLNode(5), dcll[0]])
+    assert [it.data for it in dcll] == [1, 0]
+    assert [it.data for it in other] == [5]
+
+
+def test_compact_dcll_removed_node():
+    dcll = CompactDCLL()
+    nodes = [dcll.append(i) for i in range(3)]
+    dcll.delete_node(nodes[1])
+    with pytest.raises(ValueError):
+        dcll.set_order([nodes[2], nodes[1]])
+    with pytest.raises(ValueError):
+        dcll.delete_node(nodes[1])
+    with pytest.raises(ValueError):
+        dcll.move(nodes[1], 1, 0)
+    assert [it.data for it in dcll] == [0, 2]
+    dcll.append(3), dcll.append(4)
+    assert [it.data for it in dcll] == [0, 2, 3, 4]
+
+
+def test_compact_dcll_emptied_and_refilled():
+    dcll = CompactDCLL()
+    for i in range(3):
+        dcll.append(i)
+    for _ in range(3):
+        dcll.remove(0)
+    for d in 'abc':
+        dcll.append(d)
+    assert [it.data for it in dcll] == ['a', 'b', 'c']
+    assert [dcll.tail.prev.data, dcll.head.prev.data] == ['b', 'c']
+
+    rng = random.Random(3)
+    for _ in range(200):
+        dcll, expected = CompactDCLL(), []
+        for _ in range(rng.randrange(1, 30)):
+            if expected and rng.random() < 0.45:
+                i = rng.randrange(len(expected))
+                dcll.remove(i)
+                del expected[i]
+            elif rng.random() < 0.5:
+                d = rng.random()
+                dcll.prepend(d)
+                expected.insert(0, d)
+            else:
+                d = rng.random()
+                dcll.append(d)
+                expected.append(d)
+            assert list(dcll.iter_data()) == expected
+
+
+def test_dcll_remove_repeated_data(dcll_class):
+    dcll = dcll_class()
+    for d in [1, 2, 1, 3, 2, 2, 4, 1]:
+        dcll.append(d)
+    assert dcll.remove_repeated_data(8) == 4
+    assert [it.data for it in dcll] == [1, 2, 3, 4]
+    assert len(dcll) == 4
+
+    dcll = dcll_class()
+    for d in [[1], [2], [1]]:
+        dcll.append(d)
+    assert dcll.remove_repeated_data(3) == 2
+    assert [it.data for it in dcll] == [[1], [2]]
+
+
+def test_dcll_data_index():
+    items = [[i] for i in range(6)]
+    dcll = DCLL(index_data=True)
+    for it in items[:4]:
+        dcll.append(it)
+    dcll.insert(items[4], 2)
+    dcll[0] = DCLLNode(items[5])
+    assert all(dcll.find_node_by_data(it).data is it for it in items)
+    assert dcll.find_node_by_data([0]) is None
+    with pytest.raises(ValueError):
+        dcll.append(items[0])
+
+    dcll.set_order(list(reversed(list(dcll))))
+    dcll.move(dcll[3], 3, 0)
+    assert all(dcll.find_node_by_data(it).data is it for it in items)
+
+    dcll.remove(dcll.index(items[1]))
+    assert dcll.delete_data(items[2]).data is items[2]
+    assert dcll.delete_data(items[2]) is None
+    assert dcll.find_node_by_data(items[1]) is None
+    assert sorted(it.data[0] for it in dcll) == [0, 3, 4, 5]
+
+    dcll.clear_list()
+    assert dcll.find_node_by_data(items[0]) is None
+    dcll.append(items[0])
+    assert dcll.delete_data(items[0]) is not None
+    assert len(dcll) == 0 and dcll.head is None
+
+
+def test_dcll_insert_after():
+    items = [[i] for i in range(4)]
+    dcll = DCLL(index_data=True)
+    for it in items[:2]:
+        dcll.append(it)
+    node = dcll.insert_after(dcll.head, items[2])
+    dcll.insert_after(node, items[3])
+    assert [it.data for it in dcll] == [[0], [2], [3], [1]]
+    assert dcll.tail.data is items[1] and dcll.count == 4
+    assert dcll.find_node_by_data(items[3]).prev is node
+    dcll.insert_after(dcll.tail, [4])
+    assert dcll.tail.data == [4] and dcll.tail.next is dcll.head
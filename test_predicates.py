@@ -0,0 +1,79 @@
+import random
+import pytest
+import profiling
+from predicates import exact_orientation, exact_sign, orientation
+from project import BaseLine, Point, Polyline
+
+A = (0.1, 0.3)
+B = (1234.56789, 987.654321)
+
+
+def near_line_points(count, seed=3):
+    rng = random.Random(seed)
+    points = []
+    for _ in range(count):
+        t = rng.uniform(-2, 3)
+        points.append((A[0] + t * (B[0] - A[0]), A[1] + t * (B[1] - A[1])))
+    return points
+
+
+def float_sign(c):
+    lv = Polyline.is_left(Point(x=c[0], y=c[1]), Point(x=A[0], y=A[1]), Point(x=B[0], y=B[1]))
+    return Polyline.is_left_value(lv)
+
+
+def test_orientation_is_exact_near_the_line():
+    points = near_line_points(2000)
+    exact = [exact_sign(*A, *B, *c) for c in points]
+    assert [orientation(*A, *B, *c) for c in points] == exact
+    base_line = BaseLine(Point(x=A[0], y=A[1]), Point(x=B[0], y=B[1]))
+    assert [base_line.sign(*c) for c in points] == exact
+    # the plain float sign is wrong for many of them
+    assert sum(float_sign(c) != e for c, e in zip(points, exact)) > 100
+
+
+def test_orientation_simple_cases():
+    assert orientation(0.0, 0.0, 2.0, 0.0, 1.0, 1.0) == 1
+    assert orientation(0.0, 0.0, 2.0, 0.0, 1.0, -1.0) == -1
+    assert orientation(0.0, 0.0, 2.0, 0.0, 5.0, 0.0) == 0
+    assert orientation(0.0, 0.0, 2.0, 2.0, 1e300, 1e300) == 0
+    assert orientation(0.0, 0.0, 1.0, 1.0, 0.5, 0.5 + 2 ** -52) == 1
+    assert Polyline.orientation(Point(x=1.0, y=-1.0), Point(x=0.0, y=0.0), Point(x=2.0, y=0.0)) == -1
+    assert exact_orientation(3.0, 1.0, 3.0, 7.0, 3.0, -2.0) == 0
+
+
+def test_exact_path_is_rare():
+    rng = random.Random(1)
+    with profiling.profile() as stats:
+        for _ in range(10000):
+            orientation(*A, *B, rng.uniform(-1e3, 1e3), rng.uniform(-1e3, 1e3))
+        orientation(0.0, 0.0, 2.0, 0.0, 5.0, 0.0)       # on the line, decided with no rational arithmetic
+    assert stats['counters'] == {}
+    with profiling.profile() as stats:
+        for c in near_line_points(50):
+            orientation(*A, *B, *c)
+    assert stats['counters']['exact_orientations'] == 50
+
+
+def test_orientations_batched():
+    np = pytest.importorskip("numpy")
+    from predicates import orientations
+    rng = random.Random(2)
+    points = near_line_points(500) + [(rng.uniform(-1e3, 1e3), rng.uniform(-1e3, 1e3)) for _ in range(500)] + [A, B]
+    x = np.array([c[0] for c in points])
+    y = np.array([c[1] for c in points])
+    with profiling.profile() as stats:
+        signs = orientations(*A, *B, x, y)
+    assert signs.dtype == np.int8
+    assert signs.tolist() == [orientation(*A, *B, *c) for c in points]
+    assert stats['counters']['exact_orientations'] == 501     # the near ones and b itself (a is certainly 0)
+    assert orientations(0.0, 0.0, 2.0, 0.0, np.array([5.0, 1.0]), np.array([0.0, -3.0])).tolist() == [0, -1]
+
+
+def test_non_finite_coordinates():
+    inf, nan = float('inf'), float('nan')
+    for c in [(inf, 1.0), (1.0, -inf), (nan, 1.0), (inf, nan)]:
+        assert orientation(*A, *B, *c) == 0
+        assert exact_orientation(*A, *B, *c) == 0
+    assert orientation(0.0, 0.0, inf, 1.0, 1.0, 5.0) == 0
+    assert exact_sign(nan, 0.0, 1.0, 1.0, 2.0, 3.0) == 0
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+import pytest
+import profiling
+from project import main, process_batch
+
+
+def test_disabled_by_default(make_polyline):
+    assert not profiling.enabled
+    make_polyline(10).build_regions()
+    assert profiling.stats() == {'counters': {}, 'timers': {}}
+
+
+def test_build_regions_stats(make_polyline):
+    polyline = make_polyline(40)
+    with profiling.profile() as stats:
+        polyline.build_regions()
+    assert not profiling.enabled
+    regions = polyline.region_list.count
+    crossings = polyline.intersect_pts_count - 1   # the list starts with the polyline's first point
+    assert crossings > 10
+    assert stats['counters'] == {'vertices_classified': 38, 'regions_started': regions,
+                                 'sign_changes': regions - 1, 'intersections': crossings}
+    assert stats['timers']['build_regions']['calls'] == 1
+    assert stats['timers']['add_intersect_point']['calls'] == crossings
+    assert stats['timers']['build_regions.intersections']['calls'] == crossings
+
+
+def test_nested_profiles(make_polyline):
+    with profiling.profile() as outer:
+        make_polyline(5).build_regions()
+        with profiling.profile() as inner:
+            make_polyline(30).build_regions()
+        assert profiling.enabled
+    assert inner['counters']['vertices_classified'] == 28
+    assert outer['counters']['vertices_classified'] == 31
+    assert profiling.stats() == {'counters': {}, 'timers': {}}
+
+
+def test_main_profile(zigzag_file, capsys):
+    with patch('builtins.input'):
+        main(['-f', zigzag_file, '--profile', '--output-mode=binary'])
+    out = capsys.readouterr().out
+    for name in ('read_data', 'build_regions', 'write_regions', 'points_read', 'regions_written'):
+        assert name in out
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_stats(zigzag_file, workers):
+    with profiling.profile() as stats:
+        process_batch([zigzag_file, zigzag_file], workers=workers, output_modes='binary')
+    assert stats['counters']['points_read'] == 80
+    assert stats['timers']['write_regions']['calls'] == 2
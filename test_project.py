@@ -4,8 +4,20 @@
 # import unittest
 from unittest.mock import patch, mock_open
 # import pdb
-from project import prepare_polyline, read_data, fill_poly_with_data, Polyline, Point
+from project import prepare_polyline, read_data, fill_poly_with_data, Polyline, Point, PointArray, EPS
+from project import scan_polyline_file, stream_regions, write_regions, write_regions_stream, load_polyline
+from project import convert_to_binary, load_binary_polyline, write_binary_polyline, main, read_regions_binary
+from project import process_batch, expand_inputs, iter_polylines, iter_input_polylines, BaseLine, input_parsing_1
+from array import array
+from collections import deque
+import csv
+import json
+import math
+from dcll import DCLL, DataBuckets
+import profiling
+import project
 import pytest
+import random
 # import sys
 
 
@@ -108,4 +120,480 @@ def test_prepare_polyline(test_polyline_instance, test_polyline_empty):
     expected_empty = False
     actual_empty = prepare_polyline(test_polyline_empty)
     assert expected_empty == actual_empty
-    
\ No newline at end of file
+
+
+def test_point_hash():
+    pt = Point(x=1.0, y=2.0)
+    with pytest.raises(TypeError):
+        hash(pt)
+    # equal points on both sides of a grid cell border
+    other = Point(x=math.floor(1.0 / EPS) * EPS - EPS / 4, y=2.0 + EPS / 2)
+    assert pt == other and pt.grid_key != other.grid_key
+    assert pt.grid_key in other.grid_keys() and other.grid_key in pt.grid_keys()
+    buckets = DataBuckets()
+    assert buckets.add_if_new(pt) and not buckets.add_if_new(other)
+
+
+def test_remove_repeated_points():
+    rng = random.Random(2008)
+    for _ in range(50):
+        pts = [Point(nr=i, x=rng.choice((0.0, 1.0)) + rng.uniform(-2, 2) * EPS,
+                     y=rng.choice((0.0, 1.0)) + rng.uniform(-2, 2) * EPS) for i in range(60)]
+        expected = []
+        for pt in pts:
+            if all(pt != k for k in expected):
+                expected.append(pt)
+        dcll = DCLL()
+        for pt in pts:
+            dcll.append(pt)
+        assert dcll.remove_repeated_data(len(pts)) == len(expected)
+        assert [it.data.nr for it in dcll] == [pt.nr for pt in expected]
+
+
+def regions_points(polyline):
+    return [[(pt.nr, pt.x, pt.y, pt.is_left) for pt in rn.reg_pts_list]
+            for rn in reversed(polyline.region_list.region_nodes_list)]
+
+
+def test_point_array():
+    pts = PointArray()
+    pts.append(Point(nr=3, x=1.5, y=2.5))
+    pts.append(Point(nr=4, x=3.0, y=-1.0))
+    assert len(pts) == 2
+    view = pts[-1]
+    assert isinstance(view, Point)
+    assert (view.nr, view.x, view.y, view.is_left) == (4, 3.0, -1.0, 0)
+    view.is_left = -1
+    view.x = 7.0
+    assert pts.is_left[1] == -1 and pts.x[1] == 7.0
+    assert str(pts[0]) == "Point:3(1.5,2.5)"
+    assert pts == [Point(x=1.5, y=2.5), Point(x=7.0, y=-1.0)]
+    assert [pt.nr for pt in pts[0:2]] == [3, 4]
+    with pytest.raises(IndexError):
+        pts[2]
+
+
+def test_fill_poly_with_data_array_storage(test_csv_reader, test_polyline_instance):
+    actual = fill_poly_with_data(test_csv_reader, storage='array')
+    assert actual.storage == 'array'
+    assert isinstance(actual.pts_list, PointArray)
+    assert actual == test_polyline_instance
+    assert actual.pts_list_nr_max == 8
+
+    actual = fill_poly_with_data([['Nr', 'X', 'Y'], ['101', '1', '2'], ['102', '3', '4']], storage='array')
+    assert list(actual.pts_list.nr) == [101, 102]
+    assert actual.pts_list_nr_max == 102
+
+
+def test_build_regions_array_storage():
+    expected = Polyline(id=1)
+    actual = Polyline(id=1, storage='array')
+    for i, (x, y) in enumerate([(0, 0), (1, 2), (2, -1), (3, 0), (4, 0), (5, 1), (6, 0)]):
+        expected.add_point(Point(nr=i + 1, x=x, y=y))
+        actual.add_point(Point(nr=i + 1, x=x, y=y))
+    assert actual.build_regions() == expected.build_regions()
+    assert regions_points(actual) == regions_points(expected)
+    assert actual.region_list.count == expected.region_list.count == 3
+    assert list(actual.pts_list.is_left) == [0, 1, -1, 0, 0, 1, 0]
+
+
+@pytest.mark.parametrize("columns", [2, 3])
+def test_stream_regions(zigzag_csv, columns):
+    file_name = zigzag_csv(columns)
+    polyline, _ = read_data(['-f', file_name])
+    polyline.build_regions()
+    first, last, nr_max = scan_polyline_file(file_name)
+    assert (first.nr, first.x, last.nr, last.x) == (polyline.pts_list[0].nr, 0, polyline.pts_list[-1].nr, 39)
+    assert nr_max == polyline.pts_list[-1].nr
+
+    streamed = [[(pt.nr, pt.x, pt.y) for pt in rn.reg_pts_list] for rn in stream_regions(file_name)]
+    assert streamed == [[pt[:3] for pt in pts] for pts in regions_points(polyline)]
+    assert len(streamed) > 10
+
+
+@pytest.mark.parametrize("content", ['X,Y\n0,0\n1,1\n2,-1\n3,0\n5\n',
+                                     'X,Y\n0,0\n1,1\n2,-1\n7,3,0\n',
+                                     'Nr,X,Y\n10,0,0\n11,1,1\n2,-1\n13,3,0\n\n5,6,7,8\n',
+                                     'X,Y\n0,0\n1,2\n2,-1\n3,0\n' + '9\n' * 3000],
+                         ids=['one_field', 'three_fields', 'mixed', 'long_tail'])
+def test_stream_regions_irregular_last_rows(tmp_path, content):
+    path = tmp_path / 'irregular.csv'
+    path.write_text(content)
+    polyline, _ = read_data(['-f', str(path)])
+    first, last, nr_max = scan_polyline_file(str(path))
+    assert (first, last) == (polyline.pts_list[0], polyline.pts_list[-1])
+    assert (last.nr, nr_max) == (polyline.pts_list[-1].nr, polyline.pts_list_nr_max)
+    polyline.build_regions()
+    streamed = [[(pt.nr, pt.x, pt.y) for pt in rn.reg_pts_list] for rn in stream_regions(str(path))]
+    assert streamed == [[pt[:3] for pt in pts] for pts in regions_points(polyline)]
+
+
+def test_write_regions_stream(zigzag_csv, tmp_path):
+    file_name = zigzag_csv(2)
+    output, file_count = write_regions_stream(stream_regions(file_name), file_name)
+    assert output and file_count > 10
+    streamed = {p.name: p.read_text() for p in tmp_path.glob('zigzag2_reg[0-9]*.csv')}
+    for p in tmp_path.glob('zigzag2_reg[0-9]*.csv'):
+        p.unlink()
+
+    polyline, _ = read_data(['-f', file_name])
+    polyline.build_regions()
+    assert write_regions(polyline, file_name) == (True, file_count)
+    assert streamed == {p.name: p.read_text() for p in tmp_path.glob('zigzag2_reg[0-9]*.csv')}
+    assert 'zigzag2_reg01.csv' in streamed
+
+
+@pytest.mark.parametrize("chunk_size", [7, 64, 1 << 20])
+def test_load_polyline(zigzag_csv, tmp_path, chunk_size):
+    irregular = tmp_path / 'irregular.csv'
+    irregular.write_text('X,Y\n1,2\n\n3,4\n5\n7,8,9\n10,11')
+    # a short and a long row, with as many fields as two regular rows
+    shifted = tmp_path / 'shifted.csv'
+    shifted.write_text('Nr,X,Y\n1,0,0\n2,1\n3,4,5,6\n4,3,0\n')
+    for file_name in (zigzag_csv(2), zigzag_csv(3), str(irregular), str(shifted)):
+        with open(file_name) as f:
+            expected = fill_poly_with_data(csv.reader(f))
+        actual = load_polyline(file_name, chunk_size)
+        assert actual.storage == 'array'
+        assert actual == expected
+        assert [pt.nr for pt in actual.pts_list] == [pt.nr for pt in expected.pts_list]
+        assert (actual.pts_count, actual.pts_list_nr_max) == (expected.pts_count, expected.pts_list_nr_max)
+
+
+def test_binary_polyline(zigzag_csv, tmp_path):
+    csv_name = zigzag_csv(3)
+    output_name, pts_count = convert_to_binary(csv_name)
+    assert output_name.endswith('zigzag3.plb') and pts_count == 40
+
+    expected, _ = read_data(['-f', csv_name])
+    actual, _ = read_data(['-f', output_name])
+    assert isinstance(actual.pts_list.x, memoryview)
+    assert actual == expected
+    assert list(actual.pts_list.nr) == [pt.nr for pt in expected.pts_list]
+    assert (actual.pts_count, actual.pts_list_nr_max) == (40, 139)
+
+    expected.build_regions()
+    actual.build_regions()
+    assert regions_points(actual) == regions_points(expected)
+    actual.pts_list[1].x = 999.0
+    assert load_binary_polyline(output_name).pts_list[1].x == 1.0   # the mapping is copy-on-write
+
+    empty = tmp_path / 'empty.plb'
+    write_binary_polyline(Polyline(id=1), str(empty))
+    assert load_binary_polyline(str(empty)).pts_count == 0
+    (tmp_path / 'bad.plb').write_bytes(b'PLB')
+    with pytest.raises(ValueError):
+        load_binary_polyline(str(tmp_path / 'bad.plb'))
+
+
+def test_binary_polyline_edits(zigzag_csv):
+    csv_name = zigzag_csv(3)
+    output_name, _ = convert_to_binary(csv_name)
+    expected = load_polyline(csv_name)
+    actual = load_binary_polyline(output_name)
+    for polyline in (expected, actual):
+        polyline.build_regions()
+        polyline.insert_point(10, Point(nr=200, x=9.5, y=-7.0))
+        assert polyline.delete_point(20).nr == 119
+        polyline.update_point(5, 4.5, 6.0)
+    assert isinstance(actual.pts_list.x, array)
+    assert actual == expected
+    assert crossings_and_regions(actual) == crossings_and_regions(expected)
+    assert load_binary_polyline(output_name) == load_polyline(csv_name)
+
+
+def test_main_convert(zigzag_csv, capsys):
+    csv_name = zigzag_csv(2)
+    main(['convert', csv_name, '-o', csv_name + '.plb'])
+    assert '40 points written' in capsys.readouterr().out
+    assert load_binary_polyline(csv_name + '.plb') == load_polyline(csv_name)
+
+
+def test_write_regions_single_and_binary(zigzag_csv, tmp_path):
+    file_name = zigzag_csv(3)
+    expected = []
+    polyline, _ = read_data(['-f', file_name])
+    polyline.build_regions()
+    output, file_count = write_regions(polyline, file_name)
+    for p in sorted(tmp_path.glob('zigzag3_reg[0-9]*.csv')):
+        with open(p) as f:
+            expected.append([(int(r[0]), float(r[1]), float(r[2])) for r in list(csv.reader(f))[1:]])
+
+    polyline, _ = read_data(['-f', file_name])
+    polyline.build_regions()
+    assert write_regions(polyline, file_name, 'single') == (True, file_count)
+    assert write_regions(polyline, file_name, 'binary') == (True, file_count)
+
+    with open(tmp_path / 'zigzag3_regions.csv') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['Region', 'Nr', 'X', 'Y']
+    single = [[] for _ in range(file_count)]
+    for r in rows[1:]:
+        single[int(r[0]) - 1].append((int(r[1]), float(r[2]), float(r[3])))
+    assert single == expected
+    assert read_regions_binary(str(tmp_path / 'zigzag3_regions.plr')) == expected
+
+    with pytest.raises(ValueError):
+        write_regions(polyline, file_name, 'xml')
+
+
+def test_write_regions_keeps_regions_and_fans_out(zigzag_csv, tmp_path):
+    file_name = zigzag_csv(3)
+    polyline, _ = read_data(['-f', file_name])
+    polyline.build_regions()
+    before = regions_points(polyline)
+    output, file_count = write_regions(polyline, file_name, ['files', 'single', 'binary', 'geojson'])
+    assert output and file_count == polyline.region_list.count
+    assert regions_points(polyline) == before
+
+    separate = []
+    for p in sorted(tmp_path.glob('zigzag3_reg[0-9]*.csv')):
+        with open(p) as f:
+            separate.append([(int(r[0]), float(r[1]), float(r[2])) for r in list(csv.reader(f))[1:]])
+    assert read_regions_binary(str(tmp_path / 'zigzag3_regions.plr')) == separate
+    with open(tmp_path / 'zigzag3_regions.geojson') as f:
+        features = json.load(f)['features']
+    assert [f['properties']['region'] for f in features] == list(range(1, file_count + 1))
+    assert [list(zip(f['properties']['nr'], *zip(*f['geometry']['coordinates']))) for f in features] == separate
+
+    assert write_regions(polyline, file_name, 'binary') == (True, file_count)
+    assert read_regions_binary(str(tmp_path / 'zigzag3_regions.plr')) == separate
+
+
+def test_write_regions_stream_fans_out(zigzag_csv, tmp_path):
+    file_name = zigzag_csv(2)
+    output, file_count = write_regions_stream(stream_regions(file_name), file_name, ['files', 'binary'])
+    assert output
+    regions = read_regions_binary(str(tmp_path / 'zigzag2_regions.plr'))
+    assert len(regions) == file_count == len(list(tmp_path.glob('zigzag2_reg[0-9]*.csv')))
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_process_batch(zigzag_csv, tmp_path, workers):
+    file_names = [zigzag_csv(2), zigzag_csv(3)]
+    summary = process_batch(file_names + [str(tmp_path / 'missing.csv')], workers=workers, chunksize=1,
+                            output_modes=['binary'])
+    assert (summary['polylines'], summary['vertices']) == (3, 80)
+    assert [f for f, _ in summary['failures']] == [str(tmp_path / 'missing.csv')]
+    expected = 0
+    for file_name in file_names:
+        polyline, _ = read_data(['-f', file_name])
+        polyline.build_regions()
+        expected += polyline.region_list.count
+        regions = read_regions_binary(file_name.removesuffix('.csv') + '_regions.plr')
+        assert regions == [[(pt.nr, pt.x, pt.y) for pt in reversed(rn.reg_pts_list)]
+                           for rn in reversed(polyline.region_list.region_nodes_list)]
+    assert summary['regions'] == expected
+
+
+def test_main_batch(zigzag_csv, tmp_path, capsys):
+    zigzag_csv(2), zigzag_csv(3)
+    assert expand_inputs([str(tmp_path / 'zigzag*.csv')]) == sorted(str(p) for p in tmp_path.glob('zigzag*.csv'))
+    with patch('builtins.input') as mock_input:
+        assert main(['-e', 'python', '--output-mode', 'single', 'batch', str(tmp_path / 'zigzag*.csv'), '-w', '1']) is None
+    mock_input.assert_not_called()
+    assert '2 polylines, 80 vertices' in capsys.readouterr().out
+    assert (tmp_path / 'zigzag2_regions.csv').exists() and (tmp_path / 'zigzag3_regions.csv').exists()
+
+
+def test_output_mode_switch():
+    assert input_parsing_1(['batch', 'a.csv']).output_mode == ['files']
+    args = input_parsing_1(['--output-mode', 'single,binary', '--output-mode', 'geojson', 'batch', 'a.csv'])
+    assert args.output_mode == ['single', 'binary', 'geojson']
+    assert args.command == 'batch' and args.inputs == ['a.csv']
+    with pytest.raises(SystemExit):
+        input_parsing_1(['--output-mode', 'single,tiff', 'batch', 'a.csv'])
+
+
+@pytest.fixture
+def multi_polyline_csv(tmp_path):
+    coords = {'7': [(0, 0), (1, 2), (2, -1), (3, 1), (4, 0)], 'b': [(0, 0), (1, 1), (2, 1), (3, 0)],
+              '8': [(0, 0), (1, -3), (2, 3), (3, -3), (4, 3), (5, 0)]}
+    lines = ['Id,Nr,X,Y']
+    for id, pts in coords.items():
+        lines += [f'{id},{10 + i},{x},{y}' for i, (x, y) in enumerate(pts)]
+    path = tmp_path / 'layer.csv'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path), coords
+
+
+@pytest.mark.parametrize("storage", ['list', 'array'])
+def test_iter_polylines(multi_polyline_csv, storage):
+    file_name, coords = multi_polyline_csv
+    with open(file_name) as f:
+        polylines = iter_polylines(csv.reader(f), storage)
+        first = next(polylines)
+        assert (first.id, first.pts_count, first.pts_list_nr_max) == (7, 5, 14)
+        rest = list(polylines)
+    assert [p.id for p in rest] == ['b', 8]
+    for polyline, (id, pts) in zip([first] + rest, coords.items()):
+        expected = Polyline()
+        for i, (x, y) in enumerate(pts):
+            expected.add_point(Point(nr=10 + i, x=x, y=y))
+        assert polyline == expected
+        polyline.build_regions()
+        expected.build_regions()
+        assert regions_points(polyline) == regions_points(expected)
+
+
+def test_multi_polyline_file(multi_polyline_csv, zigzag_csv, tmp_path):
+    file_name, coords = multi_polyline_csv
+    names = [name for _, name in iter_input_polylines(file_name)]
+    assert names == [str(tmp_path / f'layer_{id}.csv') for id in coords]
+    assert [name for _, name in iter_input_polylines(zigzag_csv(3))] == [zigzag_csv(3)]
+
+    with patch('builtins.input'):
+        main(['-f', file_name])
+    assert sorted(p.name for p in tmp_path.glob('layer_*_reg*.csv')) == \
+        ['layer_7_reg1.csv', 'layer_7_reg2.csv', 'layer_7_reg3.csv', 'layer_8_reg1.csv', 'layer_8_reg2.csv', 'layer_8_reg3.csv',
+         'layer_8_reg4.csv', 'layer_b_reg1.csv']
+    summary = process_batch([file_name], workers=1, output_modes='single')
+    assert (summary['vertices'], summary['regions'], summary['failures']) == (15, 8, [])
+
+
+def test_multi_polyline_file_stats(multi_polyline_csv):
+    file_name, coords = multi_polyline_csv
+    with profiling.profile() as stats:
+        assert len(list(iter_input_polylines(file_name))) == 3
+    assert stats['counters']['points_read'] == 15
+    assert stats['timers']['read_data']['calls'] == 3
+
+
+def test_multi_polyline_file_repeated_id(tmp_path, capsys):
+    path = tmp_path / 'split.csv'
+    path.write_text('Id,Nr,X,Y\n1,1,0,0\n1,2,1,1\n1,3,2,0\n2,1,0,0\n2,2,1,-1\n2,3,2,0\n'
+                    '1,4,3,0\n1,5,4,1\n1,6,5,0\n')
+    with open(path) as f:
+        polylines = iter_polylines(csv.reader(f))
+        assert next(polylines).id == 1
+        with pytest.raises(ValueError, match="polyline 1"):
+            next(polylines)
+    with patch('builtins.input'), pytest.raises(SystemExit, match="not contiguous"):
+        main(['-f', str(path)])
+    summary = process_batch([str(path)], workers=1)
+    assert len(summary['failures']) == 1 and 'not contiguous' in summary['failures'][0][1]
+
+
+def test_base_line_matches_is_left_and_line_intersection():
+    rng = random.Random(17)
+    polyline = Polyline()
+    for _ in range(200):
+        start, end, p3, p4 = [Point(x=rng.uniform(-1e3, 1e3), y=rng.choice([0.0, rng.uniform(-1e3, 1e3)]))
+                              for _ in range(4)]
+        base_line = BaseLine(start, end)
+        assert base_line.side(p3.x, p3.y) == Polyline.is_left(p3, start, end)
+        res, pt = polyline.line_intersection(start, end, p3, p4)
+        assert base_line.crossing(p3.x, p3.y, p4.x, p4.y) == ((pt.x, pt.y) if res else None)
+    start, end = Point(x=0.0, y=0.0), Point(x=2.0, y=2.0)
+    assert BaseLine(start, end).crossing(0.0, 1.0, 1.0, 2.0) is None
+    assert BaseLine(start, end).crossing(0.0, 1.0, 1.0, 0.0) == (0.5, 0.5)
+
+
+def crossings_and_regions(polyline):
+    """
+    Regions' and crossing points' coordinates, as crossing points' numbers depend on the order they were counted in
+    """
+    regions = [[(pt.x, pt.y, pt.is_left) for pt in rn.reg_pts_list]
+               for rn in reversed(polyline.region_list.region_nodes_list)]
+    crossings = [(it.data.x, it.data.y) for it in polyline.intersect_pts_list] if polyline.intersect_pts_list else []
+    return regions, crossings, polyline.intersect_pts_count, [rn.id for rn in reversed(polyline.region_list.region_nodes_list)]
+
+
+@pytest.mark.parametrize("block_min", [64, 2])
+@pytest.mark.parametrize("storage", ['list', 'array'])
+def test_incremental_edits_match_full_build(storage, block_min, monkeypatch):
+    # blocks of 2 to 8 regions make the edits cross blocks, split and empty them
+    monkeypatch.setattr(project, 'REGION_BLOCK_MIN', block_min)
+    rng = random.Random(5)
+    polyline = Polyline(id=1, storage=storage)
+    for i in range(60):
+        polyline.add_point(Point(nr=i + 1, x=float(i), y=0.0 if i in (0, 59) else float(rng.randint(-2, 2))))
+    polyline.build_regions()
+    for step in range(300):
+        n = polyline.pts_count
+        edit = rng.choice(['update', 'insert', 'delete'] if n > 4 else ['update', 'insert'])
+        index = rng.randrange(1, n - 1) if rng.random() < 0.95 else rng.choice([0, n - 1])
+        y = float(rng.randint(-2, 2))
+        if edit == 'update':
+            polyline.update_point(index, polyline.pts_list[index].x, y)
+        elif edit == 'insert':
+            polyline.insert_point(index, Point(nr=1000 + step, x=index - 0.5, y=y))
+        else:
+            polyline.delete_point(index)
+
+        expected = Polyline(id=1)
+        for pt in polyline.pts_list:
+            expected.add_point(Point(nr=pt.nr, x=pt.x, y=pt.y))
+        expected.build_regions()
+        assert crossings_and_regions(polyline) == crossings_and_regions(expected)
+        assert polyline.region_list.count == expected.region_list.count
+        assert polyline.intersect_pts_count == len(polyline.intersect_pts_list or ())
+        assert polyline.region_starts() == expected.region_starts()
+        assert [rn.reg_pts_count for rn in polyline.region_list.region_nodes_list] == \
+            [rn.reg_pts_count for rn in expected.region_list.region_nodes_list]
+
+
+def test_incremental_edit_removing_all_crossings():
+    polyline = Polyline(id=1)
+    for i, y in enumerate([0.0, 1.0, -1.0, 2.0, 0.0]):
+        polyline.add_point(Point(nr=i + 1, x=float(i), y=y))
+    polyline.build_regions()
+    assert polyline.intersect_pts_count == 3
+    polyline.update_point(2, 2.0, 1.0)
+    assert (polyline.intersect_pts_list, polyline.intersect_pts_count) == (None, 0)
+    polyline.update_point(2, 2.0, -1.0)
+    polyline.delete_point(2)
+    assert (polyline.intersect_pts_list, polyline.intersect_pts_count) == (None, 0)
+    polyline.insert_point(2, Point(nr=9, x=1.5, y=-3.0))
+    expected = Polyline(id=1)
+    for pt in polyline.pts_list:
+        expected.add_point(Point(nr=pt.nr, x=pt.x, y=pt.y))
+    expected.build_regions()
+    assert crossings_and_regions(polyline) == crossings_and_regions(expected)
+
+
+def test_incremental_edit_is_local():
+    polyline = Polyline(id=1)
+    for i in range(1000):
+        polyline.add_point(Point(nr=i + 1, x=float(i), y=0.0 if i in (0, 999) else float((-1) ** (i // 10))))
+    polyline.build_regions()
+    regions = polyline.region_list.count
+    with profiling.profile() as stats:
+        polyline.update_point(505, 505.0, -1.0)    # one vertex of a region crosses to the other side
+    assert polyline.region_list.count == regions + 2
+    assert 'build_regions' not in stats['timers'] and stats['timers']['update_regions']['calls'] == 1
+    assert stats['timers']['build_regions.intersections']['calls'] <= 4
+
+    # the regions after the edited ones are moved by their blocks' offsets, not one by one
+    last = polyline.region_list.region_nodes_list[0]
+    raw = (last._id, last._start)
+    polyline.insert_point(505, Point(nr=2000, x=504.5, y=1.0))
+    assert (last._id, last._start) == raw and (last.id, last.start) == (regions + 2, 991)
+    assert last in polyline.region_blocks()[-1].regions
+
+    with profiling.profile() as stats:
+        polyline.update_point(0, 0.0, 0.5)          # the base line moves
+    assert stats['timers']['build_regions']['calls'] == 1
+
+
+@pytest.mark.parametrize("storage", ['list', 'array'])
+def test_regions_are_spans(storage):
+    polyline = Polyline(id=1, storage=storage)
+    for i, (x, y) in enumerate([(0, 0), (1, 2), (2, -1), (3, 0), (4, 0), (5, 1), (6, 0)]):
+        polyline.add_point(Point(nr=i + 1, x=x, y=y))
+    polyline.build_regions()
+    first, second, third = reversed(polyline.region_list.region_nodes_list)
+    assert (first.start, first.end, first.lead) == (0, 1, None)
+    assert (second.start, second.end, second.lead, second.trail) == (2, 3, first.trail, None)
+    assert (third.start, third.end, third.lead, third.trail) == (3, 6, None, None)
+
+    points = second.reg_pts_list
+    assert not isinstance(points, deque)
+    assert [pt.nr for pt in points] == [8, 3, 4] and second.reg_pts_count == len(points) == 3
+    assert [pt.nr for pt in reversed(points)] == [4, 3, 8]
+    assert [points[i].nr for i in range(-3, 3)] == [8, 3, 4, 8, 3, 4]
+    assert [pt.nr for pt in points[1:]] == [3, 4]
+    assert [pt.nr for pt in first.reg_pts_list] == [1, 2, 8]
+    with pytest.raises(IndexError):
+        points[3]
+    assert third.starshaped_list.starshaped_nodes_list == deque()
@@ -0,0 +1,145 @@
+import os
+from unittest.mock import patch
+import pytest
+from project import Polyline, Point, load_input, main, process_batch, read_regions_binary
+import profiling
+import region_cache
+from region_cache import RegionCache, build_regions_cached, dump_region_list, file_key, load_region_list, \
+    load_regions_cached, polyline_key
+
+
+def regions_of(polyline):
+    return [(rn.id, rn.reg_pts_count, [(pt.nr, pt.x, pt.y, pt.is_left) for pt in rn.reg_pts_list])
+            for rn in polyline.region_list.region_nodes_list]
+
+
+def state_of(polyline):
+    """
+    Return: all that build_regions gives a polyline: points, crossing points and regions
+    """
+    crossings = [(node.data.nr, node.data.x, node.data.y) for node in polyline.intersect_pts_list or []]
+    return ([(pt.nr, pt.x, pt.y, pt.is_left) for pt in polyline.pts_list], polyline.pts_count,
+            crossings, polyline.intersect_pts_count, regions_of(polyline), polyline.region_list.count,
+            polyline.pts_list_nr_max)
+
+
+@pytest.mark.parametrize("storage", ['list', 'array'])
+def test_dump_and_load_region_list(storage, make_polyline):
+    polyline = make_polyline(50, storage)
+    polyline.build_regions()
+    restored = load_region_list(dump_region_list(polyline), storage=storage)
+    assert restored.storage == storage
+    assert state_of(restored) == state_of(polyline)
+    # a restored polyline is patched by edits the same way as a built one
+    for polyline in (polyline, restored):
+        polyline.update_point(20, 20.0, 0.0)
+        polyline.insert_point(30, Point(nr=100, x=29.5, y=-7.0))
+        polyline.delete_point(40)
+    assert state_of(restored) == state_of(polyline)
+    single = make_polyline(1)
+    single.build_regions()
+    assert state_of(load_region_list(dump_region_list(single))) == state_of(single)
+    with pytest.raises(ValueError):
+        load_region_list(b'PLR\0' + dump_region_list(polyline)[4:])
+
+
+def test_keys(zigzag_file, tmp_path, make_polyline):
+    assert polyline_key(make_polyline(30)) == polyline_key(make_polyline(30, 'array'))
+    assert polyline_key(make_polyline(30)) != polyline_key(make_polyline(30, shift=1e-9))
+    copy = tmp_path / 'copy.csv'
+    copy.write_bytes(open(zigzag_file, 'rb').read())
+    assert file_key(zigzag_file) == file_key(str(copy))
+    with open(copy, 'a') as f:
+        f.write('40,1\n')
+    assert file_key(zigzag_file) != file_key(str(copy))
+    key = file_key(zigzag_file)
+    with patch.object(region_cache, 'REGIONS_ALGORITHM_VERSION', region_cache.REGIONS_ALGORITHM_VERSION + 1):
+        assert file_key(zigzag_file) != key
+    with patch.object(region_cache, 'EPS', 1e-3):
+        assert file_key(zigzag_file) != key
+
+
+def test_build_regions_cached(tmp_path, make_polyline):
+    cache = RegionCache(str(tmp_path / 'cache'))
+    expected = make_polyline(60)
+    assert build_regions_cached(expected, cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    polyline = make_polyline(60)
+    with patch.object(Polyline, 'build_regions', side_effect=AssertionError('built again')):
+        assert build_regions_cached(polyline, cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert state_of(polyline) == state_of(expected)
+
+
+def test_load_regions_cached_skips_parsing(zigzag_file, tmp_path):
+    cache = RegionCache(str(tmp_path / 'cache'))
+    expected, res = load_regions_cached(zigzag_file, cache, load_input)
+    assert res
+    with profiling.profile() as stats:
+        restored, res = load_regions_cached(zigzag_file, cache, lambda name: pytest.fail('parsed again'),
+                                            storage='array')
+    assert res and state_of(restored) == state_of(expected)
+    assert restored.intersect_pts_count > 1
+    assert 'add_intersect_point' not in stats['timers'] and 'intersections' not in stats['counters']
+    assert restored.storage == 'array'
+
+
+def test_lru_eviction(tmp_path):
+    cache = RegionCache(str(tmp_path / 'cache'))
+    entry = bytes(1000)
+    for i, key in enumerate('abcd'):
+        cache.put(key, entry)
+        os.utime(cache.path(key), (1000 + i, 1000 + i))    # put in the order a, b, c, d
+    assert cache.get('a') == entry                          # a is the most recently used now
+    cache.max_bytes = 2500
+    assert cache.evict() == 2
+    assert sorted(e.name for e in cache.entries()) == ['a.plc', 'd.plc']
+    assert cache.get('b') is None
+    assert cache.size() == 2000
+
+    cache.put('e', entry)
+    assert sorted(e.name for e in cache.entries()) == ['a.plc', 'e.plc']
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_put_scans_only_to_evict(tmp_path):
+    cache = RegionCache(str(tmp_path / 'cache'), max_bytes=20_500)
+    with patch.object(RegionCache, 'evict', wraps=cache.evict) as evict:
+        for k in range(30):
+            cache.put(f'k{k}', bytes(1000))
+            cache.put(f'k{k}', bytes(1000))     # replacing an entry does not grow the cache
+    # evictions at the 21st, 24th, 27th and 30th entry, each one leaving 18 entries (below 90% of max_bytes)
+    assert evict.call_count == 4
+    assert cache.size() == cache.known_size == 18_000
+
+
+def test_cache_shared_by_workers(tmp_path):
+    names = []
+    for k in range(6):
+        path = tmp_path / f'line{k}.csv'
+        path.write_text('X,Y\n' + ''.join(f'{i},{(-1) ** i * (1 + (i + k) % 4)}\n' for i in range(30 + k % 3)))
+        names.append(str(path))
+    cache_dir = str(tmp_path / 'cache')
+    first = process_batch(names + names, workers=3, chunksize=1, output_modes='binary', cache_dir=cache_dir)
+    outputs = [read_regions_binary(name.removesuffix('.csv') + '_regions.plr') for name in names]
+    # the same six inputs, (at most) six entries, whichever worker wrote them
+    assert len(RegionCache(cache_dir).entries()) == 6
+    assert not [e for e in os.scandir(cache_dir) if e.name.endswith('.tmp')]
+
+    with patch('project.load_input', side_effect=AssertionError('parsed again')):
+        second = process_batch(names, workers=1, output_modes='binary', cache_dir=cache_dir)
+    assert second['failures'] == [] and second['regions'] * 2 == first['regions']
+    assert [read_regions_binary(name.removesuffix('.csv') + '_regions.plr') for name in names] == outputs
+
+
+def test_main_cache(zigzag_file, tmp_path, capsys):
+    with patch('builtins.input'):
+        main(['-f', zigzag_file, '--cache', str(tmp_path / 'cache'), '--output-mode=binary', '--profile'])
+        expected = read_regions_binary(str(tmp_path / 'zigzag2_regions.plr'))
+        assert 'cache_misses' in capsys.readouterr().out
+        main(['-f', zigzag_file, '--cache', str(tmp_path / 'cache'), '--output-mode=binary', '--profile'])
+    out = capsys.readouterr().out
+    assert 'cache_hits' in out and 'build_regions' not in out
+    assert read_regions_binary(str(tmp_path / 'zigzag2_regions.plr')) == expected
@@ -0,0 +1,123 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import math
+from project import Polyline, Point, load_regions_binary
+from service import RegionService, build_batch
+
+
+POINTS = [[173, 349], [210, 406], [191.5, 486], [267, 558], [401, 531], [374, 470], [422, 414], [497, 349]]
+ZIGZAG = [[i, (-1) ** i * (i % 5)] for i in range(60)]
+
+
+def expected_regions(points):
+    polyline = Polyline(id=1)
+    for i, (x, y) in enumerate(points, 1):
+        polyline.add_point(Point(nr=i, x=x, y=y))
+    polyline.build_regions()
+    return [[(pt.nr, pt.x, pt.y) for pt in reversed(rn.reg_pts_list)]
+            for rn in reversed(polyline.region_list.region_nodes_list)]
+
+
+async def request(reader, writer, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n'.encode()
+                 + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) != b'\r\n':
+        name, _, value = line.decode().partition(':')
+        headers[name.lower()] = value.strip()
+    return status, headers, await reader.readexactly(int(headers['content-length']))
+
+
+def run_with_service(scenario, unix_path=None, **options):
+    async def main():
+        service = RegionService(executor=ThreadPoolExecutor(2), workers=2, **options)
+        servers = await service.start('127.0.0.1', 0, unix_path)
+        try:
+            return await scenario(service, servers)
+        finally:
+            await service.close()
+            service.executor.shutdown()
+    return asyncio.run(main())
+
+
+def test_regions_json_and_binary():
+    async def scenario(service, servers):
+        reader, writer = await asyncio.open_connection(*servers[0].sockets[0].getsockname()[:2])
+        # one keep-alive connection for all requests
+        status, headers, body = await request(reader, writer, 'POST', '/regions', {'points': POINTS})
+        assert (status, headers['content-type']) == (200, 'application/json')
+        response = json.loads(body)
+        assert response['count'] == len(expected_regions(POINTS))
+        assert [[tuple(pt) for pt in region] for region in response['regions']] == expected_regions(POINTS)
+
+        status, headers, body = await request(reader, writer, 'POST', '/regions',
+                                              {'points': ZIGZAG, 'format': 'binary', 'engine': 'python'})
+        assert (status, headers['content-type']) == (200, 'application/octet-stream')
+        assert load_regions_binary(io.BytesIO(body)) == expected_regions(ZIGZAG)
+
+        status, _, body = await request(reader, writer, 'POST', '/regions', {'points': []})
+        assert (status, json.loads(body)) == (200, {'count': 0, 'regions': []})
+        writer.close()
+    run_with_service(scenario)
+
+
+def test_invalid_requests():
+    async def scenario(service, servers):
+        reader, writer = await asyncio.open_connection(*servers[0].sockets[0].getsockname()[:2])
+        assert (await request(reader, writer, 'POST', '/regions', {'points': [[1, 2, 3, 4]]}))[0] == 400
+        assert (await request(reader, writer, 'POST', '/regions', {'points': POINTS, 'engine': 'x'}))[0] == 400
+        assert (await request(reader, writer, 'POST', '/regions', {'dots': POINTS}))[0] == 400
+        assert (await request(reader, writer, 'GET', '/regions'))[0] == 405
+        assert (await request(reader, writer, 'GET', '/other'))[0] == 404
+        status, _, body = await request(reader, writer, 'GET', '/stats')
+        assert (status, json.loads(body)['errors']) == (200, 5)
+        writer.close()
+    run_with_service(scenario)
+
+
+def test_concurrent_requests_are_batched(tmp_path):
+    shapes = [[[i, math.sin(i / (k + 2)) * 3] for i in range(30 + k)] for k in range(40)]
+
+    async def client(path, points):
+        reader, writer = await asyncio.open_unix_connection(path)
+        status, _, body = await request(reader, writer, 'POST', '/regions', {'points': points})
+        writer.close()
+        return status, json.loads(body)
+
+    async def scenario(service, servers):
+        path = str(tmp_path / 'regions.sock')
+        results = await asyncio.gather(*(client(path, points) for points in shapes))
+        for (status, response), points in zip(results, shapes):
+            assert status == 200
+            assert [[tuple(pt) for pt in region] for region in response['regions']] == expected_regions(points)
+        # a queue of 4 requests makes the rest wait, while each batch takes several of them
+        assert service.stats['requests'] == len(shapes)
+        assert service.stats['batches'] < len(shapes)
+    run_with_service(scenario, str(tmp_path / 'regions.sock'), queue_size=4, batch_size=8)
+    assert not (tmp_path / 'regions.sock').exists()
+
+
+def test_build_batch():
+    results = build_batch([(POINTS, 'python', 'json'), ([[1]], 'python', 'json')])
+    assert [status for status, _ in results] == [200, 400]
+    infinite = POINTS[:3] + [[float('inf'), 1.0]] + POINTS[3:]
+    results = build_batch([(infinite, 'python', 'json'), (POINTS, 'python', 'json'),
+                           ([[0, 0], [1, float('nan')], [2, 0]], 'numpy', 'json'), ([[1, 'x']], 'python', 'json')])
+    assert [status for status, _ in results] == [400, 200, 400, 400]
+    assert json.loads(results[1][1])['count'] == len(expected_regions(POINTS))
+
+
+def test_bad_request_does_not_fail_its_batch():
+    async def scenario(service, servers):
+        bad = [[0, 0], [1, float('inf')], [2, 0]]
+        # all of them are queued before a batcher runs, so they make a single batch
+        results = await asyncio.gather(*(service.submit(points, 'python', 'json')
+                                         for points in [POINTS, bad, ZIGZAG, bad]))
+        assert [status for status, _ in results] == [200, 400, 200, 400]
+        assert service.stats['batches'] == 1
+    run_with_service(scenario, batch_size=8)
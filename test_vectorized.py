@@ -0,0 +1,188 @@
+import math
+import random
+import subprocess
+import sys
+import pytest
+
+np = pytest.importorskip("numpy")
+import vectorized
+import parallel
+import kernel
+
+
+def regions_summary(polyline):
+    regions = [(rn.id, [(pt.nr, pt.x, pt.y, pt.is_left) for pt in rn.reg_pts_list], rn.reg_pts_count)
+               for rn in reversed(polyline.region_list.region_nodes_list)]
+    intersections = [(it.data.nr, it.data.x, it.data.y) for it in polyline.intersect_pts_list or []]
+    return regions, intersections, polyline.region_list.count, polyline.pts_list_nr_max
+
+
+SHAPES = {
+    'fixture': [(173, 349), (210, 406), (191.5, 486), (267, 558), (401, 531), (374, 470), (422, 414), (497, 349)],
+    'on_line': [(0, 0), (1, 1), (2, 0), (3, 0), (4, -1), (5, 0), (6, 2), (7, -2), (8, 0)],
+    'sinus': [(i / 7, math.sin(i / 7) * 3) for i in range(300)],
+    'zigzag': [(i, (-1) ** i * (i % 5)) for i in range(101)],
+    'near_line': [(0.1, 0.3)] + [(0.1 + t * 1234.46789, 0.3 + t * 987.354321) for t in (0.13, 0.29, 0.5, 0.61, 0.77, 0.9)]
+                 + [(1234.56789, 987.654321)],
+    'single': [(1, 1)],
+    'pair': [(1, 1), (2, 3)],
+    'empty': [],
+}
+
+
+@pytest.mark.parametrize("engine", ['numpy', 'parallel'])
+@pytest.mark.parametrize("storage", ['list', 'array'])
+@pytest.mark.parametrize("shape", list(SHAPES))
+def test_numpy_engine_matches_python(shape, storage, engine, make_polyline):
+    expected = make_polyline(SHAPES[shape])
+    actual = make_polyline(SHAPES[shape], storage)
+    assert expected.build_regions('python') == actual.build_regions(engine)
+    assert regions_summary(expected) == regions_summary(actual)
+
+
+def test_numpy_engine_random_walks(make_polyline):
+    rng = random.Random(7)
+    for _ in range(30):
+        coords = [(0.0, 0.0)]
+        for _ in range(rng.randint(2, 200)):
+            coords.append((coords[-1][0] + rng.uniform(-1, 3), float(rng.randint(-3, 3))))
+        expected = make_polyline(coords)
+        actual = make_polyline(coords, rng.choice(['list', 'array']))
+        expected.build_regions('python')
+        actual.build_regions('numpy')
+        assert regions_summary(expected) == regions_summary(actual)
+
+
+def test_non_finite_points_get_the_same_signs(make_polyline):
+    inf, nan = float('inf'), float('nan')
+    coords = [(0, 0), (1, 2), (2, inf), (3, -1), (nan, 1), (5, -inf), (-inf, 2), (7, 1), (8, 0)]
+    polylines = {}
+    for engine in ['python', 'numpy']:
+        polylines[engine] = make_polyline(coords)
+        polylines[engine].build_regions(engine)
+    x = np.array([c[0] for c in coords], dtype=np.float64)
+    y = np.array([c[1] for c in coords], dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        signs = kernel.classify_crossings(x, y, kernel.PYTHON_KERNELS)[0].tolist()
+    assert signs == [0, 1, 0, -1, 0, 0, 0, 1, 0]
+    for polyline in polylines.values():
+        assert [pt.is_left for pt in polyline.pts_list] == signs
+        assert polyline.region_list.count == polylines['python'].region_list.count
+
+
+def test_find_changes():
+    signs = np.array([0, 1, 1, 0, 0, -1, 1, 0, -1, 0], dtype=np.int8)
+    assert vectorized.find_changes(signs).tolist() == [3, 6, 7]
+
+
+def test_unknown_engine(make_polyline):
+    with pytest.raises(ValueError):
+        make_polyline(SHAPES['pair']).build_regions('fortran')
+
+
+@pytest.mark.parametrize("chunks", [2, 3, 7])
+@pytest.mark.parametrize("shape", ['fixture', 'on_line', 'sinus', 'zigzag'])
+def test_parallel_chunks_match_python(shape, chunks, make_polyline):
+    # chunk edges fall on every kind of sign pair of the shapes
+    coords = SHAPES[shape]
+    x = np.array([c[0] for c in coords], dtype=np.float64)
+    y = np.array([c[1] for c in coords], dtype=np.float64)
+    bounds = parallel.chunk_bounds(len(x), chunks)
+    signs = np.zeros(len(x), dtype=np.int8)
+    results = [parallel.classify_chunk(x, y, signs, lo, hi) for lo, hi in bounds]
+    changes, cx, cy = parallel.merge_chunks(x, y, signs, bounds, results)
+
+    expected = make_polyline(coords)
+    expected.build_regions('python')
+    actual = make_polyline(coords)
+    actual.set_is_left(signs)
+    actual.assemble_regions(signs.tolist(), changes.tolist(), cx.tolist(), cy.tolist())
+    assert regions_summary(expected) == regions_summary(actual)
+
+
+@pytest.mark.parametrize("storage", ['list', 'array'])
+def test_parallel_engine_matches_python(storage, make_polyline):
+    coords = SHAPES['zigzag'] + [(101 + i / 7, math.sin(i / 7) * 3) for i in range(300)]
+    expected = make_polyline(coords)
+    expected.build_regions('python')
+    actual = make_polyline(coords, storage)
+    assert actual.build_regions_parallel(workers=3, min_chunk=50)
+    assert regions_summary(expected) == regions_summary(actual)
+
+    expected = make_polyline(SHAPES['fixture'])
+    expected.build_regions('python')
+    actual = make_polyline(SHAPES['fixture'], storage)
+    assert actual.build_regions('parallel')
+    assert regions_summary(expected) == regions_summary(actual)
+
+
+@pytest.mark.parametrize("shape", list(SHAPES))
+def test_kernels_match_vectorized(shape):
+    # the kernels run interpreted here, so they are checked without Numba too
+    coords = SHAPES[shape] + [(1e3 + i / 7, math.sin(i / 7) * 3) for i in range(50)] if len(SHAPES[shape]) > 2 \
+        else SHAPES[shape]
+    x = np.array([c[0] for c in coords], dtype=np.float64)
+    y = np.array([c[1] for c in coords], dtype=np.float64)
+    signs, changes, cx, cy = kernel.classify_crossings(x, y, kernel.PYTHON_KERNELS)
+    expected_signs = vectorized.classify(x, y)
+    expected_changes = vectorized.find_changes(expected_signs)
+    expected_cx, expected_cy = vectorized.crossings(x, y, expected_signs, expected_changes)
+    assert signs.tolist() == expected_signs.tolist()
+    assert changes.tolist() == expected_changes.tolist()
+    np.testing.assert_array_equal(cx, expected_cx)
+    np.testing.assert_array_equal(cy, expected_cy)
+
+
+@pytest.mark.parametrize("storage", ['list', 'array'])
+@pytest.mark.parametrize("shape", list(SHAPES))
+def test_compiled_engine_matches_python(shape, storage, make_polyline):
+    pytest.importorskip("numba")
+    expected = make_polyline(SHAPES[shape])
+    actual = make_polyline(SHAPES[shape], storage)
+    assert expected.build_regions('python') == actual.build_regions('compiled')
+    assert regions_summary(expected) == regions_summary(actual)
+
+
+def test_auto_engine(monkeypatch, make_polyline):
+    expected = make_polyline(SHAPES['zigzag'])
+    expected.build_regions('python')
+    monkeypatch.setattr(kernel, 'available', lambda: False)
+    actual = make_polyline(SHAPES['zigzag'])
+    assert actual.build_regions('auto')
+    assert actual._build_engine == 'python'
+    assert regions_summary(expected) == regions_summary(actual)
+    with pytest.raises(ImportError):
+        make_polyline(SHAPES['zigzag']).build_regions('compiled')
+
+
+def broken_import():
+    raise ImportError("numpy.core.multiarray failed to import")
+
+
+def broken_kernel(*args):
+    raise TypeError("Failed in nopython mode pipeline")
+
+
+@pytest.mark.parametrize("broken", ['import', 'compile'])
+def test_auto_engine_with_broken_numba(monkeypatch, broken, make_polyline):
+    expected = make_polyline(SHAPES['zigzag'])
+    expected.build_regions('python')
+    monkeypatch.setattr(kernel, 'available', lambda: True)
+    monkeypatch.setattr(kernel, '_usable', None)
+    if broken == 'import':
+        monkeypatch.setattr(kernel, 'compiled_kernels', broken_import)
+    else:
+        monkeypatch.setattr(kernel, '_compiled', (broken_kernel, broken_kernel))
+    actual = make_polyline(SHAPES['zigzag'])
+    with pytest.warns(RuntimeWarning, match="unusable"):
+        assert actual.build_regions('auto')
+    assert actual._build_engine == 'python'
+    assert regions_summary(expected) == regions_summary(actual)
+    # the failure is remembered
+    again = make_polyline(SHAPES['zigzag'])
+    assert again.build_regions('auto') and again._build_engine == 'python'
+
+
+def test_kernel_is_imported_lazily():
+    code = "import sys, project; project.build_parser(); print(sorted({'kernel', 'numba', 'numpy'} & set(sys.modules)))"
+    assert subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout == '[]\n'
@@ -0,0 +1,93 @@
+"""
+NumPy vectorized engine of Polyline.build_regions:
+side of line classification, sign changes and crossing points of a whole polyline
+are computed with array operations on float64 coordinates.
+
+NumPy is optional - it is imported only when this engine is used.
+"""
+
+import predicates
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("The numpy engine requires NumPy: pip install numpy")
+    return np
+
+
+def classify(x, y, lo=0, hi=None):
+    """
+    Input: x, y - float64 arrays of polyline's points coordinates
+           lo, hi - range of points to classify (all of them by default)
+    Return: int8 array of is_left values (1, 0, -1) of the points lo to hi - 1 against the line
+            through the first and the last point; first and last point get 0
+    """
+    n = len(x)
+    hi = n if hi is None else hi
+    signs = np.zeros(hi - lo, dtype=np.int8)
+    inner_lo, inner_hi = max(lo, 1), min(hi, n - 1)
+    if inner_hi <= inner_lo:
+        return signs
+    # the same robust predicate as BaseLine.sign, batched
+    signs[inner_lo - lo:inner_hi - lo] = predicates.orientations(x[0], y[0], x[n - 1], y[n - 1],
+                                                                 x[inner_lo:inner_hi], y[inner_lo:inner_hi])
+    return signs
+
+
+def find_changes(signs, lo=1, hi=None):
+    """
+    Input: lo, hi - range of indices to look for changes in (1 to n - 2 by default),
+                    it needs signs of the points lo - 1 to hi - 1 only
+    Return: ascending indices i (1 <= i <= n - 2) where a new region starts:
+            the point i lies on the line while the point i - 1 does not,
+            or the points i - 1 and i lie on opposite sides of the line
+    """
+    n = len(signs)
+    lo = max(lo, 1)
+    hi = n - 1 if hi is None else min(hi, n - 1)
+    if hi <= lo:
+        return np.zeros(0, dtype=np.intp)
+    prev, cur = signs[lo - 1:hi - 1], signs[lo:hi]
+    return np.flatnonzero((prev != cur) & ((cur == 0) | (prev != 0))) + lo
+
+
+def crossings(x, y, signs, changes):
+    """
+    Counts intersection points of segments (i - 1, i), for i in changes, with the line
+    through the first and the last point, the way Polyline.line_intersection does.
+    Return: float64 arrays of crossings' x and y, NaN where the change is at a vertex
+            lying on the line or where the segment is parallel to the line
+    """
+    n = len(x)
+    cx = np.full(len(changes), np.nan)
+    cy = np.full(len(changes), np.nan)
+    if len(changes) == 0:
+        return cx, cy
+    p1x, p1y, p2x, p2y = x[0], y[0], x[n - 1], y[n - 1]
+    a1 = p2y - p1y
+    b1 = p1x - p2x
+    c1 = p2x * p1y - p1x * p2y
+
+    cur = signs[changes]
+    crossing = cur != 0
+    i = changes[crossing]
+    left = cur[crossing] == 1
+    # Polyline.build_regions passes (pt[i], pt[i - 1]) when pt[i] is on the left, (pt[i - 1], pt[i]) otherwise
+    p3 = np.where(left, i, i - 1)
+    p4 = np.where(left, i - 1, i)
+    a2 = y[p4] - y[p3]
+    b2 = x[p3] - x[p4]
+    c2 = x[p4] * y[p3] - x[p3] * y[p4]
+
+    denominator = a1 * b2 - a2 * b1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ix = np.where(denominator != 0, (b1 * c2 - b2 * c1) / denominator, np.nan)
+        iy = np.where(denominator != 0, (a2 * c1 - a1 * c2) / denominator, np.nan)
+    cx[crossing] = ix
+    cy[crossing] = iy
+    return cx, cy